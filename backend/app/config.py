@@ -0,0 +1,81 @@
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Backend configuration, read from ``FEEDBACK_*`` environment variables or ``.env``."""
+
+    # Storage
+    data_dir: str = "data"
+    # Record store: "log" (append-only segments under data_dir/feedback) or "sqlite"
+    # (data_dir/feedback/feedback.sqlite3); move data between them with services.storage_migration
+    storage_backend: str = "log"
+    segment_max_bytes: int = 64 * 1024 * 1024
+    # Encode new records with the question-flow codebook; false writes plain JSON objects
+    compact_encoding: bool = True
+
+    # Time partitions: sealed log segments are moved into month (or day) partitions by
+    # created_at every compaction interval (0 disables); partitions whose period ended
+    # more than archive_after_days ago become read-only gzip archives (0 never archives)
+    partition_by: str = "month"  # month or day
+    compaction_interval_seconds: float = 3600
+    archive_after_days: int = 90
+    archive_block_bytes: int = 64 * 1024
+
+    # Unix socket of a separate writer process (python -m backend.app.services.writer_service).
+    # Empty: this process writes the store itself, so only one API worker may run
+    writer_socket: str = ""
+
+    # Group commit: saves arriving within the wait window share one write and fsync
+    write_batch_size: int = 256
+    write_batch_max_wait_ms: float = 2.0
+    write_queue_depth: int = 10000
+
+    # Bulk NDJSON ingest
+    ingest_chunk_size: int = 5000
+    ingest_max_line_bytes: int = 1024 * 1024
+    ingest_max_reported_errors: int = 100
+
+    # Submissions are validated against the question flows; longest accepted text answer
+    flow_max_text_length: int = 10000
+
+    # Duplicate suppression on POST /feedback: how long, and how many, submissions are remembered
+    dedup_window_seconds: float = 600
+    dedup_max_entries: int = 100000
+
+    # Paginated reads (GET /feedback)
+    page_max_limit: int = 1000
+
+    # Time series (GET /stats/timeseries): most buckets returned per series
+    timeseries_max_points: int = 500
+
+    # Sentiment scoring
+    sentiment_cache_size: int = 10000
+
+    # Background sentiment enrichment; 0 workers scores on a thread instead of processes
+    enrichment_workers: int = 2
+    enrichment_batch_size: int = 512
+
+    # Columnar snapshots (needs pyarrow); 0 disables the periodic job
+    snapshot_interval_seconds: float = 0
+    snapshot_format: str = "parquet"  # parquet or arrow
+    snapshot_batch_rows: int = 65536
+    snapshot_retain: int = 3
+
+    # Request profiling: when enabled, requests sent with ``X-Profile: 1`` or picked at
+    # the sample rate are profiled to collapsed-stack files under ``<data_dir>/profiles``
+    profile_enabled: bool = False
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 2.0
+    profile_retain: int = 50
+
+    # Full-text search: records buffered before their postings are written as a segment
+    search_flush_docs: int = 10000
+    search_max_segments: int = 8
+    search_max_limit: int = 100
+
+    class Config:
+        env_prefix = "FEEDBACK_"
+        env_file = ".env"
+
+
+settings = Settings()
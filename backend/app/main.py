@@ -1,8 +1,39 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import zlib
+from datetime import date, datetime, time
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .models.feedback import Feedback
-from .services.feedback_service import FeedbackService
+from .config import settings
+from .models.feedback import (
+    DedupStats,
+    EnrichmentStatus,
+    FacetsResponse,
+    Feedback,
+    FeedbackPage,
+    FeedbackQuery,
+    IngestResult,
+    ProfileCapture,
+    SearchResponse,
+    SearchResult,
+    StatsResponse,
+    TimeseriesResponse,
+)
+from .services.compaction_service import CompactionService
+from .services.dedup_index import IdempotencyConflict
+from .services.enrichment_service import EnrichmentService
+from .services.export_service import MEDIA_TYPES, csv_chunks, csv_columns, gzip_chunks, ndjson_chunks
+from .services.feedback_service import FeedbackService, decode_cursor, encode_cursor
+from .services.flow_registry import FlowRegistry
+from .services.ingest_service import IngestService
+from .services.metrics import SAVE_ERRORS, MetricsMiddleware, registry as metrics
+from .services.profiler import ProfileStore, ProfilerMiddleware
+from .services.snapshot_service import SnapshotService
+from .services.timeseries import BUCKETS, GROUP_BY
 from .services.sentiment_service import SentimentService
+from .services.writer_service import WriterClient
 
 app = FastAPI(title="Feedback Chatbot API")
 
@@ -14,15 +45,343 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+profile_store = ProfileStore(os.path.join(settings.data_dir, "profiles"), retain=settings.profile_retain)
+if settings.profile_enabled:
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=profile_store,
+        sample_rate=settings.profile_sample_rate,
+        interval=settings.profile_interval_ms / 1000,
+    )
+# Outermost, so request latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
+flow_registry = FlowRegistry(max_text_length=settings.flow_max_text_length)
+# With a writer socket, saves go to the writer process and this worker only reads the store
+writer_client = WriterClient(settings.writer_socket) if settings.writer_socket else None
+feedback_service = FeedbackService(settings, writer=writer_client)
+sentiment_service = SentimentService(cache_size=settings.sentiment_cache_size)
+ingest_service = IngestService(feedback_service, settings, flow_registry)
+enrichment_service = EnrichmentService(feedback_service, settings)
+snapshot_service = SnapshotService(feedback_service.store, settings)
+compaction_service = CompactionService(feedback_service, settings)
+
+def _dedup_duplicates(stats: DedupStats):
+    return {("key",): stats.duplicates_by_key, ("content",): stats.duplicates_by_content}
+
+# Queue depths and sizes are read when /metrics is scraped, so they cost nothing in between
+metrics.gauge("feedback_write_queue_depth", "Saves waiting for the next group commit.", feedback_service.queue_depth)
+metrics.gauge("feedback_store_records", "Records in the feedback store.", lambda: len(feedback_service.store))
+metrics.gauge("enrichment_pending_records", "Records not yet scored for sentiment.", enrichment_service.pending)
+metrics.gauge(
+    "search_pending_postings", "Search postings held in memory until the next segment is written.",
+    feedback_service.search_index.pending_postings,
+)
+metrics.gauge("feedback_dedup_entries", "Submissions remembered for duplicate suppression.", lambda: feedback_service.dedup.stats().entries)
+metrics.gauge(
+    "feedback_dedup_duplicates_total", "Submissions answered as duplicates instead of being written, by match.",
+    lambda: _dedup_duplicates(feedback_service.dedup.stats()),
+    labelnames=["match"],
+    kind="counter",
+)
+
+@app.on_event("startup")
+async def startup():
+    # In multi-worker mode these run once, in the writer process
+    if writer_client is None:
+        await enrichment_service.start()
+        await snapshot_service.start()
+        await compaction_service.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await compaction_service.stop()
+    await snapshot_service.stop()
+    await enrichment_service.stop()
+    # Commit any saves still waiting in the write queue
+    await feedback_service.close()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Export request latency, save phase timings, bytes written and queue depths for Prometheus.
 
-feedback_service = FeedbackService()
-sentiment_service = SentimentService()
+    In multi-worker mode the writer process records the write path, so its
+    series are fetched and added to this worker's. If the writer cannot be
+    reached they are left out rather than failing the scrape.
+    """
+    remote = None
+    if writer_client is not None:
+        try:
+            remote = await writer_client.metrics()
+        except Exception:
+            remote = None
+    # Gauge callbacks may read the store, so render off the event loop
+    content = await asyncio.get_running_loop().run_in_executor(None, metrics.render, remote)
+    return Response(content=content, media_type=metrics.CONTENT_TYPE)
+
+@app.get("/profiles", response_model=List[ProfileCapture])
+def list_profiles():
+    """List kept request profiles, newest first."""
+    return profile_store.list()
+
+@app.get("/profiles/{name}")
+def get_profile(name: str):
+    """Download a profile in collapsed-stack format; open it in speedscope or flamegraph.pl."""
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {name}")
+    with open(path, "rb") as f:
+        content = f.read()
+    return Response(
+        content=content,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+@app.get("/flows")
+def get_flows(request: Request):
+    """Serve the question flows; send the returned ETag as ``If-None-Match`` to revalidate."""
+    headers = {"ETag": flow_registry.etag, "Cache-Control": "no-cache"}
+    if flow_registry.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=flow_registry.body, media_type="application/json", headers=headers)
 
 @app.post("/feedback", response_model=Feedback)
-async def create_feedback(feedback: Feedback):
+async def create_feedback(feedback: Feedback, idempotency_key: Optional[str] = Header(None)):
+    """Save one submission.
+
+    Repeats of a recent submission, by ``Idempotency-Key`` header or by the
+    content of ``responses``, return the record saved the first time.
+    """
+    errors = flow_registry.validate(feedback)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
     try:
-        # Save feedback without sentiment analysis for now
-        saved_feedback = await feedback_service.save(feedback)
+        # Sentiment is scored in the background so it adds no latency here
+        saved_feedback = await feedback_service.save(feedback, idempotency_key)
+        enrichment_service.notify()
         return saved_feedback
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        SAVE_ERRORS.inc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/feedback", response_model=FeedbackPage)
+def list_feedback(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.page_max_limit),
+    feedback_type: Optional[List[str]] = Query(None),
+    user_id: Optional[str] = None,
+    product_name: Optional[List[str]] = Query(None),
+    user_role: Optional[List[str]] = Query(None),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Page through stored feedback in insertion order.
+
+    Pass the returned ``next_cursor`` to fetch the following page. The cursor
+    is returned even on the last page, so it can be reused later to read only
+    records added since. Repeat a filter to match any of several values.
+    """
+    try:
+        start_id = decode_cursor(cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = FeedbackQuery(
+        feedback_type=feedback_type,
+        user_id=user_id,
+        product_name=product_name,
+        user_role=user_role,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    items, next_id, has_more = feedback_service.query(query, start_id, limit)
+    return FeedbackPage(items=items, next_cursor=encode_cursor(next_id), has_more=has_more)
+
+@app.get("/feedback/recent", response_model=List[Feedback])
+def recent_feedback(
+    limit: int = Query(10, ge=1, le=settings.page_max_limit),
+    feedback_type: Optional[List[str]] = Query(None),
+    product_name: Optional[List[str]] = Query(None),
+    user_role: Optional[List[str]] = Query(None),
+    day_from: Optional[date] = Query(None, alias="from"),
+    day_to: Optional[date] = Query(None, alias="to"),
+):
+    """Return the most recently created feedback matching the filters, newest first."""
+    query = FeedbackQuery(
+        feedback_type=feedback_type,
+        product_name=product_name,
+        user_role=user_role,
+        created_from=datetime.combine(day_from, time.min) if day_from else None,
+        created_to=datetime.combine(day_to, time.max) if day_to else None,
+    )
+    return feedback_service.recent(query, limit)
+
+@app.get("/feedback/search", response_model=SearchResponse)
+def search_feedback(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=settings.search_max_limit),
+    feedback_type: Optional[List[str]] = Query(None),
+    product_name: Optional[List[str]] = Query(None),
+):
+    """Full-text search over the free-text answers, ranked by BM25."""
+    query = FeedbackQuery(feedback_type=feedback_type, product_name=product_name)
+    results, total = feedback_service.search(q, query, limit)
+    return SearchResponse(
+        query=q,
+        total=total,
+        results=[SearchResult(score=score, feedback=feedback) for score, feedback in results],
+    )
+
+@app.get("/feedback/facets", response_model=FacetsResponse)
+def get_facets(
+    request: Request,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Count records per value of every facet under a filter combination.
+
+    Filter with ``?<facet>=<value>``, e.g. ``?product_name=Mobile App&urgency=...``;
+    repeat a facet to keep several values. Each facet's counts apply every
+    filter except its own.
+    """
+    filters = {}
+    for facet, value in request.query_params.multi_items():
+        if facet in ("created_from", "created_to"):
+            continue
+        if facet not in feedback_service.facets.FACETS:
+            raise HTTPException(status_code=400, detail=f"Unknown facet: {facet}")
+        filters.setdefault(facet, []).append(value)
+    total, facets = feedback_service.facet_counts(filters, created_from, created_to)
+    return FacetsResponse(total=total, facets=facets)
+
+@app.get("/feedback/export")
+def export_feedback(
+    request: Request,
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    day_from: Optional[date] = Query(None, alias="from"),
+    day_to: Optional[date] = Query(None, alias="to"),
+    feedback_type: Optional[List[str]] = Query(None, alias="type"),
+    product_name: Optional[List[str]] = Query(None),
+    user_role: Optional[List[str]] = Query(None),
+):
+    """Stream matching feedback as NDJSON or CSV, whatever the size of the store.
+
+    Records are read from the store as the response is sent, so memory use
+    stays flat and saves carry on meanwhile. CSV has one column per question
+    key of the selected types' flows (of all flows without ``type``). Send
+    ``Accept-Encoding: gzip`` to have the stream compressed on the fly.
+    """
+    query = FeedbackQuery(
+        feedback_type=feedback_type,
+        product_name=product_name,
+        user_role=user_role,
+        created_from=datetime.combine(day_from, time.min) if day_from else None,
+        created_to=datetime.combine(day_to, time.max) if day_to else None,
+    )
+    records = feedback_service.iter_matching(query)
+    if export_format == "csv":
+        chunks = csv_chunks(records, csv_columns(feedback_type))
+    else:
+        chunks = ndjson_chunks(records)
+    headers = {
+        "Content-Disposition": f'attachment; filename="feedback-export.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    # A plain generator is iterated on the threadpool, keeping store reads off the event loop
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[export_format], headers=headers)
+
+@app.get("/feedback/dedup", response_model=DedupStats)
+async def get_dedup_stats():
+    """Report how many submissions were answered as duplicates instead of being written."""
+    return await feedback_service.dedup_stats()
+
+@app.get("/feedback/indexes")
+def get_index_stats():
+    """Report the size and memory use of the in-memory indexes, and how the store is partitioned."""
+    return feedback_service.index_stats()
+
+@app.post("/feedback/batch", response_model=IngestResult)
+async def create_feedback_batch(request: Request):
+    """Bulk-load feedback from an NDJSON body, one ``Feedback`` object per line.
+
+    Send ``Content-Encoding: gzip`` for a gzip-compressed body. Invalid lines
+    are counted and reported without aborting the upload.
+    """
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    try:
+        result = await ingest_service.ingest(request.stream(), gzipped=gzipped)
+        enrichment_service.notify()
+        return result
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/enrichment/status", response_model=EnrichmentStatus)
+def get_enrichment_status():
+    """Report background sentiment progress, including the age of the oldest unscored record."""
+    return enrichment_service.status()
+
+@app.get("/stats", response_model=StatsResponse)
+def get_stats(
+    day_from: Optional[date] = Query(None, alias="from"),
+    day_to: Optional[date] = Query(None, alias="to"),
+    feedback_type: Optional[List[str]] = Query(None),
+    product_name: Optional[List[str]] = Query(None),
+    user_role: Optional[List[str]] = Query(None),
+):
+    """Return pre-aggregated counts per day, feedback type, product, role and sentiment.
+
+    Repeat a filter to keep several values, e.g. ``?product_name=A&product_name=B``.
+    """
+    feedback_service.refresh()
+    rows = feedback_service.rollups.rows(
+        day_from=day_from,
+        day_to=day_to,
+        feedback_type=feedback_type,
+        product_name=product_name,
+        user_role=user_role,
+    )
+    return StatsResponse(total=sum(row.count for row in rows), rows=rows)
+
+@app.get("/stats/timeseries", response_model=TimeseriesResponse)
+def get_timeseries(
+    group_by: Optional[str] = Query(None, regex=f"^({'|'.join(GROUP_BY)})$"),
+    bucket: str = Query("auto", regex=f"^(auto|{'|'.join(BUCKETS)})$"),
+    day_from: Optional[date] = Query(None, alias="from"),
+    day_to: Optional[date] = Query(None, alias="to"),
+    feedback_type: Optional[List[str]] = Query(None),
+    product_name: Optional[List[str]] = Query(None),
+    user_role: Optional[List[str]] = Query(None),
+):
+    """Return feedback counts per time bucket as arrays ready for plotting.
+
+    With ``bucket=auto`` the bucket (hour, day, week, month or year) is the
+    finest that keeps the number of points within ``timeseries_max_points``,
+    so the payload stays small whatever the range. Each value of
+    ``group_by`` gets its own series.
+    """
+    try:
+        bucket, starts, series = feedback_service.timeseries(
+            group_by,
+            bucket,
+            settings.timeseries_max_points,
+            day_from=day_from,
+            day_to=day_to,
+            feedback_type=feedback_type,
+            product_name=product_name,
+            user_role=user_role,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return TimeseriesResponse(
+        bucket=bucket,
+        buckets=starts,
+        series=series,
+        total=sum(sum(counts) for counts in series.values()),
+    )
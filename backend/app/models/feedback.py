@@ -1,11 +1,124 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, Dict
+from pydantic import BaseModel, Field, validator
+from datetime import date, datetime, timezone
+from typing import Optional, Dict, List
 
 class Feedback(BaseModel):
+    id: Optional[int] = None  # Assigned by the storage layer on save
     text: str
     feedback_type: str
     responses: Dict
-    created_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))  # Evaluated per record, not once at import
     user_id: Optional[str] = None
-    sentiment_score: Optional[float] = None  # Make sentiment score optional 
\ No newline at end of file
+    sentiment_score: Optional[float] = None  # Make sentiment score optional
+
+
+class IngestError(BaseModel):
+    line: int
+    error: str
+
+class IngestResult(BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[IngestError] = []  # Capped; the counts are always complete
+
+def naive_utc(value: datetime) -> datetime:
+    """Drop timezone info (after converting to UTC) so stored timestamps compare."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+class FeedbackQuery(BaseModel):
+    """Filters for reading feedback back out of the store.
+
+    Each field filter keeps records with any of its values; filters on
+    different fields are combined with AND.
+    """
+    feedback_type: Optional[List[str]] = None
+    user_id: Optional[List[str]] = None
+    product_name: Optional[List[str]] = None
+    user_role: Optional[List[str]] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    @validator("feedback_type", "user_id", "product_name", "user_role", pre=True)
+    def single_value(cls, value):
+        # A single value is a one-value filter
+        return [value] if isinstance(value, str) else value
+
+    def matches(self, record: Dict) -> bool:
+        if self.feedback_type is not None and record.get("feedback_type") not in self.feedback_type:
+            return False
+        if self.user_id is not None and record.get("user_id") not in self.user_id:
+            return False
+        responses = record.get("responses") or {}
+        if self.product_name is not None and responses.get("product_name") not in self.product_name:
+            return False
+        if self.user_role is not None and responses.get("user_role") not in self.user_role:
+            return False
+        if self.created_from is not None or self.created_to is not None:
+            created_at = naive_utc(datetime.fromisoformat(record["created_at"]))
+            if self.created_from is not None and created_at < naive_utc(self.created_from):
+                return False
+            if self.created_to is not None and created_at > naive_utc(self.created_to):
+                return False
+        return True
+
+class FeedbackPage(BaseModel):
+    items: List[Feedback]
+    next_cursor: str  # Always set, so clients can poll for records added later
+    has_more: bool
+
+class RollupRow(BaseModel):
+    day: date
+    feedback_type: str
+    product_name: str
+    user_role: str
+    sentiment: str  # Positive, Neutral, Negative or Unscored
+    count: int
+    sentiment_sum: float  # Sum of scores, for averaging across rows
+
+class StatsResponse(BaseModel):
+    total: int
+    rows: List[RollupRow]
+
+class TimeseriesResponse(BaseModel):
+    bucket: str  # hour, day, week, month or year
+    buckets: List[datetime]  # Start of each bucket, in UTC
+    series: Dict[str, List[int]]  # group value -> count per bucket, aligned with buckets
+    total: int
+
+class SearchResult(BaseModel):
+    score: float
+    feedback: Feedback
+
+class SearchResponse(BaseModel):
+    query: str
+    total: int  # Matching records, of which at most ``limit`` are returned
+    results: List[SearchResult]
+
+class FacetsResponse(BaseModel):
+    total: int  # Records matching every filter
+    facets: Dict[str, Dict[str, int]]  # facet -> value -> count
+
+class DedupStats(BaseModel):
+    checked: int  # Submissions looked up since startup
+    duplicates: int
+    duplicates_by_key: int  # Matched on Idempotency-Key
+    duplicates_by_content: int  # Matched on the content hash
+    duplicate_rate: float
+    entries: int  # Keys currently remembered
+
+class ProfileCapture(BaseModel):
+    name: str  # File name; download with GET /profiles/{name}
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int  # Stack samples taken while the request ran
+    created_at: datetime
+
+class EnrichmentStatus(BaseModel):
+    checkpoint: int  # Every record id below this has been enriched
+    pending: int
+    oldest_unenriched_age_seconds: float
+    workers: int
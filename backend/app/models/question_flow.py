@@ -0,0 +1,264 @@
+from typing import Dict, List
+
+# Question definitions for every feedback flow, shared with the Streamlit chat.
+# Each question has a "key" under which its answer is stored in
+# Feedback.responses and an input "type": selectbox (with "options"),
+# slider (with "min_value"/"max_value"), text_input or text_area.
+
+# Base questions that appear first for all types
+BASE_QUESTIONS: List[Dict] = [
+    {
+        "question": "What type of feedback would you like to provide?",
+        "type": "selectbox",
+        "key": "feedback_type",
+        "options": ["Satisfaction", "Feature", "Bug", "Team Feedback", "Process Feedback", "General"]
+    },
+    {
+        "question": "Which product/service are you providing feedback about?",
+        "type": "text_input",
+        "key": "product_name"
+    },
+    {
+        "question": "What is your role in relation to this product?",
+        "type": "selectbox",
+        "key": "user_role",
+        "options": ["End User", "Developer", "Product Manager", "Stakeholder", "Other"]
+    }
+]
+
+TYPE_SPECIFIC_QUESTIONS: Dict[str, List[Dict]] = {
+    "Satisfaction": [
+        {
+            "question": "How satisfied are you with the product?",
+            "type": "slider",
+            "key": "satisfaction_score",
+            "min_value": 1,
+            "max_value": 5
+        },
+        {
+            "question": "What do you like most about the product?",
+            "type": "text_area",
+            "key": "positive_feedback"
+        },
+        {
+            "question": "What are your main pain points?",
+            "type": "text_area",
+            "key": "pain_points"
+        },
+        {
+            "question": "Would you recommend this product to others?",
+            "type": "selectbox",
+            "key": "nps",
+            "options": ["Definitely", "Probably", "Not Sure", "Probably Not", "Definitely Not"]
+        }
+    ],
+    "Feature": [
+        {
+            "question": "What new feature would you like to suggest?",
+            "type": "text_area",
+            "key": "feature_description"
+        },
+        {
+            "question": "What problem would this feature solve?",
+            "type": "text_area",
+            "key": "problem_solution"
+        },
+        {
+            "question": "How often would you use this feature?",
+            "type": "selectbox",
+            "key": "usage_frequency",
+            "options": ["Multiple times daily", "Daily", "Weekly", "Monthly", "Occasionally"]
+        },
+        {
+            "question": "What is the business impact of this feature?",
+            "type": "selectbox",
+            "key": "business_impact",
+            "options": ["Revenue Increase", "Cost Reduction", "User Satisfaction", "Efficiency Improvement", "Competitive Advantage", "Other"]
+        },
+        {
+            "question": "How urgent is this feature request?",
+            "type": "selectbox",
+            "key": "urgency",
+            "options": ["Critical - Blocking Work", "High - Major Impact", "Medium - Significant Value", "Low - Nice to Have"]
+        }
+    ],
+    "Bug": [
+        {
+            "question": "What is the severity of this issue?",
+            "type": "selectbox",
+            "key": "severity",
+            "options": ["Critical - System Unusable", "High - Major Feature Broken", "Medium - Feature Partially Working", "Low - Minor Issue"]
+        },
+        {
+            "question": "Please describe the issue:",
+            "type": "text_area",
+            "key": "bug_description"
+        },
+        {
+            "question": "What steps can reproduce this issue?",
+            "type": "text_area",
+            "key": "reproduction_steps"
+        },
+        {
+            "question": "What is the impact on your work?",
+            "type": "text_area",
+            "key": "impact_description"
+        },
+        {
+            "question": "How often does this occur?",
+            "type": "selectbox",
+            "key": "frequency",
+            "options": ["Every time", "Frequently", "Sometimes", "Rarely", "First time"]
+        }
+    ],
+    "General": [
+        {
+            "question": "Which aspect would you like to discuss?",
+            "type": "selectbox",
+            "key": "feedback_area",
+            "options": ["User Experience", "Performance", "Documentation", "Support", "Pricing", "Other"]
+        },
+        {
+            "question": "Please provide your feedback:",
+            "type": "text_area",
+            "key": "general_feedback"
+        },
+        {
+            "question": "How could we improve your experience?",
+            "type": "text_area",
+            "key": "improvement_suggestions"
+        },
+        {
+            "question": "Would you be interested in discussing this further?",
+            "type": "selectbox",
+            "key": "follow_up",
+            "options": ["Yes", "Maybe", "No"]
+        }
+    ],
+    "Team Feedback": [
+        {
+            "question": "Which team are you providing feedback about?",
+            "type": "selectbox",
+            "key": "team_type",
+            "options": ["Development Team", "Product Team", "Design Team", "QA Team", "Cross-functional Team"]
+        },
+        {
+            "question": "How would you rate the team's technical expertise?",
+            "type": "slider",
+            "key": "technical_expertise",
+            "min_value": 1,
+            "max_value": 5
+        },
+        {
+            "question": "How would you rate the team's communication?",
+            "type": "slider",
+            "key": "communication_rating",
+            "min_value": 1,
+            "max_value": 5
+        },
+        {
+            "question": "How well does the team meet deadlines?",
+            "type": "slider",
+            "key": "deadline_adherence",
+            "min_value": 1,
+            "max_value": 5
+        },
+        {
+            "question": "What are the team's strongest points?",
+            "type": "text_area",
+            "key": "team_strengths"
+        },
+        {
+            "question": "What areas could the team improve?",
+            "type": "text_area",
+            "key": "team_improvements"
+        },
+        {
+            "question": "How well does the team handle feedback and criticism?",
+            "type": "selectbox",
+            "key": "feedback_handling",
+            "options": ["Very Well", "Well", "Neutral", "Needs Improvement", "Poor"]
+        },
+        {
+            "question": "How would you rate the team's documentation practices?",
+            "type": "selectbox",
+            "key": "documentation_quality",
+            "options": ["Excellent", "Good", "Adequate", "Needs Improvement", "Poor"]
+        }
+    ],
+    "Process Feedback": [
+        {
+            "question": "Which process area are you providing feedback about?",
+            "type": "selectbox",
+            "key": "process_area",
+            "options": ["Sprint Planning", "Product Roadmap", "Release Process", "Development Workflow", "Code Review", "Testing Process", "Other"]
+        },
+        {
+            "question": "How efficient is the current process?",
+            "type": "slider",
+            "key": "process_efficiency",
+            "min_value": 1,
+            "max_value": 5
+        },
+        {
+            "question": "What are the main bottlenecks in the current process?",
+            "type": "text_area",
+            "key": "process_bottlenecks"
+        },
+        {
+            "question": "How well are requirements communicated?",
+            "type": "selectbox",
+            "key": "requirements_clarity",
+            "options": ["Very Clear", "Clear", "Somewhat Clear", "Unclear", "Very Unclear"]
+        },
+        {
+            "question": "How would you rate the decision-making process?",
+            "type": "selectbox",
+            "key": "decision_making",
+            "options": ["Very Efficient", "Efficient", "Neutral", "Inefficient", "Very Inefficient"]
+        },
+        {
+            "question": "How well are project priorities communicated?",
+            "type": "selectbox",
+            "key": "priority_communication",
+            "options": ["Excellent", "Good", "Fair", "Poor", "Very Poor"]
+        },
+        {
+            "question": "What process improvements would you suggest?",
+            "type": "text_area",
+            "key": "process_improvements"
+        },
+        {
+            "question": "How well does the current process handle:",
+            "type": "selectbox",
+            "key": "process_handling",
+            "options": ["Change Requests", "Resource Allocation", "Risk Management", "Quality Assurance", "Stakeholder Communication"]
+        },
+        {
+            "question": "What metrics would you suggest tracking to improve the process?",
+            "type": "text_area",
+            "key": "suggested_metrics"
+        }
+    ]
+}
+
+
+FEEDBACK_TYPES = list(TYPE_SPECIFIC_QUESTIONS)
+
+
+def get_question_flow(feedback_type: str) -> List[Dict]:
+    return BASE_QUESTIONS + TYPE_SPECIFIC_QUESTIONS.get(feedback_type, [])
+
+
+def all_questions() -> List[Dict]:
+    """Every question across all flows, each key once, in flow order."""
+    questions = {}
+    for feedback_type in FEEDBACK_TYPES:
+        for question in get_question_flow(feedback_type):
+            questions.setdefault(question["key"], question)
+    return list(questions.values())
+
+
+def free_text_keys() -> List[str]:
+    """Keys of the long-form text answers (text areas) across all flows."""
+    return [question["key"] for question in all_questions() if question["type"] == "text_area"]
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from ..config import Settings, settings as default_settings
+from .feedback_service import FeedbackService
+
+
+class CompactionService:
+    """Periodically compacts the feedback log into time partitions.
+
+    Each pass moves sealed log segments into month or day partitions,
+    merges small fragments of a partition, and turns partitions older than
+    ``archive_after_days`` into read-only gzip archives. The log stays
+    readable and writable throughout; see ``LogStore.compact``.
+    """
+
+    def __init__(self, feedback_service: FeedbackService, settings: Settings = default_settings):
+        self.feedback_service = feedback_service
+        self.settings = settings
+        self._task: Optional[asyncio.Task] = None
+
+    def compact(self) -> Dict[str, int]:
+        archive_before = None
+        if self.settings.archive_after_days > 0:
+            archive_before = datetime.utcnow() - timedelta(days=self.settings.archive_after_days)
+        return self.feedback_service.store.compact(archive_before)
+
+    # Periodic job
+
+    async def start(self) -> None:
+        if self.settings.compaction_interval_seconds > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.settings.compaction_interval_seconds)
+            try:
+                await loop.run_in_executor(None, self.compact)
+            except Exception:
+                # Nothing is dropped from the manifest until its records are copied,
+                # so a failed pass is simply retried at the next interval
+                pass
+
+
+if __name__ == "__main__":
+    # python -m backend.app.services.compaction_service runs one pass and exits;
+    # stop the API (or writer process) first, since only the log's writer may compact it
+    print(CompactionService(FeedbackService()).compact())
@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+from ..models.feedback import DedupStats, Feedback
+
+
+def content_hash(feedback: Feedback) -> str:
+    """Hash what makes two submissions the same feedback.
+
+    ``created_at`` and ``text`` are left out: a double-click sends a new
+    timestamp, and the chat UI's ``text`` is derived from ``responses``.
+    Keys are sorted and string answers stripped, so formatting differences
+    do not hide a duplicate.
+    """
+    responses = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in feedback.responses.items()
+    }
+    canonical = json.dumps(
+        [feedback.feedback_type, feedback.user_id, responses],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyConflict(ValueError):
+    """An ``Idempotency-Key`` was reused for a different submission."""
+
+
+class DedupIndex:
+    """Recently saved submissions, by idempotency key and by content hash.
+
+    Content hashes are only matched for submissions with a ``user_id``:
+    without one, two people giving the same answers would look like one
+    person submitting twice. Anonymous repeats are caught by key only.
+
+    Entries expire after ``window_seconds`` and the oldest are evicted beyond
+    ``max_entries``, so memory stays bounded. While the first copy of a
+    submission is still being written its entry holds the pending future, so
+    a duplicate arriving at the same moment waits for that write instead of
+    starting its own. Everything runs on the event loop, so no lock is needed.
+    """
+
+    def __init__(self, window_seconds: float = 600, max_entries: int = 100000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        # key -> (expires_at, content hash, record id or future of it)
+        self._entries: "OrderedDict[str, Tuple[float, str, Union[int, asyncio.Future]]]" = OrderedDict()
+        self._checked = 0
+        self._by_key = 0
+        self._by_content = 0
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def lookup(
+        self, idempotency_key: Optional[str], digest: str, by_content: bool = True
+    ) -> Optional[Union[int, asyncio.Future]]:
+        """Return the record id (or pending write) of an earlier copy, if any.
+
+        ``by_content=False`` only matches the idempotency key.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        self._checked += 1
+        if idempotency_key is not None:
+            entry = self._entries.get("key:" + idempotency_key)
+            if entry is not None:
+                if entry[1] != digest:
+                    raise IdempotencyConflict("Idempotency-Key was already used for a different submission")
+                self._by_key += 1
+                return entry[2]
+        entry = self._entries.get("content:" + digest) if by_content else None
+        if entry is not None:
+            self._by_content += 1
+            return entry[2]
+        return None
+
+    def _keys(self, idempotency_key: Optional[str], digest: str, by_content: bool) -> List[str]:
+        keys = ["content:" + digest] if by_content else []
+        if idempotency_key is not None:
+            keys.append("key:" + idempotency_key)
+        return keys
+
+    def remember(
+        self, idempotency_key: Optional[str], digest: str, value: Union[int, asyncio.Future], by_content: bool = True
+    ) -> None:
+        expires_at = time.monotonic() + self.window_seconds
+        for key in self._keys(idempotency_key, digest, by_content):
+            self._entries[key] = (expires_at, digest, value)
+            self._entries.move_to_end(key)
+
+    def forget(self, idempotency_key: Optional[str], digest: str, by_content: bool = True) -> None:
+        """Drop the entries of a write that failed, so a retry is written again."""
+        for key in self._keys(idempotency_key, digest, by_content):
+            self._entries.pop(key, None)
+
+    def stats(self) -> DedupStats:
+        duplicates = self._by_key + self._by_content
+        return DedupStats(
+            checked=self._checked,
+            duplicates=duplicates,
+            duplicates_by_key=self._by_key,
+            duplicates_by_content=self._by_content,
+            duplicate_rate=duplicates / self._checked if self._checked else 0.0,
+            entries=len(self._entries),
+        )
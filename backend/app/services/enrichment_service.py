@@ -0,0 +1,248 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, List, Optional, Tuple
+from ..config import Settings
+from ..models.feedback import EnrichmentStatus
+from .feedback_service import FeedbackService
+from .sentiment_service import SentimentService, feedback_text
+
+# Scorer owned by each worker process, created by the pool initializer
+_worker_scorer: Optional[SentimentService] = None
+
+
+def _init_worker(cache_size: int) -> None:
+    global _worker_scorer
+    _worker_scorer = SentimentService(cache_size=cache_size)
+
+
+def _score_texts(texts: List[str]) -> List[float]:
+    return _worker_scorer.analyze_batch(texts)
+
+
+class EnrichmentService:
+    """Scores saved feedback for sentiment in the background.
+
+    The log itself is the work queue: record ids are dense, so everything
+    from the persisted checkpoint up to the end of the store is pending. Batches
+    of ids are handed to a pool of worker processes, and scores are written
+    back through the store's sentiment column. The checkpoint only moves past
+    a batch once it and every batch before it are written, so a restart
+    resumes without skipping records. A failed batch is retried after
+    ``RETRY_SECONDS``, with or without new saves. If a worker process dies,
+    the pool is replaced and its batches are retried the same way.
+
+    Lag is measured from when this process first saw a record in the store,
+    not from its client-supplied ``created_at``, so backfilled records do
+    not report years of lag. Records left from before a restart count from
+    the restart. ``pending`` and ``status`` are also called from metrics
+    scrapes on other threads, so the checkpoint and arrivals are only
+    changed under ``_lock``.
+    """
+
+    CHECKPOINT_FILE = "enrichment.json"
+    RETRY_SECONDS = 5.0
+    # Arrival times kept; beyond this, new arrivals are folded into the last one
+    MAX_ARRIVALS = 1024
+
+    def __init__(self, feedback_service: FeedbackService, settings: Settings):
+        self.feedback_service = feedback_service
+        self.settings = settings
+        self.checkpoint_file = os.path.join(feedback_service.store.directory, self.CHECKPOINT_FILE)
+        self.checkpoint = self._load_checkpoint()
+        self._dispatched = self.checkpoint
+        # Batches in flight or finished but not yet covered by the checkpoint: start -> (end, done)
+        self._batches: Dict[int, Tuple[int, bool]] = {}
+        # Failed batches: (start, end, monotonic time they are due again)
+        self._retry: List[Tuple[int, int, float]] = []
+        # (store length, wall time it was first seen), oldest first, for the lag of pending records
+        self._arrivals: Deque[Tuple[int, float]] = deque()
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pool: Optional[Executor] = None
+
+    def _load_checkpoint(self) -> int:
+        if not os.path.exists(self.checkpoint_file):
+            return 0
+        with open(self.checkpoint_file, "r") as f:
+            return json.load(f)["checkpoint"]
+
+    def _save_checkpoint(self) -> None:
+        tmp_path = self.checkpoint_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"checkpoint": self.checkpoint}, f)
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def _new_pool(self) -> Executor:
+        if self.settings.enrichment_workers > 0:
+            # Spawned rather than forked, since the parent already runs threads
+            return ProcessPoolExecutor(
+                max_workers=self.settings.enrichment_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.settings.sentiment_cache_size,),
+            )
+        return ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="enrichment",
+            initializer=_init_worker,
+            initargs=(self.settings.sentiment_cache_size,),
+        )
+
+    def _replace_pool(self, broken: Executor) -> None:
+        """Swap in a new pool for one whose worker died; batches in flight on it fail and are retried."""
+        if self._pool is broken:
+            self._pool = self._new_pool()
+            broken.shutdown(wait=False)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._pool = self._new_pool()
+        self._wakeup = asyncio.Event()
+        # Pick up whatever was left unscored before the last shutdown
+        self._wakeup.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def notify(self) -> None:
+        """Signal that new records were saved."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._pool.shutdown(wait=True)
+
+    def _observe(self) -> int:
+        """Note when the store grew, drop arrivals the checkpoint has passed, and return its length."""
+        size = len(self.feedback_service.store)
+        with self._lock:
+            if size > (self._arrivals[-1][0] if self._arrivals else self.checkpoint):
+                if len(self._arrivals) >= self.MAX_ARRIVALS:
+                    self._arrivals[-1] = (size, self._arrivals[-1][1])
+                else:
+                    self._arrivals.append((size, time.time()))
+            while self._arrivals and self._arrivals[0][0] <= self.checkpoint:
+                self._arrivals.popleft()
+        return size
+
+    def _retry_delay(self) -> Optional[float]:
+        """Seconds until the next failed batch is due again, or None without any."""
+        if not self._retry:
+            return None
+        return max(min(due for _, _, due in self._retry) - time.monotonic(), 0.0)
+
+    async def _run(self) -> None:
+        in_flight = set()
+        max_in_flight = max(self.settings.enrichment_workers, 1) * 2
+        try:
+            while True:
+                if not in_flight:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self._retry_delay())
+                    except asyncio.TimeoutError:
+                        pass
+                self._wakeup.clear()
+                store_size = self._observe()
+                now = time.monotonic()
+                due = [batch for batch in self._retry if batch[2] <= now]
+                while len(in_flight) < max_in_flight and (due or self._dispatched < store_size):
+                    if due:
+                        batch = due.pop()
+                        self._retry.remove(batch)
+                        start, end, _ = batch
+                    else:
+                        start = self._dispatched
+                        end = min(start + self.settings.enrichment_batch_size, store_size)
+                        self._dispatched = end
+                        self._batches[start] = (end, False)
+                    in_flight.add(asyncio.ensure_future(self._enrich(start, end)))
+                if in_flight:
+                    wakeup = asyncio.ensure_future(self._wakeup.wait())
+                    done, _ = await asyncio.wait(
+                        in_flight | {wakeup}, timeout=self._retry_delay(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    wakeup.cancel()
+                    in_flight -= done
+                    for task in done - {wakeup}:
+                        self._finish(*task.result())
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _enrich(self, start: int, end: int) -> Tuple[int, bool]:
+        loop = asyncio.get_running_loop()
+        store = self.feedback_service.store
+        pool = self._pool
+        try:
+            records = await loop.run_in_executor(None, lambda: list(store.iter_records(start, end)))
+            # Scores supplied by the client are kept, and records without free text stay unscored
+            pending = []
+            texts = []
+            for record in records:
+                text = feedback_text(record.get("responses") or {})
+                if record.get("sentiment_score") is None and text:
+                    pending.append(record)
+                    texts.append(text)
+            if texts:
+                scores = await loop.run_in_executor(pool, _score_texts, texts)
+                await self.feedback_service.set_sentiment(pending, scores)
+            return start, True
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            return start, False
+        except Exception:
+            # The checkpoint stays behind this batch until a retry succeeds
+            return start, False
+
+    def _finish(self, start: int, succeeded: bool) -> None:
+        end, _ = self._batches[start]
+        self._batches[start] = (end, succeeded)
+        if not succeeded:
+            self._retry.append((start, end, time.monotonic() + self.RETRY_SECONDS))
+        checkpoint = self.checkpoint
+        while checkpoint in self._batches and self._batches[checkpoint][1]:
+            checkpoint = self._batches.pop(checkpoint)[0]
+        if checkpoint != self.checkpoint:
+            with self._lock:
+                self.checkpoint = checkpoint
+            self._save_checkpoint()
+
+    def pending(self) -> int:
+        """Records saved but not yet covered by the checkpoint."""
+        if self._task is None and self.feedback_service.writer is not None:
+            # Enrichment runs in the writer process; follow its checkpoint and the store
+            checkpoint = self._load_checkpoint()
+            with self._lock:
+                self.checkpoint = checkpoint
+            self.feedback_service.refresh()
+        return max(self._observe() - self.checkpoint, 0)
+
+    def status(self) -> EnrichmentStatus:
+        pending = self.pending()
+        with self._lock:
+            checkpoint = self.checkpoint
+            oldest = self._arrivals[0][1] if self._arrivals else None
+        lag_seconds = 0.0
+        if pending > 0 and oldest is not None:
+            lag_seconds = max(time.time() - oldest, 0.0)
+        return EnrichmentStatus(
+            checkpoint=checkpoint,
+            pending=pending,
+            oldest_unenriched_age_seconds=lag_seconds,
+            workers=self.settings.enrichment_workers,
+        )
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+from ..models.question_flow import all_questions, get_question_flow
+
+# Columns every CSV export starts with; one column per question key of the flows follows
+BASE_COLUMNS = ("id", "created_at", "feedback_type", "user_id", "sentiment_score")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Output is handed to the response in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+
+def csv_columns(feedback_types: Optional[List[str]] = None) -> List[str]:
+    """CSV header: the base columns, then the question keys of the given flows or of all flows."""
+    if feedback_types:
+        questions = [question for feedback_type in feedback_types for question in get_question_flow(feedback_type)]
+    else:
+        questions = all_questions()
+    keys = dict.fromkeys(question["key"] for question in questions if question["key"] not in BASE_COLUMNS)
+    return list(BASE_COLUMNS) + list(keys)
+
+
+def _cell(value):
+    # Answers are scalars in every flow today; anything nested is kept as JSON
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def ndjson_chunks(records: Iterable[Dict]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for record in records:
+        buffer += json.dumps(record, separators=(",", ":")).encode("utf-8")
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def csv_chunks(records: Iterable[Dict], columns: List[str]) -> Iterator[bytes]:
+    """Write records as CSV rows, flattening ``responses`` into one column per question key.
+
+    The ``text`` field, a copy of ``responses``, and answers to keys outside
+    ``columns`` are left out.
+    """
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    question_columns = columns[len(BASE_COLUMNS):]
+    for record in records:
+        responses = record.get("responses") or {}
+        writer.writerow(
+            [record.get(column) for column in BASE_COLUMNS]
+            + [_cell(responses.get(key)) for key in question_columns]
+        )
+        if text.tell() >= CHUNK_BYTES:
+            yield text.getvalue().encode("utf-8")
+            text.seek(0)
+            text.truncate()
+    if text.tell():
+        yield text.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into one gzip stream as they are produced."""
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,275 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..models.question_flow import all_questions
+from .feedback_index import GrowableArray, _insert_sorted
+from .sentiment_service import sentiment_label
+
+# Ids are split into chunks of 2^16; each chunk is stored as a sorted array of
+# 16-bit offsets while sparse and as a 1024-word bitset once it is dense
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+ARRAY_MAX = 4096
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words: np.ndarray) -> int:
+        return int(np.bitwise_count(words).sum())
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> int:
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum())
+
+
+def _offsets_to_words(offsets: np.ndarray) -> np.ndarray:
+    bits = np.zeros(CHUNK_SIZE, dtype=bool)
+    bits[offsets] = True
+    return np.packbits(bits, bitorder="little").view("<u8").copy()
+
+
+# Chunk id -> bitset words; ``None`` stands for "every record"
+Mask = Optional[Dict[int, np.ndarray]]
+
+
+def _intersect(left: Mask, right: Mask) -> Mask:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return {chunk: words & right[chunk] for chunk, words in left.items() if chunk in right}
+
+
+class Bitmap:
+    """A compressed set of record ids, chunked like a Roaring bitmap."""
+
+    __slots__ = ("_chunks", "cardinality")
+
+    def __init__(self):
+        # chunk -> GrowableArray of uint16 offsets, or an ndarray of uint64 words
+        self._chunks: Dict[int, object] = {}
+        self.cardinality = 0
+
+    def add(self, record_id: int) -> None:
+        chunk, offset = record_id >> CHUNK_BITS, record_id & (CHUNK_SIZE - 1)
+        container = self._chunks.get(chunk)
+        if container is None:
+            container = self._chunks[chunk] = GrowableArray(np.uint16, capacity=4)
+        if isinstance(container, GrowableArray):
+            offsets = container.view()
+            position = np.searchsorted(offsets, offset)
+            if position < len(offsets) and offsets[position] == offset:
+                return
+            _insert_sorted(container, offset)
+            if container.size > ARRAY_MAX:
+                self._chunks[chunk] = _offsets_to_words(container.view())
+        else:
+            word, bit = offset >> 6, np.uint64(1) << np.uint64(offset & 63)
+            if container[word] & bit:
+                return
+            container[word] |= bit
+        self.cardinality += 1
+
+    def remove(self, record_id: int) -> None:
+        chunk, offset = record_id >> CHUNK_BITS, record_id & (CHUNK_SIZE - 1)
+        container = self._chunks.get(chunk)
+        if container is None:
+            return
+        if isinstance(container, GrowableArray):
+            offsets = container.view()
+            position = np.searchsorted(offsets, offset)
+            if position == len(offsets) or offsets[position] != offset:
+                return
+            remaining = np.delete(offsets, position)
+            if not len(remaining):
+                del self._chunks[chunk]
+            else:
+                container = self._chunks[chunk] = GrowableArray(np.uint16, capacity=len(remaining))
+                container.data[:len(remaining)] = remaining
+                container.size = len(remaining)
+        else:
+            word, bit = offset >> 6, np.uint64(1) << np.uint64(offset & 63)
+            if not container[word] & bit:
+                return
+            container[word] &= ~bit
+        self.cardinality -= 1
+
+    def to_mask(self) -> Dict[int, np.ndarray]:
+        return {
+            chunk: _offsets_to_words(container.view()) if isinstance(container, GrowableArray) else container.copy()
+            for chunk, container in self._chunks.items()
+        }
+
+    def count(self, mask: Mask) -> int:
+        """Size of the intersection with ``mask``."""
+        if mask is None:
+            return self.cardinality
+        total = 0
+        for chunk, container in self._chunks.items():
+            words = mask.get(chunk)
+            if words is None:
+                continue
+            if isinstance(container, GrowableArray):
+                offsets = container.view().astype(np.uint64)
+                total += int(((words[offsets >> np.uint64(6)] >> (offsets & np.uint64(63))) & np.uint64(1)).sum())
+            else:
+                total += _popcount(words & container)
+        return total
+
+    @property
+    def nbytes(self) -> int:
+        return sum(container.nbytes for container in self._chunks.values())
+
+
+def _facet_fields() -> Dict[str, Callable[[Dict], Optional[str]]]:
+    fields: Dict[str, Callable[[Dict], Optional[str]]] = {
+        "feedback_type": lambda record: record.get("feedback_type"),
+        "product_name": lambda record: (record.get("responses") or {}).get("product_name"),
+        "sentiment": lambda record: sentiment_label(record.get("sentiment_score")),
+    }
+    for question in all_questions():
+        key = question["key"]
+        if question["type"] == "selectbox" and key not in fields:
+            fields[key] = lambda record, key=key: (record.get("responses") or {}).get(key)
+    return fields
+
+
+class FacetIndex:
+    """One bitmap per facet value, for drill-down counts.
+
+    Facets are the feedback type, product, sentiment bucket and every
+    selectbox answer in the question flows. Counting a facet value under a
+    filter is an intersection of bitmaps, so the cost depends on the number of
+    facet values and id chunks rather than on scanning records.
+    """
+
+    FACETS = _facet_fields()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bitmaps: Dict[str, Dict[str, Bitmap]] = {facet: {} for facet in self.FACETS}
+        self._records = 0
+
+    def add(self, record: Dict) -> None:
+        with self._lock:
+            self._add(record)
+
+    def add_many(self, records: Iterable[Dict]) -> None:
+        with self._lock:
+            for record in records:
+                self._add(record)
+
+    def _add(self, record: Dict) -> None:
+        for facet, extract in self.FACETS.items():
+            value = extract(record)
+            if value is None or value == "":
+                continue
+            bitmap = self._bitmaps[facet].get(str(value))
+            if bitmap is None:
+                bitmap = self._bitmaps[facet][str(value)] = Bitmap()
+            bitmap.add(record["id"])
+        self._records = max(self._records, record["id"] + 1)
+
+    def update_sentiment(self, records: Iterable[Dict], scores: Iterable[float]) -> None:
+        """Move records to the sentiment bucket of their new score."""
+        with self._lock:
+            sentiments = self._bitmaps["sentiment"]
+            for record, score in zip(records, scores):
+                old, new = sentiment_label(record.get("sentiment_score")), sentiment_label(score)
+                if old == new:
+                    continue
+                if old in sentiments:
+                    sentiments[old].remove(record["id"])
+                sentiments.setdefault(new, Bitmap()).add(record["id"])
+
+    def _facet_mask(self, facet: str, values: List[str]) -> Dict[int, np.ndarray]:
+        mask: Dict[int, np.ndarray] = {}
+        for value in values:
+            bitmap = self._bitmaps[facet].get(value)
+            if bitmap is None:
+                continue
+            for chunk, words in bitmap.to_mask().items():
+                if chunk in mask:
+                    mask[chunk] |= words
+                else:
+                    mask[chunk] = words
+        return mask
+
+    @staticmethod
+    def ids_to_mask(ids: np.ndarray) -> Dict[int, np.ndarray]:
+        """Turn an ascending id array into a mask."""
+        mask = {}
+        chunks = ids >> CHUNK_BITS
+        boundaries = np.flatnonzero(np.diff(chunks)) + 1
+        for part in np.split(ids, boundaries) if len(ids) else []:
+            mask[int(part[0] >> CHUNK_BITS)] = _offsets_to_words(part & (CHUNK_SIZE - 1))
+        return mask
+
+    def counts(self, filters: Dict[str, List[str]], ids: Optional[np.ndarray] = None) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """Count records per facet value under ``filters``.
+
+        ``filters`` maps a facet to the values to keep (any of them); facets
+        are combined with AND. Each facet's counts apply every filter except
+        its own, so a multiselect keeps showing its unselected options. ``ids``
+        optionally restricts all counts to an ascending id array, e.g. a time
+        range from the secondary indexes. Returns the number of records
+        matching every filter, and the counts.
+        """
+        with self._lock:
+            base: Mask = None if ids is None else self.ids_to_mask(ids)
+            facet_masks = {facet: self._facet_mask(facet, values) for facet, values in filters.items()}
+            full = base
+            for mask in facet_masks.values():
+                full = _intersect(full, mask)
+            if full is None:
+                total = self._records
+            else:
+                total = sum(_popcount(words) for words in full.values())
+
+            counts = {}
+            for facet, bitmaps in self._bitmaps.items():
+                if facet in filters:
+                    mask = base
+                    for other, other_mask in facet_masks.items():
+                        if other != facet:
+                            mask = _intersect(mask, other_mask)
+                else:
+                    mask = full
+                counts[facet] = self._count_values(bitmaps, mask)
+            return total, counts
+
+    @staticmethod
+    def _count_values(bitmaps: Dict[str, Bitmap], mask: Mask) -> Dict[str, int]:
+        values = list(bitmaps)
+        if mask is None:
+            counts = [bitmaps[value].cardinality for value in values]
+        else:
+            counts = [0] * len(values)
+            for chunk, words in mask.items():
+                # Sparse containers of all values are tested against the mask in one pass
+                offsets, owners, sizes = [], [], []
+                for i, value in enumerate(values):
+                    container = bitmaps[value]._chunks.get(chunk)
+                    if container is None:
+                        continue
+                    if isinstance(container, GrowableArray):
+                        offsets.append(container.data[:container.size])
+                        owners.append(i)
+                        sizes.append(container.size)
+                    else:
+                        counts[i] += _popcount(words & container)
+                if offsets:
+                    offsets = np.concatenate(offsets).astype(np.uint64)
+                    hits = (words[offsets >> np.uint64(6)] >> (offsets & np.uint64(63))) & np.uint64(1)
+                    owner_ids = np.repeat(np.array(owners), sizes)
+                    for i, count in enumerate(np.bincount(owner_ids, weights=hits, minlength=len(values)).tolist()):
+                        counts[i] += int(count)
+        return {value: count for value, count in zip(values, counts) if count}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "values": sum(len(bitmaps) for bitmaps in self._bitmaps.values()),
+                "bytes": sum(
+                    bitmap.nbytes for bitmaps in self._bitmaps.values() for bitmap in bitmaps.values()
+                ),
+            }
@@ -0,0 +1,269 @@
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..models.feedback import FeedbackQuery, naive_utc
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: datetime) -> float:
+    return (naive_utc(value) - EPOCH).total_seconds()
+
+
+class GrowableArray:
+    """A NumPy array that grows by doubling, like a list.
+
+    The backing array is replaced rather than resized when it grows or when a
+    value is inserted out of order, so views handed out earlier stay valid.
+    """
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, capacity: int = 16):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def _reserve(self, size: int) -> None:
+        if size > len(self.data):
+            grown = np.empty(max(size, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def append(self, value) -> None:
+        self._reserve(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def insert(self, position: int, value) -> None:
+        if position == self.size:
+            self.append(value)
+            return
+        grown = np.empty(max(self.size + 1, len(self.data)), dtype=self.data.dtype)
+        grown[:position] = self.data[:position]
+        grown[position] = value
+        grown[position + 1:self.size + 1] = self.data[position:self.size]
+        self.data = grown
+        self.size += 1
+
+    def set(self, position: int, value, fill) -> None:
+        """Assign ``value`` at ``position``, padding any gap with ``fill``."""
+        if position >= self.size:
+            self._reserve(position + 1)
+            self.data[self.size:position] = fill
+            self.size = position + 1
+        self.data[position] = value
+
+    @classmethod
+    def from_array(cls, values: np.ndarray) -> "GrowableArray":
+        column = cls(values.dtype, capacity=max(len(values), 16))
+        column.data[:len(values)] = values
+        column.size = len(values)
+        return column
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+def _insert_sorted(column: GrowableArray, value) -> int:
+    """Insert into an ascending column; the common in-order case is an append."""
+    if column.size == 0 or value >= column.data[column.size - 1]:
+        column.append(value)
+        return column.size - 1
+    position = int(np.searchsorted(column.view(), value, side="right"))
+    column.insert(position, value)
+    return position
+
+
+class FeedbackIndex:
+    """In-memory secondary indexes over stored feedback.
+
+    Each indexed field maps a value to the ascending list of record ids that
+    have it. ``created_at`` is kept twice: by id, for filtering a candidate
+    set, and sorted by time, for range queries without other filters.
+    Queries intersect these arrays instead of scanning records.
+
+    Records arriving in time order are appended to the time-sorted arrays.
+    Older ones (backfills, out-of-order loads) are buffered unsorted and
+    merged in with one sort and one copy when a range query next needs them,
+    so loading them costs O(n log n) rather than a copy per record.
+    """
+
+    FIELDS: Dict[str, Callable[[Dict], Optional[str]]] = {
+        "feedback_type": lambda record: record.get("feedback_type"),
+        "user_id": lambda record: record.get("user_id"),
+        "product_name": lambda record: (record.get("responses") or {}).get("product_name"),
+        "user_role": lambda record: (record.get("responses") or {}).get("user_role"),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, GrowableArray]] = {field: {} for field in self.FIELDS}
+        self._created_at_by_id = GrowableArray(np.float64)
+        self._sorted_created_at = GrowableArray(np.float64)
+        self._sorted_ids = GrowableArray(np.int64)
+        # Records older than the newest sorted one, merged in by _merge_unsorted
+        self._unsorted_created_at = GrowableArray(np.float64)
+        self._unsorted_ids = GrowableArray(np.int64)
+
+    def __len__(self) -> int:
+        return self._created_at_by_id.size
+
+    def add(self, record: Dict) -> None:
+        with self._lock:
+            self._add(record)
+
+    def add_many(self, records: Iterable[Dict]) -> None:
+        with self._lock:
+            for record in records:
+                self._add(record)
+
+    def _add(self, record: Dict) -> None:
+        record_id = record["id"]
+        for field, extract in self.FIELDS.items():
+            value = extract(record)
+            if value is None:
+                continue
+            postings = self._postings[field].get(str(value))
+            if postings is None:
+                postings = self._postings[field][str(value)] = GrowableArray(np.int64, capacity=4)
+            _insert_sorted(postings, record_id)
+        created_at = to_epoch(datetime.fromisoformat(record["created_at"]))
+        self._created_at_by_id.set(record_id, created_at, np.nan)
+        sorted_times = self._sorted_created_at
+        if self._unsorted_ids.size == 0 and (sorted_times.size == 0 or created_at >= sorted_times.data[sorted_times.size - 1]):
+            sorted_times.append(created_at)
+            self._sorted_ids.append(record_id)
+        else:
+            self._unsorted_created_at.append(created_at)
+            self._unsorted_ids.append(record_id)
+
+    def _merge_unsorted(self) -> None:
+        """Merge the buffered out-of-order records into the time-sorted arrays; call with the lock held."""
+        if self._unsorted_ids.size == 0:
+            return
+        times = self._unsorted_created_at.view()
+        order = np.argsort(times, kind="stable")
+        times, ids = times[order], self._unsorted_ids.view()[order]
+        # Equal times go after the ones already sorted, as appends would
+        positions = np.searchsorted(self._sorted_created_at.view(), times, side="right")
+        self._sorted_created_at = GrowableArray.from_array(np.insert(self._sorted_created_at.view(), positions, times))
+        self._sorted_ids = GrowableArray.from_array(np.insert(self._sorted_ids.view(), positions, ids))
+        self._unsorted_created_at = GrowableArray(np.float64)
+        self._unsorted_ids = GrowableArray(np.int64)
+
+    def select(self, query: FeedbackQuery) -> np.ndarray:
+        """Return the ascending ids of all records matching ``query``."""
+        with self._lock:
+            postings = []
+            for field in self.FIELDS:
+                values = getattr(query, field, None)
+                if values is None:
+                    continue
+                columns = [self._postings[field].get(str(value)) for value in values]
+                columns = [column.view() for column in columns if column is not None]
+                if not columns:
+                    return np.empty(0, dtype=np.int64)
+                # Any of the values: merge their posting lists (each id has one value per field)
+                postings.append(columns[0] if len(columns) == 1 else np.sort(np.concatenate(columns)))
+
+            start = to_epoch(query.created_from) if query.created_from else -np.inf
+            end = to_epoch(query.created_to) if query.created_to else np.inf
+            if not postings:
+                if query.created_from is None and query.created_to is None:
+                    return np.arange(len(self), dtype=np.int64)
+                # Only a time range: slice the time-sorted index
+                self._merge_unsorted()
+                times = self._sorted_created_at.view()
+                lo = np.searchsorted(times, start, side="left")
+                hi = np.searchsorted(times, end, side="right")
+                return np.sort(self._sorted_ids.view()[lo:hi])
+
+            # Start from the most selective posting list and probe the others
+            postings.sort(key=len)
+            candidates = postings[0]
+            for other in postings[1:]:
+                if not len(candidates):
+                    break
+                positions = np.searchsorted(other, candidates)
+                positions[positions == len(other)] = 0
+                candidates = candidates[other[positions] == candidates]
+            if query.created_from is not None or query.created_to is not None:
+                created_at = self._created_at_by_id.view()[candidates]
+                candidates = candidates[(created_at >= start) & (created_at <= end)]
+            return candidates.copy()
+
+    def count_created(self, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> int:
+        """Count the records created in a time range, without listing them."""
+        with self._lock:
+            self._merge_unsorted()
+            times = self._sorted_created_at.view()
+            lo = np.searchsorted(times, to_epoch(created_from), side="left") if created_from else 0
+            hi = np.searchsorted(times, to_epoch(created_to), side="right") if created_to else len(times)
+            return int(max(hi - lo, 0))
+
+    def newest(self, query: FeedbackQuery, limit: int) -> np.ndarray:
+        """Return the ids of the ``limit`` most recently created records matching ``query``, newest first."""
+        ids = self.select(query)
+        with self._lock:
+            created_at = self._created_at_by_id.view()[ids]
+        if len(ids) > limit:
+            keep = np.argpartition(created_at, len(ids) - limit)[len(ids) - limit:]
+            ids, created_at = ids[keep], created_at[keep]
+        return ids[np.argsort(-created_at, kind="stable")]
+
+    def timeline(self, query: FeedbackQuery, group_by: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Return the ``created_at`` epoch seconds of the records matching ``query``.
+
+        With ``group_by`` (one of ``FIELDS``), also return the index of each
+        record's value in the returned list of values; records without one
+        are in the group "".
+        """
+        ids = self.select(query)
+        with self._lock:
+            times = self._created_at_by_id.view()[ids]
+            codes = np.zeros(len(ids), dtype=np.int64)
+            if group_by is None:
+                return times, codes, ["all"]
+            groups = [""]
+            for value, column in self._postings[group_by].items():
+                postings = column.view()
+                positions = np.searchsorted(postings, ids)
+                positions[positions == len(postings)] = 0
+                found = postings[positions] == ids
+                if found.any():
+                    codes[found] = len(groups)
+                    groups.append(value)
+            return times, codes, groups
+
+    def stats(self) -> Dict:
+        """Report entry counts and approximate memory use per index."""
+        with self._lock:
+            fields = {}
+            for field, values in self._postings.items():
+                fields[field] = {
+                    "values": len(values),
+                    "entries": sum(column.size for column in values.values()),
+                    "bytes": sys.getsizeof(values) + sum(
+                        column.nbytes + sys.getsizeof(value) for value, column in values.items()
+                    ),
+                }
+            fields["created_at"] = {
+                "values": len(self),
+                "entries": self._sorted_ids.size + self._unsorted_ids.size,
+                "bytes": self._created_at_by_id.nbytes
+                + self._sorted_created_at.nbytes
+                + self._sorted_ids.nbytes
+                + self._unsorted_created_at.nbytes
+                + self._unsorted_ids.nbytes,
+            }
+            return {
+                "records": len(self),
+                "fields": fields,
+                "total_bytes": sum(field["bytes"] for field in fields.values()),
+            }
@@ -1,28 +1,522 @@
-import json
+import asyncio
+import base64
+import math
 import os
-from typing import List
-from ..models.feedback import Feedback
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from ..config import Settings, settings as default_settings
+from ..models.feedback import DedupStats, Feedback, FeedbackQuery, naive_utc
+from .dedup_index import DedupIndex, IdempotencyConflict, content_hash
+from .facet_index import FacetIndex
+from .feedback_index import FeedbackIndex
+from .log_store import LogStore
+from .metrics import COMMIT_BATCH_RECORDS, SAVE_PHASE_SECONDS, SAVE_SECONDS
+from .record_codec import RecordCodec
+from .rollup_service import RollupTable
+from .search_index import SearchIndex
+from .sentiment_service import feedback_text
+from .sqlite_store import SQLiteStore
+from .storage_backend import BACKENDS, StorageBackend
+from .timeseries import BUCKETS, bucket_count, bucket_counts, bucket_starts, choose_bucket, day_span
+
+_STOP = object()
+# Matching records are read one by one through the indexes, rather than by
+# scanning, when they are at most 1 in this many of the records in range
+INDEX_READ_RATIO = 8
+
+_READ_SECONDS = SAVE_PHASE_SECONDS.labels("read")
+_QUEUE_SECONDS = SAVE_PHASE_SECONDS.labels("queue")
+_INDEX_SECONDS = SAVE_PHASE_SECONDS.labels("index")
+
+def open_store(settings: Settings, read_only: bool = False) -> StorageBackend:
+    """Open the storage backend chosen by ``settings.storage_backend``."""
+    store_dir = os.path.join(settings.data_dir, "feedback")
+    if settings.storage_backend == "sqlite":
+        return SQLiteStore(store_dir, read_only=read_only)
+    if settings.storage_backend != "log":
+        raise ValueError(f"Unknown storage backend {settings.storage_backend!r}; expected one of {', '.join(BACKENDS)}")
+    codec = (
+        RecordCodec(os.path.join(store_dir, "codebook.json"), read_only=read_only)
+        if settings.compact_encoding else None
+    )
+    return LogStore(
+        store_dir,
+        segment_max_bytes=settings.segment_max_bytes,
+        codec=codec,
+        read_only=read_only,
+        partition_by=settings.partition_by,
+        archive_block_bytes=settings.archive_block_bytes,
+    )
+
+def encode_cursor(record_id: int) -> str:
+    return base64.urlsafe_b64encode(f"v1:{record_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Turn an opaque cursor back into the id of the next record to read."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, record_id = base64.urlsafe_b64decode(padded).decode().split(":")
+        if version != "v1" or int(record_id) < 0:
+            raise ValueError
+        return int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
 
 class FeedbackService:
-    def __init__(self):
-        self.feedback_file = "data/feedback.json"
-        self._ensure_data_directory()
+    """Saves feedback to the configured store and answers reads from in-memory indexes.
+
+    With a ``writer`` (a ``WriterClient``), this process is one of several
+    API workers: saves are forwarded to the writer process, which owns the
+    log, and the store is opened read-only. Before answering a read the
+    worker indexes whatever other workers saved since, so read paths stay
+    parallel across processes.
+
+    With ``read_indexes`` off, as in the writer process, which only serves
+    saves, the secondary indexes, rollups and facets are left empty and never
+    updated. Dedup and the search index, whose segments workers load, are
+    kept either way.
+    """
+
+    def __init__(self, settings: Settings = default_settings, writer=None, read_indexes: bool = True):
+        self.settings = settings
+        self.writer = writer
+        self.read_indexes = read_indexes
+        read_only = writer is not None
+        self.legacy_file = os.path.join(settings.data_dir, "feedback.json")
+        self.store = open_store(settings, read_only=read_only)
+        if not read_only:
+            # One-time conversion of the old single-array file into the store
+            self.store.migrate_legacy(self.legacy_file)
+        # Secondary indexes and rollups live in memory and are rebuilt from the log on startup
+        self.index = FeedbackIndex()
+        self.rollups = RollupTable()
+        self.facets = FacetIndex()
+        # The search index is persisted, so only records after its last segment are tokenized
+        self.search_index = SearchIndex(
+            os.path.join(settings.data_dir, "search"),
+            flush_docs=settings.search_flush_docs,
+            max_segments=settings.search_max_segments,
+            read_only=read_only,
+        )
+        # Followers: records indexed before they were scored, oldest first; see _follow_sentiment
+        self._unscored: List[Dict] = []
+        self._refresh_lock = threading.Lock()
+        for record in self.store.iter_records():
+            if read_indexes:
+                self.index.add(record)
+                self.rollups.add(record)
+                self.facets.add(record)
+            if record["id"] >= self.search_index.indexed_upto:
+                self.search_index.add(record)
+            if read_only:
+                self._track_unscored(record)
+        self.search_index.flush()
+
+        self.dedup = DedupIndex(settings.dedup_window_seconds, settings.dedup_max_entries)
+
+        # Group commit state; created on first save so it binds to the running loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # A single dedicated thread owns all log writes, keeping file I/O off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedback-writer")
+
+    @staticmethod
+    def _to_record(feedback: Feedback) -> Dict:
+        feedback_dict = feedback.dict()
+        # Stored as naive UTC, like every timestamp the indexes and partitions compare
+        feedback_dict['created_at'] = naive_utc(feedback_dict['created_at']).isoformat()
+        return feedback_dict
+
+    def _ensure_writer(self) -> asyncio.Queue:
+        if self._writer_task is None or self._writer_task.done():
+            self._queue = asyncio.Queue(maxsize=self.settings.write_queue_depth)
+            self._writer_task = asyncio.get_running_loop().create_task(self._write_loop())
+        return self._queue
 
-    def _ensure_data_directory(self):
-        os.makedirs(os.path.dirname(self.feedback_file), exist_ok=True)
-        if not os.path.exists(self.feedback_file):
-            with open(self.feedback_file, 'w') as f:
-                json.dump([], f)
+    async def save(self, feedback: Feedback, idempotency_key: Optional[str] = None) -> Feedback:
+        """Queue feedback for the next group commit and wait until it is durable.
 
-    async def save(self, feedback: Feedback) -> Feedback:
+        A repeat of a recent submission, by ``idempotency_key`` or by content,
+        is answered with the record saved the first time and not written again.
+        Raises ``IdempotencyConflict`` if the key was used for different content.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        record = self._to_record(feedback)
+        digest = content_hash(feedback)
+        if self.writer is not None:
+            try:
+                record_id, duplicate = await self.writer.save(record, digest, idempotency_key)
+            except IdempotencyConflict:
+                raise
+            except Exception as e:
+                raise Exception(f"Error saving feedback: {str(e)}")
+            # Index our own write before answering, so a read that follows sees it
+            await loop.run_in_executor(None, self.refresh)
+        else:
+            record_id, duplicate = await self.save_record(record, digest, idempotency_key)
+        if duplicate:
+            read_started = time.perf_counter()
+            feedback = Feedback(**await loop.run_in_executor(None, self.store.get, record_id))
+            _READ_SECONDS.observe(time.perf_counter() - read_started)
+        else:
+            feedback.id = record_id
+        SAVE_SECONDS.observe(time.perf_counter() - started)
+        return feedback
+
+    async def save_record(self, record: Dict, digest: str, idempotency_key: Optional[str] = None) -> Tuple[int, bool]:
+        """Commit one record through the group-commit queue, unless it is a duplicate.
+
+        Returns the record id and whether it is that of an earlier copy.
+        """
+        # Anonymous submissions are only deduplicated by key; see DedupIndex
+        by_content = record.get("user_id") is not None
+        original = self.dedup.lookup(idempotency_key, digest, by_content)
+        if original is not None:
+            record_id = await asyncio.shield(original) if isinstance(original, asyncio.Future) else original
+            return record_id, True
+        committed = asyncio.get_running_loop().create_future()
+        self.dedup.remember(idempotency_key, digest, committed, by_content)
+        try:
+            queue = self._ensure_writer()
+            # Waits for room when the queue is full, pushing back on callers
+            await queue.put((record, committed, time.perf_counter()))
+            record_id = await committed
+        except Exception as e:
+            self.dedup.forget(idempotency_key, digest, by_content)
+            if not committed.done():
+                committed.set_exception(e)
+            raise Exception(f"Error saving feedback: {str(e)}")
+        self.dedup.remember(idempotency_key, digest, record_id, by_content)
+        return record_id, False
+
+    async def save_many(self, feedbacks: List[Feedback]) -> List[int]:
+        """Write a large chunk of feedback directly, bypassing the group-commit queue.
+
+        Bulk callers already have a full batch, so it is handed straight to the
+        writer thread and committed with one write and one fsync.
+        """
+        if not feedbacks:
+            return []
+        ids = await self.save_records([self._to_record(feedback) for feedback in feedbacks])
+        for feedback, record_id in zip(feedbacks, ids):
+            feedback.id = record_id
+        return ids
+
+    async def save_records(self, records: List[Dict]) -> List[int]:
+        loop = asyncio.get_running_loop()
         try:
-            with open(self.feedback_file, 'r+') as f:
-                data = json.load(f)
-                feedback_dict = feedback.dict()
-                feedback_dict['created_at'] = feedback_dict['created_at'].isoformat()
-                data.append(feedback_dict)
-                f.seek(0)
-                json.dump(data, f, indent=2)
-                return feedback
+            if self.writer is not None:
+                ids = await self.writer.save_many(records)
+                await loop.run_in_executor(None, self.refresh)
+            else:
+                ids = await loop.run_in_executor(self._executor, self._commit, records)
         except Exception as e:
-            raise Exception(f"Error saving feedback: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error saving feedback: {str(e)}")
+        return ids
+
+    def _commit(self, records: List[Dict]) -> List[int]:
+        """Append records and update the indexes and rollups; runs on the writer thread.
+
+        Running every step on the single writer thread keeps index updates in
+        id order and off the event loop.
+        """
+        ids = self.store.append_many(records)
+        started = time.perf_counter()
+        if self.read_indexes:
+            self.index.add_many(records)
+            self.rollups.add_many(records)
+            self.facets.add_many(records)
+        self.search_index.add_many(records)
+        _INDEX_SECONDS.observe(time.perf_counter() - started)
+        COMMIT_BATCH_RECORDS.observe(len(records))
+        return ids
+
+    async def set_sentiment(self, records: List[Dict], scores: List[float]) -> None:
+        """Write sentiment scores back for stored records and update the rollups and facets.
+
+        ``records`` are the records as read before scoring; they carry the
+        previous score so the rollups can move them between buckets.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._apply_sentiment, records, scores
+        )
+
+    def _apply_sentiment(self, records: List[Dict], scores: List[float]) -> None:
+        self.store.set_sentiment_many([record["id"] for record in records], scores)
+        if self.read_indexes:
+            self.rollups.update_sentiment(records, scores)
+            self.facets.update_sentiment(records, scores)
+
+    async def _next_batch(self, queue: asyncio.Queue) -> Tuple[List, bool]:
+        """Collect queued saves until the batch is full or the wait window closes."""
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.settings.write_batch_max_wait_ms / 1000
+        while len(batch) < self.settings.write_batch_size:
+            if queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            batch.append(item)
+        stop = any(item is _STOP for item in batch)
+        return [item for item in batch if item is not _STOP], stop
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch(queue)
+            if not batch:
+                continue
+            records = [record for record, _, _ in batch]
+            now = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                _QUEUE_SECONDS.observe(now - enqueued_at)
+            try:
+                # One write and one fsync for the whole batch
+                ids = await loop.run_in_executor(self._executor, self._commit, records)
+            except Exception as e:
+                for _, committed, _ in batch:
+                    if not committed.done():
+                        committed.set_exception(e)
+            else:
+                for record_id, (_, committed, _) in zip(ids, batch):
+                    if not committed.done():
+                        committed.set_result(record_id)
+
+    # Following the writer process
+
+    def _track_unscored(self, record: Dict) -> None:
+        # Only records the enrichment job will score; the rest stay unscored for good
+        if record.get("sentiment_score") is None and feedback_text(record.get("responses") or {}):
+            self._unscored.append(record)
+
+    def refresh(self) -> None:
+        """Index records saved through other workers since the last call.
+
+        Only does anything with a ``writer``; a single process indexes its
+        records as it commits them. Costs a couple of ``fstat`` calls when
+        nothing changed.
+        """
+        if self.writer is None:
+            return
+        with self._refresh_lock:
+            start_id = len(self.store)
+            if self.store.refresh() > start_id:
+                records = list(self.store.iter_records(start_id))
+                self.index.add_many(records)
+                self.rollups.add_many(records)
+                self.facets.add_many(records)
+                self.search_index.add_many(records)
+                for record in records:
+                    self._track_unscored(record)
+            self._follow_sentiment()
+
+    def _follow_sentiment(self) -> None:
+        """Move records the writer process has scored since into their sentiment buckets."""
+        if not self._unscored:
+            return
+        first_id = self._unscored[0]["id"]
+        scores = self.store.sentiment_scores(first_id, self._unscored[-1]["id"] + 1)
+        scored, new_scores, still_unscored = [], [], []
+        for record in self._unscored:
+            score = scores[record["id"] - first_id]
+            if math.isnan(score):
+                still_unscored.append(record)
+            else:
+                scored.append(record)
+                new_scores.append(round(score, 4))
+        if scored:
+            self.rollups.update_sentiment(scored, new_scores)
+            self.facets.update_sentiment(scored, new_scores)
+            self._unscored = still_unscored
+
+    async def dedup_stats(self) -> DedupStats:
+        """Duplicate-suppression counters, from the writer process when there is one."""
+        if self.writer is not None:
+            return await self.writer.dedup_stats()
+        return self.dedup.stats()
+
+    async def close(self) -> None:
+        """Flush pending saves and release the store."""
+        if self._writer_task is not None and not self._writer_task.done():
+            await self._queue.put(_STOP)
+            await self._writer_task
+        if self.writer is not None:
+            await self.writer.close()
+        self._executor.shutdown(wait=True)
+        self.search_index.flush()
+        self.store.close()
+
+    def queue_depth(self) -> int:
+        """Saves waiting for the next group commit."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def iter_feedback(self, start_id: int = 0) -> Iterator[Feedback]:
+        for record in self.store.iter_records(start_id):
+            yield Feedback(**record)
+
+    def iter_matching(self, query: FeedbackQuery) -> Iterator[Dict]:
+        """Stream the stored records matching ``query`` straight from the store.
+
+        When the field filters keep only a small share of the records in the
+        time range, the matching ids come from the secondary indexes and only
+        those records are read, in id order. Otherwise the range is scanned:
+        a time range is passed down so the store can skip partitions outside
+        it (records then come grouped by time rather than in id order).
+        Records saved after the call are not included. Nothing is held in
+        memory beyond what the store reads ahead, and the matching ids.
+        """
+        self.refresh()
+        end_id = len(self.store)
+        if query.copy(update={"created_from": None, "created_to": None}) != FeedbackQuery():
+            ids = self.index.select(query)
+            in_range = self.index.count_created(query.created_from, query.created_to)
+            if len(ids) * INDEX_READ_RATIO <= in_range:
+                for record_id in ids[ids < end_id]:
+                    yield self.store.get(int(record_id))
+                return
+        if query.created_from is not None or query.created_to is not None:
+            records = self.store.iter_range(query.created_from, query.created_to)
+        else:
+            records = self.store.iter_records(0, end_id)
+        for record in records:
+            if query.matches(record):
+                yield record
+
+    def query(self, query: FeedbackQuery, start_id: int, limit: int) -> Tuple[List[Feedback], int, bool]:
+        """Return up to ``limit`` matching records starting at ``start_id``.
+
+        Unfiltered pages are read sequentially from the log; filtered pages
+        take their ids from the secondary indexes and read each record through
+        the offset index. Either way a page costs the same wherever it starts.
+        Returns the records, the id to resume from, and whether more remain.
+        """
+        self.refresh()
+        if query == FeedbackQuery():
+            items = [Feedback(**record) for record in self.store.iter_records(start_id, start_id + limit)]
+            next_id = items[-1].id + 1 if items else max(start_id, len(self.store))
+            return items, next_id, next_id < len(self.store)
+
+        ids = self.index.select(query)
+        # Read the length after selecting so it covers every id the index returned
+        end_id = len(self.store)
+        position = int(np.searchsorted(ids, start_id))
+        page = ids[position:position + limit]
+        items = [Feedback(**self.store.get(int(record_id))) for record_id in page]
+        has_more = position + limit < len(ids)
+        next_id = int(page[-1]) + 1 if has_more else max(start_id, end_id)
+        return items, next_id, has_more
+
+    def recent(self, query: FeedbackQuery, limit: int) -> List[Feedback]:
+        """Return the ``limit`` most recently created records matching ``query``, newest first.
+
+        The records are picked from the secondary indexes, so only they are read.
+        """
+        self.refresh()
+        return [Feedback(**self.store.get(int(record_id))) for record_id in self.index.newest(query, limit)]
+
+    def search(self, text: str, query: FeedbackQuery, limit: int) -> Tuple[List[Tuple[float, Feedback]], int]:
+        """Rank feedback whose free-text answers match ``text``, best first.
+
+        Filters in ``query`` are resolved through the secondary indexes before
+        ranking. Returns up to ``limit`` (score, feedback) pairs and the total
+        number of matches.
+        """
+        self.refresh()
+        candidates = None if query == FeedbackQuery() else self.index.select(query)
+        ids, scores, total = self.search_index.search(text, limit, candidates)
+        results = [
+            (float(score), Feedback(**self.store.get(int(record_id))))
+            for record_id, score in zip(ids, scores)
+        ]
+        return results, total
+
+    def facet_counts(
+        self,
+        filters: Dict[str, List[str]],
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """Count records per facet value; a time range is resolved through the secondary indexes."""
+        self.refresh()
+        ids = None
+        if created_from is not None or created_to is not None:
+            ids = self.index.select(FeedbackQuery(created_from=created_from, created_to=created_to))
+        return self.facets.counts(filters, ids)
+
+    def timeseries(
+        self,
+        group_by: Optional[str],
+        bucket: str,
+        max_points: int,
+        day_from: Optional[date] = None,
+        day_to: Optional[date] = None,
+        feedback_type: Optional[List[str]] = None,
+        product_name: Optional[List[str]] = None,
+        user_role: Optional[List[str]] = None,
+    ) -> Tuple[str, List[datetime], Dict[str, List[int]]]:
+        """Count feedback per time bucket, with one series per ``group_by`` value.
+
+        ``bucket="auto"`` picks the finest bucket giving at most ``max_points``
+        buckets over the range, which defaults to the days holding feedback.
+        Day and coarser buckets are summed from the rollups and hours from the
+        ``created_at`` index, so no records are read. Raises ``ValueError`` for
+        an explicit bucket giving more than ``max_points`` buckets.
+        """
+        self.refresh()
+        extent = self.rollups.extent()
+        day_from = day_from or (extent[0] if extent else None)
+        day_to = day_to or (extent[1] if extent else None)
+        if day_from is None or day_to is None or day_from > day_to:
+            return ("day" if bucket == "auto" else bucket), [], {}
+        start, end = day_span(day_from, day_to)
+        # The created_at index has no sentiment, so hourly counts cannot be split by it
+        finest = "day" if group_by == "sentiment" else "hour"
+        if bucket == "auto":
+            bucket = choose_bucket(start, end, max_points, finest)
+        elif BUCKETS.index(bucket) < BUCKETS.index(finest):
+            raise ValueError(f"{bucket.capitalize()} buckets cannot be grouped by {group_by}")
+        else:
+            count = bucket_count(start, end, bucket)
+            if count > max_points:
+                raise ValueError(
+                    f"The range spans {count} {bucket} buckets, more than {max_points}; "
+                    "use a coarser bucket or a shorter range"
+                )
+        starts = bucket_starts(start, end, bucket)
+        if bucket == "hour":
+            query = FeedbackQuery(
+                feedback_type=feedback_type,
+                product_name=product_name,
+                user_role=user_role,
+                created_from=start,
+                created_to=end,
+            )
+            times, codes, groups = self.index.timeline(query, group_by)
+            counts = np.ones(len(times))
+        else:
+            times, counts, codes, groups = self.rollups.series(
+                group_by, day_from, day_to, feedback_type, product_name, user_role
+            )
+        return bucket, starts, bucket_counts(times, counts, codes, groups, starts)
+
+    def index_stats(self) -> Dict:
+        self.refresh()
+        stats = self.index.stats()
+        stats["search"] = self.search_index.stats()
+        stats["facets"] = self.facets.stats()
+        stats["storage"] = self.store.storage_stats()
+        return stats
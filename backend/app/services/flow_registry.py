@@ -0,0 +1,106 @@
+import hashlib
+import json
+from typing import Callable, Dict, List, Optional
+from ..models.feedback import Feedback
+from ..models.question_flow import BASE_QUESTIONS, FEEDBACK_TYPES, get_question_flow
+
+# Checks one answer; returns an error message, or None if the answer is valid
+AnswerCheck = Callable[[object], Optional[str]]
+
+
+def _compile_question(question: Dict, max_text_length: int) -> AnswerCheck:
+    if question["type"] == "selectbox":
+        options = frozenset(question["options"])
+
+        def check(value):
+            if not isinstance(value, str) or value not in options:
+                return "not one of the options"
+            return None
+    elif question["type"] == "slider":
+        low, high = question["min_value"], question["max_value"]
+
+        def check(value):
+            if isinstance(value, bool) or not isinstance(value, int):
+                return "must be an integer"
+            if not low <= value <= high:
+                return f"must be between {low} and {high}"
+            return None
+    else:
+        def check(value):
+            if not isinstance(value, str):
+                return "must be a string"
+            if len(value) > max_text_length:
+                return f"longer than {max_text_length} characters"
+            return None
+    return check
+
+
+def format_errors(errors: List[Dict]) -> str:
+    """Render validation errors as one line, e.g. ``responses.urgency: not one of the options``."""
+    return "; ".join(f"{'.'.join(map(str, error['loc'][1:]))}: {error['msg']}" for error in errors)
+
+
+class FlowValidator:
+    """Checks ``responses`` against one flow: every question answered, no unknown keys."""
+
+    def __init__(self, feedback_type: str, questions: List[Dict], max_text_length: int):
+        self.feedback_type = feedback_type
+        self._checks: Dict[str, AnswerCheck] = {
+            question["key"]: _compile_question(question, max_text_length) for question in questions
+        }
+
+    def errors(self, responses: Dict) -> List[Dict]:
+        errors = []
+        for key, check in self._checks.items():
+            if key not in responses:
+                errors.append({"loc": ["body", "responses", key], "msg": "field required", "type": "value_error.missing"})
+                continue
+            message = check(responses[key])
+            if message is not None:
+                errors.append({"loc": ["body", "responses", key], "msg": message, "type": "value_error"})
+        for key in responses:
+            if key not in self._checks:
+                errors.append({"loc": ["body", "responses", key], "msg": "not a question of this flow", "type": "value_error.extra"})
+        if responses.get("feedback_type", self.feedback_type) != self.feedback_type:
+            errors.append({
+                "loc": ["body", "responses", "feedback_type"],
+                "msg": "does not match feedback_type",
+                "type": "value_error",
+            })
+        return errors
+
+
+class FlowRegistry:
+    """The question flows, built once and served to clients with a content version.
+
+    ``version`` is a hash of the flow definitions, so it only changes when the
+    questions do and can be used directly as an ETag. Every flow is compiled
+    into a ``FlowValidator`` up front, so checking a submission is a few dict
+    lookups rather than a walk over the question definitions.
+    """
+
+    def __init__(self, max_text_length: int = 10000):
+        self.flows: Dict[str, List[Dict]] = {
+            feedback_type: get_question_flow(feedback_type) for feedback_type in FEEDBACK_TYPES
+        }
+        document = {"base": BASE_QUESTIONS, "flows": self.flows}
+        canonical = json.dumps(document, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+        # Served as-is by GET /flows
+        self.body = json.dumps(dict(document, version=self.version)).encode("utf-8")
+        self._validators = {
+            feedback_type: FlowValidator(feedback_type, questions, max_text_length)
+            for feedback_type, questions in self.flows.items()
+        }
+
+    def validate(self, feedback: Feedback) -> List[Dict]:
+        """Return validation errors for a submission, in FastAPI's 422 format."""
+        validator = self._validators.get(feedback.feedback_type)
+        if validator is None:
+            return [{
+                "loc": ["body", "feedback_type"],
+                "msg": f"unknown feedback type; expected one of {', '.join(self.flows)}",
+                "type": "value_error",
+            }]
+        return validator.errors(feedback.responses)
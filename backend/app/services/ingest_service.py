@@ -0,0 +1,118 @@
+import asyncio
+import json
+import zlib
+from typing import AsyncIterator, List, Optional
+from pydantic import ValidationError
+from ..config import Settings
+from ..models.feedback import Feedback, IngestError, IngestResult
+from .feedback_service import FeedbackService
+from .flow_registry import FlowRegistry, format_errors
+
+
+class IngestService:
+    """Streams NDJSON feedback uploads into the store in large chunks.
+
+    The body is decoded, split into lines and validated as it arrives, so only
+    the current chunk of records is held in memory. While one chunk is being
+    written the next one is already being parsed.
+    """
+
+    def __init__(self, feedback_service: FeedbackService, settings: Settings, flows: Optional[FlowRegistry] = None):
+        self.feedback_service = feedback_service
+        self.settings = settings
+        self.flows = flows
+
+    async def _decoded(self, body: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[bytes]:
+        """Yield the body, decompressed in pieces of at most one line's length.
+
+        A small gzip chunk can inflate to many megabytes, so each chunk is
+        decompressed a bounded piece at a time, with the rest of its input
+        kept in ``unconsumed_tail`` until the previous piece is split into lines.
+        """
+        if not gzipped:
+            async for chunk in body:
+                yield chunk
+            return
+        # wbits=31 expects a gzip header and trailer
+        decoder = zlib.decompressobj(wbits=31)
+        limit = self.settings.ingest_max_line_bytes
+        async for chunk in body:
+            while chunk:
+                yield decoder.decompress(chunk, limit)
+                chunk = decoder.unconsumed_tail
+        yield decoder.flush()
+
+    async def _lines(self, body: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[Optional[bytes]]:
+        """Yield complete lines from the body, or ``None`` for an over-long line."""
+        buffer = bytearray()
+        skipping = False
+        async for chunk in self._decoded(body, gzipped):
+            buffer += chunk
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end < 0:
+                    break
+                if skipping:
+                    skipping = False
+                elif end - start > self.settings.ingest_max_line_bytes:
+                    yield None
+                else:
+                    yield bytes(buffer[start:end])
+                start = end + 1
+            del buffer[:start]
+            if len(buffer) > self.settings.ingest_max_line_bytes:
+                # Drop the rest of this line instead of buffering it
+                if not skipping:
+                    yield None
+                skipping = True
+                buffer.clear()
+        if buffer and not skipping:
+            yield bytes(buffer)
+
+    async def ingest(self, body: AsyncIterator[bytes], gzipped: bool = False) -> IngestResult:
+        result = IngestResult()
+        chunk: List[Feedback] = []
+        pending_write: Optional[asyncio.Task] = None
+
+        def reject(line_number: int, error: str) -> None:
+            result.rejected += 1
+            if len(result.errors) < self.settings.ingest_max_reported_errors:
+                result.errors.append(IngestError(line=line_number, error=error))
+
+        async def flush() -> None:
+            nonlocal chunk, pending_write
+            if pending_write is not None:
+                write, pending_write = pending_write, None
+                result.accepted += len(await write)
+            if chunk:
+                pending_write = asyncio.ensure_future(self.feedback_service.save_many(chunk))
+                chunk = []
+
+        line_number = 0
+        try:
+            async for line in self._lines(body, gzipped):
+                line_number += 1
+                if line is None:
+                    reject(line_number, "line exceeds maximum length")
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    feedback = Feedback.parse_obj(json.loads(line))
+                except (ValueError, ValidationError) as e:
+                    reject(line_number, str(e))
+                    continue
+                errors = self.flows.validate(feedback) if self.flows is not None else []
+                if errors:
+                    reject(line_number, format_errors(errors))
+                    continue
+                chunk.append(feedback)
+                if len(chunk) >= self.settings.ingest_chunk_size:
+                    await flush()
+            # Start the write of the last chunk, then wait for it
+            await flush()
+        finally:
+            if pending_write is not None:
+                result.accepted += len(await pending_write)
+        return result
@@ -0,0 +1,801 @@
+import json
+import math
+import os
+import struct
+from array import array
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from ..models.feedback import naive_utc
+from .metrics import BYTES_WRITTEN, SAVE_PHASE_SECONDS
+from .partitions import ArchiveReader, ArchiveWriter, partition_bounds, partition_key
+from .record_codec import RecordCodec
+from .storage_backend import StorageBackend
+
+MANIFEST_VERSION = 2
+
+# One offset index entry per record id: file number, byte offset, line length
+OFFSET_ENTRY = struct.Struct("<IQI")
+OFFSET_DTYPE = np.dtype([("file", "<u4"), ("offset", "<u8"), ("length", "<u4")])
+# Partition files list their records in an ``.ids`` sidecar: record id, byte offset
+MEMBER_ENTRY = struct.Struct("<QQ")
+MEMBER_DTYPE = np.dtype([("id", "<u8"), ("offset", "<u8")])
+# Offset index entries read at a time when iterating
+READ_BLOCK_RECORDS = 4096
+# One float32 sentiment score per record id; NaN means not scored yet
+SENTIMENT_ENTRY = struct.Struct("<f")
+
+_SERIALIZE_SECONDS = SAVE_PHASE_SECONDS.labels("serialize")
+_WRITE_SECONDS = SAVE_PHASE_SECONDS.labels("write")
+_FSYNC_SECONDS = SAVE_PHASE_SECONDS.labels("fsync")
+_SEGMENT_BYTES = BYTES_WRITTEN.labels("segments")
+_OFFSET_BYTES = BYTES_WRITTEN.labels("offsets")
+_SENTIMENT_BYTES = BYTES_WRITTEN.labels("sentiment")
+
+
+class LogStore(StorageBackend):
+    """Append-only feedback storage made of JSON Lines segment files.
+
+    Every write appends serialized records to the active segment, so the cost
+    of a write depends only on the size of the batch, never on how much data
+    is already stored. A small manifest lists the segments in order; it is
+    only rewritten when a segment is sealed or a migration completes.
+
+    Record ids are dense, so a fixed-width offset index (``offsets.idx``)
+    maps any id to its segment and byte range with a single positioned read.
+    Sentiment scores computed after a record is written go to a fixed-width
+    side column (``sentiment.col``) that is updated in place and overlaid on
+    reads, so enrichment never rewrites records.
+
+    With a ``codec``, new records are written in its compact encoding; lines
+    written without one are still read back as they are.
+
+    A ``read_only`` store never writes or repairs anything. It follows a log
+    written by another process: ``refresh`` picks up records committed since
+    it was opened.
+
+    Segments are the write-ahead part of the log. ``compact`` moves sealed
+    segments into partition files by the month or day of ``created_at``,
+    merges fragments of a partition, and rewrites partitions older than a
+    cutoff as read-only gzip archives. Every file has a stable number in the
+    manifest, and compaction repoints offset index entries rather than
+    renumbering records, so ids and reads are unaffected by where a record
+    currently lives.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    OFFSET_INDEX_FILE = "offsets.idx"
+    SENTIMENT_FILE = "sentiment.col"
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        codec: Optional[RecordCodec] = None,
+        read_only: bool = False,
+        partition_by: str = "month",
+        archive_block_bytes: int = 64 * 1024,
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.codec = codec
+        self.read_only = read_only
+        self.partition_by = partition_by
+        self.archive_block_bytes = archive_block_bytes
+        self._lock = threading.Lock()
+        # Serializes compaction passes; writes and reads only wait on ``_lock``
+        self._compact_lock = threading.Lock()
+        self._archives: Dict[str, ArchiveReader] = {}
+        self._offsets_rw: Optional[int] = None
+        if read_only:
+            self._open_read_only()
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._set_manifest(self._load_manifest())
+        self._next_id = self._recover_active_segment()
+        self._offsets = open(os.path.join(self.directory, self.OFFSET_INDEX_FILE), "a+b")
+        self._recover_offset_index()
+        self._sentiment = os.open(os.path.join(self.directory, self.SENTIMENT_FILE), os.O_RDWR | os.O_CREAT)
+        self._recover_sentiment_column()
+        self._active = open(self._path(self._manifest["segments"][-1]), "ab")
+
+    # Manifest handling
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST_FILE)
+
+    def _path(self, entry: Dict) -> str:
+        return os.path.join(self.directory, entry["name"])
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path(), "r") as f:
+                return self._upgrade_manifest(json.load(f))
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "segments": [self._new_segment_entry(0, 0)],
+            "partitions": [],
+            "obsolete": [],  # Files dropped by the last compaction, deleted by the next one
+            "next_number": 1,
+            "migrated_from": None,
+        }
+        if not self.read_only:
+            self._write_manifest(manifest)
+        return manifest
+
+    def _upgrade_manifest(self, manifest: Dict) -> Dict:
+        if manifest.get("version", 1) >= 2:
+            return manifest
+        # Version 1 numbered segments by their position and had no partitions
+        for number, segment in enumerate(manifest["segments"]):
+            segment["number"] = number
+        manifest.update(
+            version=MANIFEST_VERSION,
+            partitions=[],
+            obsolete=[],
+            next_number=len(manifest["segments"]),
+        )
+        if not self.read_only:
+            self._write_manifest(manifest)
+        return manifest
+
+    def _set_manifest(self, manifest: Dict) -> None:
+        self._manifest = manifest
+        # Replaced rather than updated, so readers never see it half-built
+        self._files = {entry["number"]: entry for entry in manifest["segments"] + manifest["partitions"]}
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        # Write to a temporary file and rename so readers never see a partial manifest
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    @staticmethod
+    def _new_segment_entry(number: int, first_id: int) -> Dict:
+        return {
+            "number": number,
+            "name": f"segment-{number:06d}.jsonl",
+            "first_id": first_id,
+            "records": None,  # Filled in when the segment is sealed
+        }
+
+    def _recover_active_segment(self) -> int:
+        """Count the records in the active segment and drop a torn last line.
+
+        A crash in the middle of a write can leave a partial record at the end
+        of the active segment; everything up to the last complete line is kept.
+        """
+        active = self._manifest["segments"][-1]
+        path = self._path(active)
+        count = 0
+        good_bytes = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                    count += 1
+                    good_bytes += len(line)
+            if good_bytes != os.path.getsize(path):
+                with open(path, "r+b") as f:
+                    f.truncate(good_bytes)
+        return active["first_id"] + count
+
+    def _recover_offset_index(self) -> None:
+        """Bring the offset index in line with the segments.
+
+        Index entries are written after the segment data and are not fsynced,
+        so after a crash the index may be short (rebuilt here from the
+        segments) or ahead of a truncated segment (trimmed here). Compaction
+        fsyncs the index before moving records out of segments, so only
+        records still in segments can be missing.
+        """
+        indexed = os.fstat(self._offsets.fileno()).st_size // OFFSET_ENTRY.size
+        if indexed > self._next_id:
+            self._offsets.truncate(self._next_id * OFFSET_ENTRY.size)
+            return
+        if indexed == self._next_id:
+            return
+        self._offsets.truncate(indexed * OFFSET_ENTRY.size)
+        segments = self._manifest["segments"]
+        entries = bytearray()
+        for position, segment in enumerate(segments):
+            last_id = segments[position + 1]["first_id"] if position + 1 < len(segments) else self._next_id
+            if last_id <= indexed:
+                continue
+            record_id = segment["first_id"]
+            offset = 0
+            with open(self._path(segment), "rb") as f:
+                for line in f:
+                    if record_id >= last_id:
+                        break
+                    if record_id >= indexed:
+                        entries += OFFSET_ENTRY.pack(segment["number"], offset, len(line))
+                    offset += len(line)
+                    record_id += 1
+        self._offsets.write(entries)
+        self._offsets.flush()
+
+    def _recover_sentiment_column(self) -> None:
+        """Pad the sentiment column with NaN, or trim it, to one entry per record."""
+        entries = os.fstat(self._sentiment).st_size // SENTIMENT_ENTRY.size
+        if entries > self._next_id:
+            os.ftruncate(self._sentiment, self._next_id * SENTIMENT_ENTRY.size)
+        elif entries < self._next_id:
+            self._extend_sentiment_column(entries, self._next_id - entries)
+
+    def _extend_sentiment_column(self, start_id: int, count: int) -> None:
+        os.pwrite(self._sentiment, array("f", [math.nan]).tobytes() * count, start_id * SENTIMENT_ENTRY.size)
+
+    # Following another writer
+
+    def _open_read_only(self) -> None:
+        self._set_manifest(self._load_manifest())
+        self._manifest_version = None
+        self._next_id = 0
+        self._offsets = None
+        self._sentiment = None
+        self._active = None
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Make records committed by the writing process visible; returns the new length.
+
+        A record counts as committed once both its offset index entry and its
+        sentiment slot exist; the writer adds those only after the data is
+        durable. The manifest is read after the index, so it already lists
+        the segment of every record counted.
+        """
+        with self._lock:
+            if self._offsets is None:
+                try:
+                    self._offsets = open(os.path.join(self.directory, self.OFFSET_INDEX_FILE), "rb")
+                    self._sentiment = os.open(os.path.join(self.directory, self.SENTIMENT_FILE), os.O_RDONLY)
+                except FileNotFoundError:
+                    # The writer has not created the store yet
+                    return self._next_id
+            committed = min(
+                os.fstat(self._offsets.fileno()).st_size // OFFSET_ENTRY.size,
+                os.fstat(self._sentiment).st_size // SENTIMENT_ENTRY.size,
+            )
+            try:
+                stat = os.stat(self._manifest_path())
+                version = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                version = None
+            if version != self._manifest_version:
+                self._set_manifest(self._load_manifest())
+                self._manifest_version = version
+            self._next_id = max(self._next_id, committed)
+            return self._next_id
+
+    # Writes
+
+    def append_many(self, records: List[Dict], durable: bool = True) -> List[int]:
+        """Append records to the log and return the ids assigned to them.
+
+        All records are written with a single write call and, when ``durable``
+        is set, a single fsync.
+        """
+        if not records:
+            return []
+        if self.read_only:
+            raise IOError("The store is open read-only")
+        with self._lock:
+            started = time.perf_counter()
+            ids = list(range(self._next_id, self._next_id + len(records)))
+            segment_number = self._manifest["segments"][-1]["number"]
+            offset = self._active.tell()
+            data = bytearray()
+            entries = bytearray()
+            for record_id, record in zip(ids, records):
+                record["id"] = record_id
+                line = (self._encode(record) + "\n").encode("utf-8")
+                entries += OFFSET_ENTRY.pack(segment_number, offset + len(data), len(line))
+                data += line
+            serialized = time.perf_counter()
+            _SERIALIZE_SECONDS.observe(serialized - started)
+            self._active.write(data)
+            self._active.flush()
+            written = time.perf_counter()
+            _WRITE_SECONDS.observe(written - serialized)
+            if durable:
+                os.fsync(self._active.fileno())
+                _FSYNC_SECONDS.observe(time.perf_counter() - written)
+            # The index is only written once the data is durable, so it never points past it
+            self._offsets.write(entries)
+            self._offsets.flush()
+            self._extend_sentiment_column(self._next_id, len(records))
+            _SEGMENT_BYTES.inc(len(data))
+            _OFFSET_BYTES.inc(len(entries))
+            _SENTIMENT_BYTES.inc(len(records) * SENTIMENT_ENTRY.size)
+            self._next_id += len(records)
+            if self._active.tell() >= self.segment_max_bytes:
+                self._roll_segment()
+            return ids
+
+    def _roll_segment(self) -> None:
+        """Seal the active segment and start a new one."""
+        os.fsync(self._active.fileno())
+        self._active.close()
+        segments = self._manifest["segments"]
+        segments[-1]["records"] = self._next_id - segments[-1]["first_id"]
+        segments.append(self._new_segment_entry(self._manifest["next_number"], self._next_id))
+        self._manifest["next_number"] += 1
+        self._write_manifest(self._manifest)
+        self._set_manifest(self._manifest)
+        self._active = open(self._path(segments[-1]), "ab")
+
+    def close(self) -> None:
+        with self._lock:
+            for reader in self._archives.values():
+                reader.close()
+            self._archives = {}
+            if self.read_only:
+                if self._offsets is not None and not self._offsets.closed:
+                    self._offsets.close()
+                    os.close(self._sentiment)
+                return
+            if not self._active.closed:
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self._active.close()
+                self._offsets.close()
+                os.close(self._sentiment)
+                if self._offsets_rw is not None:
+                    os.close(self._offsets_rw)
+                    self._offsets_rw = None
+
+    def set_sentiment_many(self, ids: List[int], scores: List[float]) -> None:
+        """Record sentiment scores for existing records, in place."""
+        with self._lock:
+            for record_id, score in zip(ids, scores):
+                if 0 <= record_id < self._next_id:
+                    os.pwrite(self._sentiment, SENTIMENT_ENTRY.pack(score), record_id * SENTIMENT_ENTRY.size)
+
+    # Encoding
+
+    def _encode(self, record: Dict) -> str:
+        if self.codec is None:
+            return json.dumps(record, separators=(",", ":"))
+        return self.codec.encode(record)
+
+    def _decode(self, line: bytes, record_id: int) -> Dict:
+        record = json.loads(line)
+        if self.codec is None:
+            return record
+        return self.codec.decode(record, record_id)
+
+    # Reads
+
+    def __len__(self) -> int:
+        return self._next_id
+
+    def _locate(self, record_id: int):
+        entry = os.pread(self._offsets.fileno(), OFFSET_ENTRY.size, record_id * OFFSET_ENTRY.size)
+        return OFFSET_ENTRY.unpack(entry)
+
+    def sentiment_scores(self, start_id: int, end_id: int) -> array:
+        """Return the stored scores of a range of ids; NaN marks records not scored yet."""
+        end_id = min(end_id, self._next_id)
+        return self._sentiment_scores(start_id, end_id) if start_id < end_id else array("f")
+
+    def _sentiment_scores(self, start_id: int, end_id: int) -> array:
+        scores = array("f")
+        scores.frombytes(os.pread(
+            self._sentiment,
+            (end_id - start_id) * SENTIMENT_ENTRY.size,
+            start_id * SENTIMENT_ENTRY.size,
+        ))
+        return scores
+
+    @staticmethod
+    def _overlay_sentiment(record: Dict, score: float) -> Dict:
+        if not math.isnan(score):
+            record["sentiment_score"] = round(score, 4)
+        return record
+
+    def _file(self, number: int) -> Dict:
+        entry = self._files.get(number)
+        if entry is None and self.read_only:
+            # Written by a compaction in the writer process since the manifest was read
+            with self._lock:
+                self._set_manifest(self._load_manifest())
+            entry = self._files.get(number)
+        if entry is None:
+            raise IOError(f"File {number} is not in the manifest")
+        return entry
+
+    def _archive(self, entry: Dict) -> ArchiveReader:
+        reader = self._archives.get(entry["name"])
+        if reader is None:
+            reader = self._archives[entry["name"]] = ArchiveReader(self._path(entry))
+        return reader
+
+    def _read(self, number: int, offset: int, length: int) -> bytes:
+        entry = self._file(number)
+        if entry.get("archived"):
+            data = self._archive(entry).read(offset, length)
+        else:
+            with open(self._path(entry), "rb") as f:
+                data = os.pread(f.fileno(), length, offset)
+        if len(data) < length:
+            raise IOError(f"{entry['name']} is missing records")
+        return data
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        """Read a single record by id, or ``None`` if it does not exist."""
+        if not 0 <= record_id < self._next_id:
+            return None
+        record = self._decode(self._read(*self._locate(record_id)), record_id)
+        return self._overlay_sentiment(record, self._sentiment_scores(record_id, record_id + 1)[0])
+
+    def iter_records(self, start_id: int = 0, end_id: Optional[int] = None) -> Iterator[Dict]:
+        """Yield stored records in id order from ``start_id`` up to ``end_id``.
+
+        The offset index is used to seek straight to ``start_id``, so starting
+        deep into the log costs the same as starting at the beginning. Index
+        entries are read in blocks, and each run of records stored next to
+        each other in one file is fetched with a single read.
+        """
+        # Snapshot the committed range so concurrent appends are not half-read
+        end_id = self._next_id if end_id is None else min(end_id, self._next_id)
+        record_id = max(start_id, 0)
+        while record_id < end_id:
+            stop_id = min(record_id + READ_BLOCK_RECORDS, end_id)
+            entries = list(OFFSET_ENTRY.iter_unpack(os.pread(
+                self._offsets.fileno(),
+                (stop_id - record_id) * OFFSET_ENTRY.size,
+                record_id * OFFSET_ENTRY.size,
+            )))
+            scores = self._sentiment_scores(record_id, stop_id)
+            run_start = 0
+            while run_start < len(entries):
+                number, offset, _ = entries[run_start]
+                run_end, run_bytes = run_start, 0
+                while (run_end < len(entries) and entries[run_end][0] == number
+                       and entries[run_end][1] == offset + run_bytes):
+                    run_bytes += entries[run_end][2]
+                    run_end += 1
+                data = self._read(number, offset, run_bytes)
+                position = 0
+                for i in range(run_start, run_end):
+                    line = data[position:position + entries[i][2]]
+                    position += entries[i][2]
+                    yield self._overlay_sentiment(self._decode(line, record_id + i), scores[i])
+                run_start = run_end
+            record_id = stop_id
+
+    def iter_range(self, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> Iterator[Dict]:
+        """Yield the records created between ``created_from`` and ``created_to``, inclusive.
+
+        Partitions whose period lies outside the range are skipped without
+        being opened; segments not compacted yet are always scanned. Records
+        come partition by partition, so they are grouped by time but not in
+        id order.
+        """
+        start = naive_utc(created_from) if created_from is not None else None
+        end = naive_utc(created_to) if created_to is not None else None
+
+        def in_range(record: Dict) -> bool:
+            if start is None and end is None:
+                return True
+            try:
+                created_at = naive_utc(datetime.fromisoformat(record["created_at"]))
+            except (KeyError, TypeError, ValueError):
+                return False
+            return (start is None or created_at >= start) and (end is None or created_at <= end)
+
+        with self._lock:
+            partitions = sorted(self._manifest["partitions"], key=lambda entry: (entry["partition"], entry["number"]))
+            first_segment_id = self._manifest["segments"][0]["first_id"]
+            next_number = self._manifest["next_number"]
+            end_id = self._next_id
+        if partitions and first_segment_id:
+            # Mapped rather than read, so memory use does not grow with the store
+            scores = np.memmap(os.path.join(self.directory, self.SENTIMENT_FILE), np.float32, mode="r", shape=(first_segment_id,))
+        for entry in partitions:
+            bounds = partition_bounds(entry["partition"])
+            if bounds is not None and (
+                (start is not None and bounds[1] <= start) or (end is not None and bounds[0] > end)
+            ):
+                continue
+            # A compaction running meanwhile may copy these records to files created after
+            # this read began; the copies read here are then still the ones to return
+            members = self._live_members(entry, first_segment_id, moved_from=next_number)
+            for record_id, line in self._iter_members(entry, members):
+                record = self._overlay_sentiment(self._decode(line, record_id), float(scores[record_id]))
+                if in_range(record):
+                    yield record
+        for record in self.iter_records(first_segment_id, end_id):
+            if in_range(record):
+                yield record
+
+    # Partitions and compaction
+
+    def _live_members(self, entry: Dict, end_id: int, moved_from: Optional[int] = None) -> Dict[int, int]:
+        """Map byte offset to record id for the records of a partition file that are live.
+
+        A copy is live while the offset index points at it; copies left
+        behind by an interrupted compaction are not. With ``moved_from``,
+        copies whose record has since moved to a file numbered from there
+        on also count as live.
+        """
+        with open(self._path(entry) + ".ids", "rb") as f:
+            data = f.read()
+        members = np.frombuffer(data, MEMBER_DTYPE, count=len(data) // MEMBER_DTYPE.itemsize)
+        members = members[members["id"] < end_id]
+        if not len(members):
+            return {}
+        index = np.memmap(os.path.join(self.directory, self.OFFSET_INDEX_FILE), OFFSET_DTYPE, mode="r", shape=(end_id,))
+        located = index[members["id"].astype(np.int64)]
+        live = (located["file"] == entry["number"]) & (located["offset"] == members["offset"])
+        if moved_from is not None:
+            live |= located["file"] >= moved_from
+        return dict(zip(members["offset"][live].tolist(), members["id"][live].tolist()))
+
+    def _iter_members(self, entry: Dict, members: Dict[int, int]) -> Iterator[Tuple[int, bytes]]:
+        """Yield (id, line) for the given members of a partition file, in file order."""
+        if not members:
+            return
+        if entry.get("archived"):
+            lines = self._archive(entry).iter_lines()
+        else:
+            lines = self._iter_plain_lines(self._path(entry))
+        remaining = len(members)
+        for offset, line in lines:
+            record_id = members.get(offset)
+            if record_id is not None:
+                yield record_id, line
+                remaining -= 1
+                if not remaining:
+                    return
+
+    @staticmethod
+    def _iter_plain_lines(path: str) -> Iterator[Tuple[int, bytes]]:
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                yield offset, line
+                offset += len(line)
+
+    def storage_stats(self) -> Dict:
+        """Sizes of the segments and partitions, for monitoring."""
+        with self._lock:
+            partitions = list(self._manifest["partitions"])
+            segments = len(self._manifest["segments"])
+        archived = [entry for entry in partitions if entry["archived"]]
+        return {
+            "segments": segments,
+            "partitions": len({entry["partition"] for entry in partitions}),
+            "partition_files": len(partitions),
+            "archived_files": len(archived),
+            "archived_bytes": sum(entry["bytes"] for entry in archived),
+            "partition_bytes": sum(entry["bytes"] for entry in partitions if not entry["archived"]),
+        }
+
+    def compact(self, archive_before: Optional[datetime] = None) -> Dict[str, int]:
+        """Move sealed segments into time partitions, merge fragments and archive old partitions.
+
+        Runs alongside writes and reads. Records are copied and fsynced
+        first, their offset index entries are repointed, and only then does
+        the manifest drop the files they came from; those are deleted by the
+        next pass, so a read that located a record just before still finds
+        it. Partitions whose period ended before ``archive_before`` are
+        rewritten as gzip archives. Returns counts of what was done.
+        """
+        if self.read_only:
+            raise IOError("The store is open read-only")
+        with self._compact_lock:
+            stats = {"deleted": self._delete_obsolete(), "moved": 0, "merged": 0, "archived": 0}
+            with self._lock:
+                if self._active.tell() > 0:
+                    self._roll_segment()
+                sealed = self._manifest["segments"][:-1]
+                # Moved records' entries are rewritten below; a late flush of the
+                # appended entries must not land on top of them
+                self._offsets.flush()
+                os.fsync(self._offsets.fileno())
+            for segment in sealed:
+                stats["moved"] += self._move_segment(segment)
+            by_partition: Dict[str, List[Dict]] = {}
+            for entry in self._manifest["partitions"]:
+                by_partition.setdefault(entry["partition"], []).append(entry)
+            for key, entries in sorted(by_partition.items()):
+                bounds = partition_bounds(key)
+                plain = [entry for entry in entries if not entry["archived"]]
+                if archive_before is not None and bounds is not None and bounds[1] <= naive_utc(archive_before):
+                    if plain:
+                        self._rewrite_partition(key, entries, archived=True)
+                        stats["archived"] += 1
+                elif len(plain) > 1 and sum(entry["bytes"] for entry in plain) < self.segment_max_bytes:
+                    self._rewrite_partition(key, plain, archived=False)
+                    stats["merged"] += 1
+            return stats
+
+    def _move_segment(self, segment: Dict) -> int:
+        """Append the records of a sealed segment to the partitions they belong to."""
+        groups: Dict[str, List[Tuple[int, bytes]]] = {}
+        record_id = segment["first_id"]
+        with open(self._path(segment), "rb") as f:
+            for line in f:
+                key = partition_key(self._decode(line, record_id).get("created_at"), self.partition_by)
+                groups.setdefault(key, []).append((record_id, line))
+                record_id += 1
+        if record_id - segment["first_id"] != segment["records"]:
+            raise IOError(f"Segment {segment['name']} is missing records")
+        moved, sizes = [], {}
+        for key, lines in sorted(groups.items()):
+            target = self._append_target(key)
+            path = self._path(target)
+            with open(path, "a+b") as data:
+                offset = data.tell()
+                if offset and os.pread(data.fileno(), 1, offset - 1) != b"\n":
+                    # A torn line left by an interrupted pass; keep it apart from the next record
+                    data.write(b"\n")
+                    offset += 1
+                chunk, sidecar = bytearray(), bytearray()
+                for record_id, line in lines:
+                    moved.append((record_id, target["number"], offset + len(chunk), len(line)))
+                    sidecar += MEMBER_ENTRY.pack(record_id, offset + len(chunk))
+                    chunk += line
+                data.write(chunk)
+                data.flush()
+                os.fsync(data.fileno())
+                sizes[target["number"]] = (len(lines), data.tell())
+            # The data is durable before the sidecar names it
+            with open(path + ".ids", "ab") as f:
+                f.write(sidecar)
+                f.flush()
+                os.fsync(f.fileno())
+        self._repoint(moved)
+        with self._lock:
+            for entry in self._manifest["partitions"]:
+                if entry["number"] in sizes:
+                    records, size = sizes[entry["number"]]
+                    entry["records"] += records
+                    entry["bytes"] = size
+            self._manifest["segments"].remove(segment)
+            self._retire([segment])
+        return len(moved)
+
+    def _append_target(self, key: str) -> Dict:
+        """Return the partition file new records for ``key`` go to, creating one if needed."""
+        with self._lock:
+            for entry in reversed(self._manifest["partitions"]):
+                if entry["partition"] == key and not entry["archived"] and entry["bytes"] < self.segment_max_bytes:
+                    return entry
+            entry = self._new_partition_entry(key, archived=False)
+            # Listed before any index entry can point into it
+            self._manifest["partitions"].append(entry)
+            self._write_manifest(self._manifest)
+            self._set_manifest(self._manifest)
+            return entry
+
+    def _new_partition_entry(self, key: str, archived: bool) -> Dict:
+        number = self._manifest["next_number"]
+        self._manifest["next_number"] += 1
+        return {
+            "number": number,
+            "name": f"part-{key}-{number:06d}.jsonl" + (".gz" if archived else ""),
+            "partition": key,
+            "records": 0,
+            "bytes": 0,
+            "archived": archived,
+        }
+
+    def _rewrite_partition(self, key: str, sources: List[Dict], archived: bool) -> None:
+        """Copy the live records of ``sources`` into one new file, plain or archived."""
+        with self._lock:
+            target = self._new_partition_entry(key, archived)
+            end_id = self._next_id
+        path = self._path(target)
+        out = ArchiveWriter(path, self.archive_block_bytes) if archived else open(path + ".tmp", "wb")
+        moved, sidecar = [], bytearray()
+        for source in sources:
+            for record_id, line in self._iter_members(source, self._live_members(source, end_id)):
+                offset = out.tell()
+                out.write(line)
+                moved.append((record_id, target["number"], offset, len(line)))
+                sidecar += MEMBER_ENTRY.pack(record_id, offset)
+        if archived:
+            size = out.close()
+        else:
+            out.flush()
+            os.fsync(out.fileno())
+            size = out.tell()
+            out.close()
+            os.replace(path + ".tmp", path)
+        with open(path + ".ids.tmp", "wb") as f:
+            f.write(sidecar)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".ids.tmp", path + ".ids")
+        target.update(records=len(moved), bytes=size)
+        with self._lock:
+            self._manifest["partitions"].append(target)
+            self._write_manifest(self._manifest)
+            self._set_manifest(self._manifest)
+        self._repoint(moved)
+        with self._lock:
+            for source in sources:
+                self._manifest["partitions"].remove(source)
+            self._retire(sources)
+
+    def _repoint(self, moved: List[Tuple[int, int, int, int]]) -> None:
+        """Point the offset index entries of moved records at their new copies, durably."""
+        if self._offsets_rw is None:
+            # Positioned writes ignore the offset on an O_APPEND descriptor, so rewrites use their own
+            self._offsets_rw = os.open(os.path.join(self.directory, self.OFFSET_INDEX_FILE), os.O_WRONLY)
+        moved.sort()
+        run, run_start = bytearray(), 0
+        for i, (record_id, number, offset, length) in enumerate(moved):
+            if run and record_id != moved[i - 1][0] + 1:
+                os.pwrite(self._offsets_rw, run, run_start * OFFSET_ENTRY.size)
+                run = bytearray()
+            if not run:
+                run_start = record_id
+            run += OFFSET_ENTRY.pack(number, offset, length)
+        if run:
+            os.pwrite(self._offsets_rw, run, run_start * OFFSET_ENTRY.size)
+        os.fsync(self._offsets_rw)
+
+    def _retire(self, entries: List[Dict]) -> None:
+        """Drop files from the manifest; they are deleted by the next compaction. Needs ``_lock``."""
+        for entry in entries:
+            names = [entry["name"]]
+            if "partition" in entry:
+                names.append(entry["name"] + ".ids")
+            if entry.get("archived"):
+                names.append(entry["name"] + ".idx")
+            self._manifest["obsolete"].extend(names)
+        self._write_manifest(self._manifest)
+        self._set_manifest(self._manifest)
+
+    def _delete_obsolete(self) -> int:
+        with self._lock:
+            names = self._manifest["obsolete"]
+            if not names:
+                return 0
+            for name in names:
+                reader = self._archives.pop(name, None)
+                if reader is not None:
+                    reader.close()
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            self._manifest["obsolete"] = []
+            self._write_manifest(self._manifest)
+        return len(names)
+
+    # Migration
+
+    def migrate_legacy(self, legacy_file: str, chunk_size: int = 10000) -> int:
+        """Import a legacy ``feedback.json`` array into the log, once.
+
+        The legacy file is renamed with a ``.migrated`` suffix rather than
+        deleted so it stays around as a backup. Migration runs before any other
+        write, so an interrupted run is resumed from the records already in
+        the log.
+        """
+        if self._manifest.get("migrated_from") or not os.path.exists(legacy_file):
+            return 0
+        with open(legacy_file, "r") as f:
+            data = json.load(f)
+        for start in range(len(self), len(data), chunk_size):
+            self.append_many(data[start:start + chunk_size])
+        with self._lock:
+            self._manifest["migrated_from"] = legacy_file
+            self._write_manifest(self._manifest)
+        os.replace(legacy_file, legacy_file + ".migrated")
+        return len(data)
@@ -0,0 +1,358 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond index updates to slow fsyncs
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class _Shards:
+    """A fixed-size list of numbers per thread.
+
+    Each thread only ever updates its own list, so recording takes no lock and
+    threads never contend; a scrape sums the lists of every thread that has
+    recorded something. Only creating a thread's list takes the lock.
+    """
+
+    __slots__ = ("_size", "_local", "_shards", "_lock")
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0] * self._size
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def total(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self._size
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the series for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def collect(self) -> Dict[Tuple[str, ...], List[float]]:
+        """Return the raw numbers of each series, by label values."""
+        return {values: child.sample() for values, child in self._series()}
+
+    def _render_series(self, values: Tuple[str, ...], sample: List[float]) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self, remote: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> Iterable[str]:
+        """Render every series, adding ``remote`` (as returned by another process's ``collect``) to this one's."""
+        series = self.collect()
+        if series is None and not remote:
+            return
+        series = dict(series or {})
+        for values, sample in (remote or {}).items():
+            local = series.get(values)
+            series[values] = sample if local is None else [a + b for a, b in zip(local, sample)]
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, sample in sorted(series.items()):
+            yield from self._render_series(values, sample)
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.get()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.total()[0]
+
+    def sample(self) -> List[float]:
+        return self._shards.total()
+
+
+class Counter(_Metric):
+    """A monotonically increasing total, e.g. requests served or bytes written."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _render_series(self, values: Tuple[str, ...], sample: List[float]) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(sample[0])}"
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_shards")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One count per bucket plus +Inf, then the sum of observed values
+        self._shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        values = self._shards.get()
+        values[bisect.bisect_left(self._bounds, value)] += 1
+        values[-1] += value
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        values = self._shards.total()
+        return values[:-1], values[-1]
+
+    def sample(self) -> List[float]:
+        return self._shards.total()
+
+
+class Histogram(_Metric):
+    """Observed values counted into cumulative ``le`` buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_series(self, values: Tuple[str, ...], sample: List[float]) -> Iterable[str]:
+        counts, total = sample[:-1], sample[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(self.labelnames, values, f'le="{le}"')
+            yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {_format_value(cumulative)}"
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time, e.g. a queue depth.
+
+    The callback returns a number, or a dict of label values tuple -> number.
+    Nothing is recorded between scrapes, so a gauge costs nothing on the
+    paths it describes.
+    """
+
+    def __init__(self, name: str, help: str, function: Callable, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.function = function
+        self.kind = kind
+
+    def collect(self) -> Optional[Dict[Tuple[str, ...], List[float]]]:
+        try:
+            value = self.function()
+        except Exception:
+            # A failing callback drops its own series, never the whole scrape
+            return None
+        series = value.items() if isinstance(value, dict) else [((), value)]
+        return {tuple(values): [number] for values, number in series}
+
+    def _render_series(self, values: Tuple[str, ...], sample: List[float]) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(sample[0])}"
+
+
+class MetricsRegistry:
+    """The metrics exported by the process, rendered in the Prometheus text format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._with_default_series(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._with_default_series(Histogram(name, help, labelnames, buckets))
+
+    def _with_default_series(self, metric: _Metric) -> _Metric:
+        # Unlabelled metrics are exported as zero before the first observation
+        if not metric.labelnames:
+            metric.labels()
+        return self.register(metric)
+
+    def gauge(self, name: str, help: str, function: Callable, labelnames: Sequence[str] = (), kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, function, labelnames, kind))
+
+    def collect(self, names: Iterable[str]) -> Dict[str, List]:
+        """Return the raw series of the named metrics, JSON-serialisable, for another process's ``render``."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in names if name in self._metrics]
+        collected = {}
+        for metric in metrics:
+            series = metric.collect()
+            if series is not None:
+                collected[metric.name] = [[list(values), sample] for values, sample in series.items()]
+        return collected
+
+    def render(self, remote: Optional[Dict[str, List]] = None) -> str:
+        """Render every metric, adding the series another process ``collect``-ed to those of the same name."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        remote = remote or {}
+        lines = [
+            line
+            for metric in metrics
+            for line in metric.render({tuple(values): sample for values, sample in remote.get(metric.name, ())})
+        ]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Hot-path instruments, recorded where the work happens
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template, method and status.",
+    ["route", "method", "status"],
+)
+SAVE_SECONDS = registry.histogram(
+    "feedback_save_duration_seconds", "Time for FeedbackService.save, from call until durable or answered as duplicate.",
+)
+SAVE_PHASE_SECONDS = registry.histogram(
+    "feedback_save_phase_seconds",
+    "Time spent per phase of a save: read (answering a duplicate), queue (waiting for the group commit), "
+    "serialize, write, fsync and index. Phases of a commit are recorded once per batch.",
+    ["phase"],
+)
+COMMIT_BATCH_RECORDS = registry.histogram(
+    "feedback_commit_batch_records", "Records written per commit.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384),
+)
+BYTES_WRITTEN = registry.counter(
+    "feedback_store_bytes_written_total", "Bytes appended to the feedback store, by file.", ["file"],
+)
+SAVE_ERRORS = registry.counter(
+    "feedback_save_errors_total", "Saves that failed with an internal error (HTTP 500 from POST /feedback).",
+)
+
+# Recorded by whichever process writes the store. In multi-worker mode that is
+# the writer, and workers add its series to their own when scraped.
+WRITER_METRICS = (
+    SAVE_PHASE_SECONDS.name,
+    COMMIT_BATCH_RECORDS.name,
+    BYTES_WRITTEN.name,
+    "feedback_write_queue_depth",
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request latency.
+
+    Requests are labelled with the matched route's path template, so
+    ``/feedback/123`` and ``/feedback/456`` share a series; unmatched paths
+    share ``unmatched``. A plain ASGI wrapper adds one function call per
+    response message, unlike ``BaseHTTPMiddleware``, which runs every request
+    through an extra task and stream.
+    """
+
+    def __init__(self, app, histogram: Histogram = REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            router = scope.get("router")
+            for candidate in getattr(router, "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = "unmatched"
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.labels(self._route(scope), scope["method"], str(status)).observe(
+                time.perf_counter() - started
+            )
+
@@ -0,0 +1,141 @@
+import bisect
+import gzip
+import os
+from array import array
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple
+from ..models.feedback import naive_utc
+
+# Records whose created_at cannot be parsed; such a partition is never archived
+UNDATED = "undated"
+
+
+def partition_key(created_at: Optional[str], partition_by: str = "month") -> str:
+    """Name the partition a record belongs to: ``YYYY-MM`` or ``YYYY-MM-DD`` in UTC."""
+    try:
+        moment = naive_utc(datetime.fromisoformat(created_at))
+    except (TypeError, ValueError):
+        return UNDATED
+    return moment.strftime("%Y-%m-%d" if partition_by == "day" else "%Y-%m")
+
+
+def partition_bounds(key: str) -> Optional[Tuple[datetime, datetime]]:
+    """Return the [start, end) interval a partition covers, or ``None`` if undated."""
+    if key == UNDATED:
+        return None
+    if len(key) == len("YYYY-MM-DD"):
+        start = datetime.strptime(key, "%Y-%m-%d")
+        return start, start + timedelta(days=1)
+    start = datetime.strptime(key, "%Y-%m")
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+class ArchiveWriter:
+    """Writes lines as a block-compressed gzip file with a block index.
+
+    Lines are grouped into blocks of about ``block_bytes`` and each block is
+    compressed as an independent gzip member, so the file is still ordinary
+    gzip (``zcat`` reads it whole) while any line can be read by
+    decompressing just its block. The ``.idx`` sidecar lists the
+    uncompressed and compressed start of every block, followed by the
+    total sizes; record offsets are positions in the uncompressed data.
+    Both files are written under temporary names and put in place by
+    ``close``.
+    """
+
+    def __init__(self, path: str, block_bytes: int = 64 * 1024):
+        self.path = path
+        self.block_bytes = block_bytes
+        self._file = open(path + ".tmp", "wb")
+        self._block = bytearray()
+        self._index = array("Q")
+        self._uncompressed = 0
+
+    def tell(self) -> int:
+        """Uncompressed offset the next line will be written at."""
+        return self._uncompressed + len(self._block)
+
+    def write(self, line: bytes) -> None:
+        self._block += line
+        if len(self._block) >= self.block_bytes:
+            self._flush_block()
+
+    def _flush_block(self) -> None:
+        if not self._block:
+            return
+        self._index.extend((self._uncompressed, self._file.tell()))
+        self._file.write(gzip.compress(bytes(self._block), compresslevel=6))
+        self._uncompressed += len(self._block)
+        self._block = bytearray()
+
+    def close(self) -> int:
+        """Finish both files, fsync them and return the compressed size."""
+        self._flush_block()
+        size = self._file.tell()
+        self._index.extend((self._uncompressed, size))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        with open(self.path + ".idx.tmp", "wb") as f:
+            f.write(self._index.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".idx.tmp", self.path + ".idx")
+        os.replace(self.path + ".tmp", self.path)
+        os.chmod(self.path, 0o444)
+        os.chmod(self.path + ".idx", 0o444)
+        return size
+
+
+class ArchiveReader:
+    """Random and sequential reads from a file written by ``ArchiveWriter``.
+
+    The most recently used decompressed blocks are cached, so neighbouring
+    records cost one decompression between them.
+    """
+
+    def __init__(self, path: str, cached_blocks: int = 4):
+        self.path = path
+        index = array("Q")
+        with open(path + ".idx", "rb") as f:
+            index.frombytes(f.read())
+        self._starts = index[0::2]
+        self._compressed = index[1::2]
+        self._fd = os.open(path, os.O_RDONLY)
+        self._block = lru_cache(maxsize=cached_blocks)(self._read_block)
+
+    def _read_block(self, number: int) -> bytes:
+        start = self._compressed[number]
+        data = os.pread(self._fd, self._compressed[number + 1] - start, start)
+        return gzip.decompress(data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        number = bisect.bisect_right(self._starts, offset) - 1
+        if number < 0 or offset + length > self._starts[-1]:
+            raise IOError(f"Archive {os.path.basename(self.path)} has no data at offset {offset}")
+        data = self._block(number)
+        start = offset - self._starts[number]
+        while start + length > len(data):
+            # A line never spans blocks, but a read of several lines may
+            number += 1
+            data = data[start:] + self._block(number)
+            start = 0
+        return data[start:start + length]
+
+    def iter_lines(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield every line with its uncompressed offset, in file order."""
+        for number in range(len(self._starts) - 1):
+            offset = self._starts[number]
+            for line in self._read_block(number).splitlines(keepends=True):
+                yield offset, line
+                offset += len(line)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
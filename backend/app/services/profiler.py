@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+from ..models.feedback import ProfileCapture
+
+# Capture names are generated here; anything else is refused when downloading
+CAPTURE_NAME = re.compile(r"^[0-9]{8}T[0-9]{12}-[A-Z]+-[a-z0-9_-]+\.collapsed$")
+# Innermost frames of pool threads blocked waiting for work; such samples are dropped
+IDLE_FRAMES = {("thread.py", "_worker"), ("threading.py", "wait")}
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the Python stacks of every thread from a background thread.
+
+    Stacks are counted in the collapsed format (``thread;outer;...;inner N``),
+    which speedscope and flamegraph.pl read directly; threads idling in a
+    pool are left out. Sampling needs no
+    tracing hooks, so the profiled code runs at full speed apart from the
+    sampler briefly taking the GIL each interval.
+    """
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                if thread_id == own_id or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+
+class ProfileStore:
+    """Captures on disk, one collapsed-stack file plus a JSON sidecar each.
+
+    Only the newest ``retain`` captures are kept.
+    """
+
+    def __init__(self, directory: str, retain: int = 50):
+        self.directory = directory
+        self.retain = retain
+
+    def save(self, capture: ProfileCapture, stacks: Counter) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, capture.name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+        with open(tmp_path, "w") as f:
+            f.write(capture.json())
+        os.replace(tmp_path, path + ".json")
+        self._prune()
+
+    def _prune(self) -> None:
+        names = sorted(name for name in os.listdir(self.directory) if CAPTURE_NAME.match(name))
+        for name in names[:-self.retain] if self.retain > 0 else names:
+            for path in (os.path.join(self.directory, name), os.path.join(self.directory, name + ".json")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[ProfileCapture]:
+        """Return the kept captures, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        captures = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not CAPTURE_NAME.match(name):
+                continue
+            try:
+                with open(os.path.join(self.directory, name + ".json")) as f:
+                    captures.append(ProfileCapture(**json.load(f)))
+            except (FileNotFoundError, ValueError):
+                # Pruned or still being written
+                continue
+        return captures
+
+    def path(self, name: str) -> Optional[str]:
+        """Return the file of a capture, or ``None`` for unknown or malformed names."""
+        if not CAPTURE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling selected requests with a ``StackSampler``.
+
+    A request is profiled when it carries ``X-Profile: 1`` or is picked at
+    ``sample_rate``. One request is profiled at a time; others arriving
+    meanwhile run unprofiled, which bounds the overhead. The sampler sees
+    every thread, so the group-commit writer thread shows up next to the
+    event loop, along with any concurrent requests. The capture name is
+    returned in the ``X-Profile-Id`` response header.
+
+    The middleware is only installed when profiling is enabled, so a
+    disabled profiler costs nothing.
+    """
+
+    HEADER = b"x-profile"
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, interval: float = 0.002):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._active = False
+
+    def _selected(self, scope) -> bool:
+        if self._active:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.HEADER:
+                return value in (b"1", b"true")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+        self._active = True
+        now = datetime.now(timezone.utc)
+        route = re.sub(r"[^a-z0-9]+", "_", scope["path"].lower()).strip("_") or "root"
+        name = f"{now:%Y%m%dT%H%M%S%f}-{scope['method']}-{route[:64]}.collapsed"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", name.encode())])
+            await send(message)
+
+        sampler = StackSampler(self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            duration = time.perf_counter() - started
+            self._active = False
+            capture = ProfileCapture(
+                name=name,
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=duration * 1000,
+                samples=sampler.samples,
+                created_at=now,
+            )
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.store.save, capture, stacks)
+            except OSError:
+                # A full or read-only disk must not fail the request being profiled
+                pass
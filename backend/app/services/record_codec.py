@@ -0,0 +1,178 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from ..models.question_flow import FEEDBACK_TYPES, all_questions
+
+# Leading element of every compact line; legacy lines are JSON objects instead
+FORMAT_COMPACT = 1
+
+EPOCH = datetime(1970, 1, 1)
+
+# Fields of a stored record; records with anything else are written as plain JSON
+RECORD_FIELDS = ("id", "text", "feedback_type", "responses", "created_at", "user_id", "sentiment_score")
+
+
+class RecordCodec:
+    """Compact storage encoding for feedback records, driven by the question flows.
+
+    A record is stored as a JSON array::
+
+        [1, codebook_version, created_at, feedback_type, user_id, sentiment_score, responses, text]
+
+    ``responses`` is a flat ``[key, value, key, value, ...]`` list in which
+    known question keys are replaced by integer codes, selectbox answers by the
+    code of the option (answers outside the options are wrapped in a one-item
+    list), and slider and free-text answers are kept as they are. ``text`` is
+    ``null`` when it is just ``str(responses)``, as the chat UI sends it, and
+    ``created_at`` is microseconds since the epoch for naive timestamps. The
+    id is not stored at all, since the log already knows it.
+
+    The codebook is persisted next to the log and only ever appended to:
+    questions or options added to the flows get new codes and bump the
+    version, so lines written under any earlier version still decode.
+    Lines that are plain JSON objects (written before this encoding) are
+    returned unchanged.
+
+    A ``read_only`` codec only decodes. It never extends the codebook, and
+    reloads it when a line from a newer version written by another process
+    turns up.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self.version = 0
+        self.keys: List[str] = []
+        self.feedback_types: List[str] = []
+        self.options: Dict[str, List[str]] = {}
+        self._load()
+        if not read_only and self._extend():
+            self.version += 1
+            self._save()
+        self._build_lookups()
+
+    def _load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            self.version = saved["version"]
+            self.keys = saved["keys"]
+            self.feedback_types = saved["feedback_types"]
+            self.options = saved["options"]
+
+    def _build_lookups(self) -> None:
+        self._key_codes = {key: code for code, key in enumerate(self.keys)}
+        self._type_codes = {value: code for code, value in enumerate(self.feedback_types)}
+        self._option_codes = {
+            key: {option: code for code, option in enumerate(options)} for key, options in self.options.items()
+        }
+
+    def _extend(self) -> bool:
+        """Append codes for anything in the current flows the codebook lacks."""
+        changed = False
+        for feedback_type in FEEDBACK_TYPES:
+            if feedback_type not in self.feedback_types:
+                self.feedback_types.append(feedback_type)
+                changed = True
+        for question in all_questions():
+            key = question["key"]
+            if key not in self.keys:
+                self.keys.append(key)
+                changed = True
+            if question["type"] == "selectbox":
+                options = self.options.setdefault(key, [])
+                for option in question["options"]:
+                    if option not in options:
+                        options.append(option)
+                        changed = True
+        return changed
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": self.version,
+                "keys": self.keys,
+                "feedback_types": self.feedback_types,
+                "options": self.options,
+            }, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # Encoding
+
+    def encode(self, record: Dict) -> str:
+        if not set(record) <= set(RECORD_FIELDS) or not isinstance(record.get("responses") or {}, dict):
+            return json.dumps(record, separators=(",", ":"))
+        responses = record.get("responses") or {}
+        encoded_responses = []
+        for key, value in responses.items():
+            options = self._option_codes.get(key)
+            if options is not None:
+                code = options.get(value) if isinstance(value, str) else None
+                value = code if code is not None else [value]
+            encoded_responses.append(self._key_codes.get(key, key))
+            encoded_responses.append(value)
+        text = record.get("text")
+        if text == str(responses):
+            text = None
+        feedback_type = record.get("feedback_type")
+        return json.dumps([
+            FORMAT_COMPACT,
+            self.version,
+            self._encode_time(record.get("created_at")),
+            self._type_codes.get(feedback_type, feedback_type),
+            record.get("user_id"),
+            record.get("sentiment_score"),
+            encoded_responses,
+            text,
+        ], separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def _encode_time(value: Optional[str]):
+        # Only naive timestamps that round-trip exactly are turned into integers
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return value
+        if parsed.tzinfo is not None or parsed.isoformat() != value:
+            return value
+        delta = parsed - EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+    # Decoding
+
+    def decode(self, value, record_id: int) -> Dict:
+        """Turn a parsed line back into the stored record shape."""
+        if isinstance(value, dict):
+            return value
+        _, version, created_at, feedback_type, user_id, sentiment_score, encoded_responses, text = value
+        if version > self.version and self.read_only:
+            self._load()
+            self._build_lookups()
+        if version > self.version:
+            raise ValueError(f"Record {record_id} uses codebook version {version}, newer than {self.version}")
+        responses = {}
+        for i in range(0, len(encoded_responses), 2):
+            key, answer = encoded_responses[i], encoded_responses[i + 1]
+            if isinstance(key, int):
+                key = self.keys[key]
+            if key in self.options:
+                answer = answer[0] if isinstance(answer, list) else self.options[key][answer]
+            responses[key] = answer
+        if isinstance(created_at, int):
+            created_at = (EPOCH + timedelta(microseconds=created_at)).isoformat()
+        if isinstance(feedback_type, int):
+            feedback_type = self.feedback_types[feedback_type]
+        return {
+            "id": record_id,
+            "text": str(responses) if text is None else text,
+            "feedback_type": feedback_type,
+            "responses": responses,
+            "created_at": created_at,
+            "user_id": user_id,
+            "sentiment_score": sentiment_score,
+        }
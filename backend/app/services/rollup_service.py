@@ -0,0 +1,145 @@
+import bisect
+import threading
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..models.feedback import RollupRow, naive_utc
+from .feedback_index import to_epoch
+from .sentiment_service import sentiment_label
+
+# (feedback_type, product_name, user_role, sentiment)
+RollupKey = Tuple[str, str, str, str]
+KEY_FIELDS = ("feedback_type", "product_name", "user_role", "sentiment")
+
+
+class RollupTable:
+    """Pre-aggregated feedback counts per day, type, product, role and sentiment.
+
+    Counts are updated with every committed write, so dashboard aggregates are
+    read from a table whose size depends on the number of days and categories
+    rather than the number of records.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # day -> key -> [count, sum of sentiment scores]
+        self._days: Dict[date, Dict[RollupKey, List[float]]] = {}
+        self._sorted_days: List[date] = []
+
+    @staticmethod
+    def _key(record: Dict) -> Tuple[date, RollupKey]:
+        responses = record.get("responses") or {}
+        day = naive_utc(datetime.fromisoformat(record["created_at"])).date()
+        return day, (
+            record.get("feedback_type") or "",
+            responses.get("product_name") or "",
+            responses.get("user_role") or "",
+            sentiment_label(record.get("sentiment_score")),
+        )
+
+    def add(self, record: Dict) -> None:
+        with self._lock:
+            self._add(record)
+
+    def add_many(self, records: Iterable[Dict]) -> None:
+        with self._lock:
+            for record in records:
+                self._add(record)
+
+    def _add(self, record: Dict, sign: int = 1) -> None:
+        day, key = self._key(record)
+        cells = self._days.get(day)
+        if cells is None:
+            cells = self._days[day] = {}
+            bisect.insort(self._sorted_days, day)
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0, 0.0]
+        cell[0] += sign
+        cell[1] += sign * (record.get("sentiment_score") or 0.0)
+        if cell[0] == 0:
+            del cells[key]
+
+    def update_sentiment(self, records: Iterable[Dict], scores: Iterable[float]) -> None:
+        """Move records to the sentiment bucket of their new score."""
+        with self._lock:
+            for record, score in zip(records, scores):
+                self._add(record, sign=-1)
+                self._add(dict(record, sentiment_score=score))
+
+    def extent(self) -> Optional[Tuple[date, date]]:
+        """First and last day holding feedback, or None while the table is empty."""
+        with self._lock:
+            if not self._sorted_days:
+                return None
+            return self._sorted_days[0], self._sorted_days[-1]
+
+    def rows(
+        self,
+        day_from: Optional[date] = None,
+        day_to: Optional[date] = None,
+        feedback_type: Optional[List[str]] = None,
+        product_name: Optional[List[str]] = None,
+        user_role: Optional[List[str]] = None,
+    ) -> List[RollupRow]:
+        """Return the rollup cells within a day range, optionally filtered to some types, products and roles."""
+        with self._lock:
+            lo = bisect.bisect_left(self._sorted_days, day_from) if day_from else 0
+            hi = bisect.bisect_right(self._sorted_days, day_to) if day_to else len(self._sorted_days)
+            rows = []
+            for day in self._sorted_days[lo:hi]:
+                for (type_, product, role, sentiment), (count, score_sum) in self._days[day].items():
+                    if feedback_type is not None and type_ not in feedback_type:
+                        continue
+                    if product_name is not None and product not in product_name:
+                        continue
+                    if user_role is not None and role not in user_role:
+                        continue
+                    rows.append(RollupRow(
+                        day=day,
+                        feedback_type=type_,
+                        product_name=product,
+                        user_role=role,
+                        sentiment=sentiment,
+                        count=count,
+                        sentiment_sum=score_sum,
+                    ))
+            return rows
+
+    def series(
+        self,
+        group_by: Optional[str] = None,
+        day_from: Optional[date] = None,
+        day_to: Optional[date] = None,
+        feedback_type: Optional[List[str]] = None,
+        product_name: Optional[List[str]] = None,
+        user_role: Optional[List[str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        """Return the filtered cells as columns for bucketing.
+
+        The columns are the epoch second each cell's day starts at, its count
+        and the index of its ``group_by`` value in the returned list of
+        values; without ``group_by`` every cell is in the group "all".
+        """
+        position = KEY_FIELDS.index(group_by) if group_by else None
+        filters = (feedback_type, product_name, user_role)
+        times, counts, codes = [], [], []
+        groups: Dict[str, int] = {}
+        with self._lock:
+            lo = bisect.bisect_left(self._sorted_days, day_from) if day_from else 0
+            hi = bisect.bisect_right(self._sorted_days, day_to) if day_to else len(self._sorted_days)
+            for day in self._sorted_days[lo:hi]:
+                day_start = to_epoch(datetime.combine(day, time.min))
+                for key, (count, _) in self._days[day].items():
+                    if any(wanted is not None and value not in wanted for wanted, value in zip(filters, key)):
+                        continue
+                    group = key[position] if position is not None else "all"
+                    times.append(day_start)
+                    counts.append(count)
+                    codes.append(groups.setdefault(group, len(groups)))
+        return (
+            np.array(times, dtype=np.float64),
+            np.array(counts, dtype=np.float64),
+            np.array(codes, dtype=np.int64),
+            list(groups),
+        )
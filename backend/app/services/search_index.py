@@ -0,0 +1,320 @@
+import glob
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .feedback_index import GrowableArray
+from .sentiment_service import feedback_text, normalize_text
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i if in into is it its me my of on or so
+that the their them then there these they this to was we were will with you your
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(normalize_text(text)) if token not in STOPWORDS]
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking over the free-text feedback answers.
+
+    Each term maps to parallel arrays of document ids and term frequencies.
+    New records are indexed as they are committed and buffered until
+    ``flush_docs`` of them have accumulated; the buffer is then written to
+    ``directory`` as an immutable segment. On startup the segments are loaded
+    and only records after the last segment are tokenized again.
+
+    Segments are merged in size tiers: a segment's tier is how many times
+    ``max_segments`` divides into its size in units of ``flush_docs``. Once the
+    newest ``max_segments`` segments share a tier, they are merged into one
+    segment of the next tier, so each record is rewritten only once per tier
+    and large segments are left alone. Merges read the segment files rather
+    than the in-memory postings and run on a background thread, so commits
+    never wait for them; the merged segment replaces its inputs by name.
+
+    A ``read_only`` index loads the segments but never writes or merges
+    them; records after the last segment are indexed in memory only.
+    """
+
+    def __init__(self, directory: str, flush_docs: int = 10000, max_segments: int = 8, read_only: bool = False):
+        self.directory = directory
+        self.read_only = read_only
+        self.flush_docs = flush_docs
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._doc_ids: Dict[str, GrowableArray] = {}
+        self._term_freqs: Dict[str, GrowableArray] = {}
+        self._doc_lengths = GrowableArray(np.float32)
+        self._documents = 0
+        self._total_length = 0
+        # Postings not yet written to a segment: (term, doc id, term frequency)
+        self._pending: List[Tuple[str, int, int]] = []
+        self._pending_from = 0
+        # Held by whichever thread is merging, so two merges never share inputs
+        self._merge_lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+        if not read_only:
+            os.makedirs(self.directory, exist_ok=True)
+        self.indexed_upto = self._load_segments()
+        if not read_only:
+            self._schedule_merge()
+
+    # Segments
+
+    @staticmethod
+    def _id_range(path: str) -> Tuple[int, int]:
+        _, first, end = os.path.basename(path)[:-len(".npz")].split("-")
+        return int(first), int(end)
+
+    def _segment_files(self) -> List[str]:
+        """Return a contiguous chain of segments starting at id 0.
+
+        The widest segment is taken at each step, so segments already merged
+        but not yet deleted (while another process merges) are skipped.
+        """
+        paths = glob.glob(os.path.join(self.directory, "segment-*.npz"))
+        ranges = [(self._id_range(path), path) for path in paths if not path.endswith(".tmp.npz")]
+        chain, end_id = [], 0
+        for (first, end), path in sorted(ranges, key=lambda item: (item[0][0], -item[0][1])):
+            if first == end_id:
+                chain.append(path)
+                end_id = end
+        return chain
+
+    @staticmethod
+    def _read_segments(files: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Read consecutive segments into one vocabulary and concatenated postings and lengths."""
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, term_freqs, lengths = [], [], [], []
+        for path in files:
+            with np.load(path) as segment:
+                local_terms = segment["terms"]
+                mapping = np.array([vocabulary.setdefault(str(term), len(vocabulary)) for term in local_terms],
+                                   dtype=np.int64)
+                term_ids.append(mapping[segment["term_ids"]])
+                doc_ids.append(segment["doc_ids"])
+                term_freqs.append(segment["term_freqs"])
+                lengths.append(segment["doc_lengths"])
+        return (list(vocabulary), np.concatenate(term_ids), np.concatenate(doc_ids),
+                np.concatenate(term_freqs), np.concatenate(lengths))
+
+    def _load_segments(self) -> int:
+        """Load all persisted segments and return the id after the last indexed record."""
+        files = self._segment_files()
+        if not files:
+            return 0
+        terms, term_ids, doc_ids, term_freqs, doc_lengths = self._read_segments(files)
+        # Group every posting by term in one vectorized pass
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids, term_freqs = term_ids[order], doc_ids[order], term_freqs[order]
+        boundaries = np.flatnonzero(np.diff(term_ids)) + 1
+        starts = np.concatenate(([0], boundaries)) if len(term_ids) else []
+        ends = np.concatenate((boundaries, [len(term_ids)]))
+        for start, end in zip(starts, ends):
+            term = terms[term_ids[start]]
+            self._doc_ids[term] = self._column(doc_ids[start:end], np.int32)
+            self._term_freqs[term] = self._column(term_freqs[start:end], np.float32)
+
+        self._doc_lengths = self._column(doc_lengths, np.float32)
+        self._documents = int(np.count_nonzero(doc_lengths))
+        self._total_length = int(doc_lengths.sum())
+        self._pending_from = len(doc_lengths)
+        return len(doc_lengths)
+
+    @staticmethod
+    def _column(values: np.ndarray, dtype) -> GrowableArray:
+        column = GrowableArray(dtype, capacity=max(len(values), 4))
+        column.data[:len(values)] = values
+        column.size = len(values)
+        return column
+
+    @staticmethod
+    def _write_segment(path: str, terms: List[str], term_ids: np.ndarray, doc_ids: np.ndarray,
+                       term_freqs: np.ndarray, doc_lengths: np.ndarray) -> None:
+        # np.savez appends ".npz" to names without it, so the temporary name keeps the suffix
+        tmp_path = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.array(terms, dtype=str),
+            term_ids=term_ids.astype(np.int32),
+            doc_ids=doc_ids.astype(np.int32),
+            term_freqs=term_freqs.astype(np.int32),
+            doc_lengths=doc_lengths.astype(np.float32),
+        )
+        os.replace(tmp_path, path)
+
+    def _segment_path(self, first_id: int, end_id: int) -> str:
+        return os.path.join(self.directory, f"segment-{first_id:012d}-{end_id:012d}.npz")
+
+    def _tier(self, size: int) -> int:
+        factor = max(self.max_segments, 2)
+        tier = 0
+        while size >= self.flush_docs * factor ** (tier + 1):
+            tier += 1
+        return tier
+
+    def _next_merge(self) -> List[str]:
+        """Return the newest segments if ``max_segments`` of them share a tier, else nothing."""
+        files = self._segment_files()
+        tiers = [self._tier(end - first) for first, end in map(self._id_range, files)]
+        run = 0
+        while run < len(tiers) and tiers[-1 - run] == tiers[-1]:
+            run += 1
+        return files[-run:] if run >= max(self.max_segments, 2) else []
+
+    def _merge_tiers(self) -> None:
+        """Merge runs of same-tier segments until none is left; a merge can complete the next tier's run."""
+        with self._merge_lock:
+            files = self._next_merge()
+            while files:
+                first, _ = self._id_range(files[0])
+                _, end = self._id_range(files[-1])
+                self._write_segment(self._segment_path(first, end), *self._read_segments(files))
+                for path in files:
+                    os.remove(path)
+                files = self._next_merge()
+
+    def _schedule_merge(self) -> None:
+        if self._merge_thread is None or not self._merge_thread.is_alive():
+            self._merge_thread = threading.Thread(target=self._merge_tiers, name="search-merge", daemon=True)
+            self._merge_thread.start()
+
+    def flush(self) -> None:
+        """Persist buffered postings as a new segment and finish any merges it calls for."""
+        with self._lock:
+            self._flush()
+        if not self.read_only:
+            self._merge_tiers()
+
+    def _flush(self) -> None:
+        end_id = self._doc_lengths.size
+        if end_id <= self._pending_from or self.read_only:
+            return
+        terms = sorted({term for term, _, _ in self._pending})
+        positions = {term: i for i, term in enumerate(terms)}
+        self._write_segment(
+            self._segment_path(self._pending_from, end_id),
+            terms,
+            np.fromiter((positions[term] for term, _, _ in self._pending), dtype=np.int32, count=len(self._pending)),
+            np.fromiter((doc for _, doc, _ in self._pending), dtype=np.int32, count=len(self._pending)),
+            np.fromiter((tf for _, _, tf in self._pending), dtype=np.int32, count=len(self._pending)),
+            self._doc_lengths.view()[self._pending_from:end_id],
+        )
+        self._pending = []
+        self._pending_from = end_id
+        self._schedule_merge()
+
+    # Indexing
+
+    def add(self, record: Dict) -> None:
+        """Index one record without flushing; used while catching up on startup."""
+        with self._lock:
+            self._add(record)
+
+    def add_many(self, records: Iterable[Dict]) -> None:
+        with self._lock:
+            for record in records:
+                self._add(record)
+            if self._doc_lengths.size - self._pending_from >= self.flush_docs:
+                self._flush()
+
+    def _add(self, record: Dict) -> None:
+        record_id = record["id"]
+        if record_id < self._doc_lengths.size:
+            return  # Already indexed, e.g. loaded from a segment
+        tokens = tokenize(feedback_text(record.get("responses") or {}))
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            if term not in self._doc_ids:
+                self._doc_ids[term] = GrowableArray(np.int32, capacity=4)
+                self._term_freqs[term] = GrowableArray(np.float32, capacity=4)
+            self._doc_ids[term].append(record_id)
+            self._term_freqs[term].append(count)
+            if not self.read_only:
+                self._pending.append((term, record_id, count))
+        self._doc_lengths.set(record_id, len(tokens), 0)
+        if tokens:
+            self._documents += 1
+            self._total_length += len(tokens)
+
+    # Querying
+
+    def search(self, query: str, limit: int, candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Rank documents for ``query`` with BM25.
+
+        ``candidates``, if given, is an ascending array of ids the results are
+        restricted to (e.g. from the secondary indexes). Returns the top ids,
+        their scores, and the total number of matching documents.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        empty = np.empty(0, dtype=np.int64)
+        with self._lock:
+            if not terms or not self._documents:
+                return empty, np.empty(0), 0
+            columns = [(self._doc_ids[term].view(), self._term_freqs[term].view())
+                       for term in terms if term in self._doc_ids]
+            doc_lengths = self._doc_lengths.view()
+            average_length = self._total_length / self._documents
+            documents = self._documents
+        if not columns:
+            return empty, np.empty(0, dtype=np.float32), 0
+        # Scores are accumulated over the postings of the query terms only, never the whole corpus
+        weights = []
+        for doc_ids, term_freqs in columns:
+            idf = math.log(1 + (documents - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = doc_lengths[doc_ids] * np.float32(K1 * B / average_length) + np.float32(K1 * (1 - B))
+            weights.append(term_freqs * np.float32(idf * (K1 + 1)) / (term_freqs + norm))
+        if len(columns) == 1:
+            # Postings hold each document once, in id order
+            matched, matched_scores = columns[0][0], weights[0]
+        else:
+            postings = np.concatenate([doc_ids for doc_ids, _ in columns])
+            if len(postings) * 4 >= len(doc_lengths):
+                # Common terms: the postings span much of the corpus anyway, and bincount beats sorting them
+                totals = np.bincount(postings, weights=np.concatenate(weights))
+                matched = np.flatnonzero(totals)
+                matched_scores = totals[matched].astype(np.float32)
+            else:
+                matched, positions = np.unique(postings, return_inverse=True)
+                matched_scores = np.bincount(positions, weights=np.concatenate(weights)).astype(np.float32)
+
+        if candidates is not None:
+            # Both are ascending: keep the matched documents found among the candidates
+            found = np.searchsorted(candidates, matched)
+            found[found == len(candidates)] = 0
+            keep = candidates[found] == matched if len(candidates) else np.zeros(len(matched), dtype=bool)
+            matched, matched_scores = matched[keep], matched_scores[keep]
+        total = len(matched)
+        if total > limit:
+            top = np.argpartition(-matched_scores, limit)[:limit]
+            matched, matched_scores = matched[top], matched_scores[top]
+        order = np.argsort(-matched_scores, kind="stable")
+        return matched[order].astype(np.int64), matched_scores[order], total
+
+    def pending_postings(self) -> int:
+        """Postings held in memory until the next segment is written."""
+        return len(self._pending)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "terms": len(self._doc_ids),
+                "documents": self._documents,
+                "postings": sum(column.size for column in self._doc_ids.values()),
+                "bytes": self._doc_lengths.nbytes + sum(
+                    column.nbytes + self._term_freqs[term].nbytes for term, column in self._doc_ids.items()
+                ),
+                "segments": len(self._segment_files()),
+                "pending_postings": len(self._pending),
+            }
@@ -1,4 +1,156 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from ..models.question_flow import free_text_keys
+
+# Free-text answers from the question flows; selectbox and slider answers carry no wording to score
+FREE_TEXT_FIELDS = tuple(free_text_keys())
+
+# Word valences from -3 (very negative) to +3 (very positive), tuned for product feedback
+LEXICON: Dict[str, float] = {
+    "amazing": 3, "awesome": 3, "excellent": 3, "fantastic": 3, "love": 3, "loved": 3,
+    "perfect": 3, "outstanding": 3, "best": 3, "brilliant": 3, "wonderful": 3,
+    "great": 2.5, "delighted": 2.5, "impressive": 2.5,
+    "good": 2, "happy": 2, "helpful": 2, "intuitive": 2, "easy": 2, "fast": 2,
+    "reliable": 2, "recommend": 2, "enjoy": 2, "enjoyed": 2, "smooth": 2, "useful": 2,
+    "satisfied": 2, "efficient": 2, "valuable": 2, "responsive": 2, "stable": 2,
+    "nice": 1.5, "like": 1.5, "liked": 1.5, "clear": 1.5, "clean": 1.5, "simple": 1.5,
+    "improved": 1.5, "quick": 1.5, "convenient": 1.5, "works": 1, "fixed": 1,
+    "fine": 1, "ok": 0.5, "okay": 0.5,
+    "lack": -1, "lacks": -1, "missing": -1, "issue": -1, "issues": -1, "problem": -1.5,
+    "problems": -1.5, "delay": -1.5, "delays": -1.5, "delayed": -1.5, "late": -1,
+    "expensive": -1.5, "unclear": -1.5, "complicated": -1.5, "confusing": -2,
+    "difficult": -1.5, "hard": -1, "slow": -2, "laggy": -2, "clunky": -2, "tedious": -2,
+    "bottleneck": -1.5, "bottlenecks": -1.5, "bug": -1.5, "bugs": -1.5, "error": -1.5,
+    "errors": -1.5, "annoying": -2, "frustrating": -2.5, "frustrated": -2.5,
+    "disappointed": -2.5, "disappointing": -2.5, "painful": -2, "ugly": -2, "poor": -2,
+    "bad": -2.5, "worse": -2.5, "fail": -2, "fails": -2, "failed": -2, "failure": -2.5,
+    "broken": -2.5, "crash": -2.5, "crashes": -2.5, "crashed": -2.5, "freeze": -2,
+    "freezes": -2, "hang": -1.5, "hangs": -1.5, "unstable": -2, "blocked": -2,
+    "blocking": -2, "unusable": -3, "useless": -3, "terrible": -3, "awful": -3,
+    "horrible": -3, "worst": -3, "hate": -3,
+}
+
+NEGATORS = ("not", "no", "never", "none", "nothing", "without", "cannot", "cant", "dont",
+            "doesnt", "didnt", "isnt", "wasnt", "arent", "wont", "hardly")
+INTENSIFIERS = {"very": 1.5, "really": 1.5, "extremely": 2.0, "super": 1.5, "so": 1.3,
+                "too": 1.3, "quite": 1.2, "slightly": 0.6, "somewhat": 0.7}
+
+# Larger values pull scores toward neutral when few sentiment words are present
+NORMALIZATION_ALPHA = 15.0
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def sentiment_label(score: Optional[float]) -> str:
+    """Bucket a 0-1 sentiment score the way the dashboard reports it."""
+    if score is None:
+        return "Unscored"
+    if score >= 0.6:
+        return "Positive"
+    if score < 0.4:
+        return "Negative"
+    return "Neutral"
+
+
+def feedback_text(responses: Dict) -> str:
+    """Join the free-text answers of a ``responses`` dict into one text to score."""
+    return " ".join(
+        str(responses[field]) for field in FREE_TEXT_FIELDS if responses.get(field)
+    )
+
+
+def normalize_text(text: str) -> str:
+    # Apostrophes are dropped so "don't" and "dont" are the same token
+    return _WHITESPACE.sub(" ", text.lower().replace("'", "").replace("’", "")).strip()
+
+
+class _Vocabulary:
+    """A sorted fixed-width string array for vectorized word lookups."""
+
+    def __init__(self, words: Sequence[str], values: Sequence[float]):
+        # One character wider than the longest word, so truncated long tokens never match
+        self.width = max(len(word) for word in words) + 1
+        order = np.argsort(np.array(words, dtype=f"<U{self.width}"))
+        self.words = np.array(words, dtype=f"<U{self.width}")[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+
+    def lookup(self, tokens: np.ndarray, default: float = 0.0) -> np.ndarray:
+        positions = np.searchsorted(self.words, tokens)
+        positions[positions == len(self.words)] = 0
+        found = self.words[positions] == tokens
+        return np.where(found, self.values[positions], default)
+
+
 class SentimentService:
+    """Offline lexicon-based sentiment scorer.
+
+    Scores run from 0 (negative) to 1 (positive), with 0.5 for text that has
+    no sentiment words. ``analyze_batch`` tokenizes every text, then does the
+    lexicon lookups, negation and intensifier handling and per-text sums as
+    NumPy operations over all tokens at once. Repeated texts are answered from
+    an LRU cache keyed on the normalized text.
+    """
+
+    def __init__(self, cache_size: int = 10000):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lexicon = _Vocabulary(list(LEXICON), list(LEXICON.values()))
+        modifiers = dict(INTENSIFIERS)
+        modifiers.update({word: -1.0 for word in NEGATORS})
+        self._modifiers = _Vocabulary(list(modifiers), list(modifiers.values()))
+        self._token_dtype = f"<U{max(self._lexicon.width, self._modifiers.width)}"
+
     async def analyze(self, text: str) -> float:
-        # Simple placeholder implementation
-        return 0.5  # Neutral sentiment 
\ No newline at end of file
+        return self.analyze_batch([text])[0]
+
+    def analyze_batch(self, texts: Sequence[str]) -> List[float]:
+        normalized = [normalize_text(text or "") for text in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+        misses: Dict[str, List[int]] = {}
+        for i, text in enumerate(normalized):
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                scores[i] = cached
+            else:
+                misses.setdefault(text, []).append(i)
+        if misses:
+            unique_texts = list(misses)
+            for text, score in zip(unique_texts, self._score(unique_texts)):
+                for i in misses[text]:
+                    scores[i] = score
+                self._remember(text, score)
+        return scores
+
+    def _remember(self, text: str, score: float) -> None:
+        self._cache[text] = score
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _score(self, texts: List[str]) -> List[float]:
+        token_lists = [_TOKEN_PATTERN.findall(text) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(texts))
+        if not lengths.sum():
+            return [0.5] * len(texts)
+        tokens = np.array([token for tokens in token_lists for token in tokens], dtype=self._token_dtype)
+        doc_ids = np.repeat(np.arange(len(texts)), lengths)
+
+        weights = self._lexicon.lookup(tokens)
+        modifiers = self._modifiers.lookup(tokens, default=1.0)
+        # A negator or intensifier applies to the word right after it in the same text
+        previous = np.ones_like(modifiers)
+        same_text = doc_ids[1:] == doc_ids[:-1]
+        previous[1:] = np.where(same_text, modifiers[:-1], 1.0)
+        # Negation also reaches two words ahead ("not very good")
+        before_previous = np.ones_like(modifiers)
+        before_previous[2:] = np.where(
+            doc_ids[2:] == doc_ids[:-2], np.minimum(np.sign(modifiers[:-2]), 1.0), 1.0
+        )
+        weights = weights * previous * np.where(previous < 0, 1.0, before_previous)
+
+        totals = np.bincount(doc_ids, weights=weights, minlength=len(texts))
+        compound = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+        return ((compound + 1.0) / 2.0).round(4).tolist()
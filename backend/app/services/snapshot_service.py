@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from ..config import Settings, settings as default_settings
+from ..models.feedback import naive_utc
+from ..models.question_flow import FEEDBACK_TYPES, all_questions
+from .feedback_service import open_store
+from .storage_backend import StorageBackend
+
+# Columns every snapshot starts with; one column per question key follows
+BASE_COLUMNS = ("id", "created_at", "feedback_type", "user_id", "sentiment_score")
+# Sentiment scores read at a time when checking whether any changed
+SCORES_CHUNK = 1 << 20
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Columnar snapshots need pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class SnapshotService:
+    """Writes the feedback store out as a columnar, month-partitioned snapshot.
+
+    Each question key from the flows becomes its own column. Selectbox answers
+    are dictionary-encoded against the question's option list, sliders are
+    stored as small integers, and the ``text`` field (a copy of ``responses``)
+    is dropped. Snapshots are written to a temporary directory and renamed
+    into place, so readers only ever see complete ones.
+
+    The layout is hive-style, ``<snapshot>/created_month=YYYY-MM/part-0.<ext>``,
+    so ``pyarrow.dataset`` can prune months and read only the requested columns.
+
+    Only reads the store, so it also works on one opened read-only next to a
+    running API.
+    """
+
+    LATEST_FILE = "LATEST"
+
+    def __init__(self, store: StorageBackend, settings: Settings = default_settings):
+        self.store = store
+        self.settings = settings
+        self.directory = os.path.join(settings.data_dir, "snapshots")
+        self._task: Optional[asyncio.Task] = None
+        # (record count, checksum of the sentiment scores) of the last snapshot
+        self._snapshot_state: Optional[Tuple[int, int]] = None
+
+    # Schema
+
+    def _schema(self):
+        pa = _require_pyarrow()
+        fields = [
+            pa.field("id", pa.int64()),
+            pa.field("created_at", pa.timestamp("us")),
+            pa.field("feedback_type", pa.dictionary(pa.int16(), pa.string())),
+            pa.field("user_id", pa.string()),
+            pa.field("sentiment_score", pa.float32()),
+        ]
+        for question in all_questions():
+            if question["key"] in BASE_COLUMNS:
+                continue
+            if question["type"] == "selectbox":
+                value_type = pa.dictionary(pa.int16(), pa.string())
+            elif question["type"] == "slider":
+                value_type = pa.int8()
+            else:
+                value_type = pa.string()
+            fields.append(pa.field(question["key"], value_type))
+        return pa.schema(fields)
+
+    def _categories(self) -> Dict[str, List[str]]:
+        categories = {"feedback_type": list(FEEDBACK_TYPES)}
+        for question in all_questions():
+            if question["type"] == "selectbox" and question["key"] not in categories:
+                categories[question["key"]] = list(question["options"])
+        return categories
+
+    def _to_batch(self, records: List[Dict], schema, categories: Dict[str, List[str]]):
+        pa = _require_pyarrow()
+        columns = {name: [] for name in schema.names}
+        for record in records:
+            responses = record.get("responses") or {}
+            columns["id"].append(record["id"])
+            columns["created_at"].append(naive_utc(datetime.fromisoformat(record["created_at"])))
+            columns["feedback_type"].append(record.get("feedback_type"))
+            columns["user_id"].append(record.get("user_id"))
+            columns["sentiment_score"].append(record.get("sentiment_score"))
+            for name in schema.names[len(BASE_COLUMNS):]:
+                columns[name].append(responses.get(name))
+
+        arrays = []
+        for field in schema:
+            values = columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                # Codes follow the option order; answers outside the options get extra codes
+                dictionary = list(categories.get(field.name, []))
+                codes = {option: code for code, option in enumerate(dictionary)}
+                indices = []
+                for value in values:
+                    if value is None or value == "":
+                        indices.append(None)
+                        continue
+                    value = str(value)
+                    if value not in codes:
+                        codes[value] = len(dictionary)
+                        dictionary.append(value)
+                    indices.append(codes[value])
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(indices, type=field.type.index_type),
+                    pa.array(dictionary, type=pa.string()),
+                ))
+            elif pa.types.is_integer(field.type) and field.name != "id":
+                arrays.append(pa.array(
+                    [int(value) if isinstance(value, (int, float)) else None for value in values],
+                    type=field.type,
+                ))
+            elif pa.types.is_string(field.type):
+                arrays.append(pa.array([None if value is None else str(value) for value in values], type=field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, names=schema.names)
+
+    # Writing
+
+    def _state(self, size: int) -> Tuple[int, int]:
+        # Enrichment updates scores in place, so the record count alone misses them
+        checksum = 0
+        for start in range(0, size, SCORES_CHUNK):
+            checksum = zlib.crc32(self.store.sentiment_scores(start, min(start + SCORES_CHUNK, size)).tobytes(), checksum)
+        return size, checksum
+
+    def write_snapshot(self) -> Optional[str]:
+        """Write a new snapshot and return its path, or ``None`` if no record or score changed."""
+        pa = _require_pyarrow()
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+
+        store = self.store
+        size = store.refresh()
+        state = self._state(size)
+        if state == self._snapshot_state:
+            return None
+        schema = self._schema()
+        categories = self._categories()
+        # Microseconds keep two snapshots in the same second apart; names still sort by time
+        name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        tmp_dir = os.path.join(self.directory, f".tmp-{name}")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        parquet_writers = {}
+        arrow_parts: Dict[str, int] = {}
+        pending: Dict[str, List[Dict]] = {}
+        pending_rows = 0
+
+        def flush(month: str) -> None:
+            batch = self._to_batch(pending.pop(month), schema, categories)
+            partition = os.path.join(tmp_dir, f"created_month={month}")
+            os.makedirs(partition, exist_ok=True)
+            if self.settings.snapshot_format == "arrow":
+                # Uncompressed Arrow IPC files can be memory-mapped directly. Each batch
+                # gets its own file because its dictionaries may differ from the last one.
+                part = arrow_parts.get(month, 0)
+                arrow_parts[month] = part + 1
+                with ipc.new_file(os.path.join(partition, f"part-{part}.arrow"), schema) as writer:
+                    writer.write_batch(batch)
+                return
+            writer = parquet_writers.get(month)
+            if writer is None:
+                writer = parquet_writers[month] = pq.ParquetWriter(
+                    os.path.join(partition, "part-0.parquet"), schema
+                )
+            writer.write_table(pa.Table.from_batches([batch]))
+
+        try:
+            for record in store.iter_records(0, size):
+                month = naive_utc(datetime.fromisoformat(record["created_at"])).strftime("%Y-%m")
+                pending.setdefault(month, []).append(record)
+                pending_rows += 1
+                # Records of all months held together stay within one batch: flush the largest month
+                if pending_rows >= self.settings.snapshot_batch_rows:
+                    largest = max(pending, key=lambda key: len(pending[key]))
+                    pending_rows -= len(pending[largest])
+                    flush(largest)
+            for month in list(pending):
+                flush(month)
+        finally:
+            for writer in parquet_writers.values():
+                writer.close()
+
+        with open(os.path.join(tmp_dir, "_snapshot.json"), "w") as f:
+            json.dump({"records": size, "created_at": name, "format": self.settings.snapshot_format}, f)
+        final_dir = os.path.join(self.directory, name)
+        os.replace(tmp_dir, final_dir)
+        self._point_latest(name)
+        self._apply_retention()
+        self._snapshot_state = state
+        return final_dir
+
+    def _point_latest(self, name: str) -> None:
+        latest = os.path.join(self.directory, self.LATEST_FILE)
+        with open(latest + ".tmp", "w") as f:
+            f.write(name)
+        os.replace(latest + ".tmp", latest)
+
+    def _apply_retention(self) -> None:
+        snapshots = sorted(
+            entry for entry in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, entry)) and not entry.startswith(".")
+        )
+        for name in snapshots[:-self.settings.snapshot_retain]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    # Periodic job
+
+    async def start(self) -> None:
+        if self.settings.snapshot_interval_seconds > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.settings.snapshot_interval_seconds)
+            try:
+                await loop.run_in_executor(None, self.write_snapshot)
+            except Exception:
+                # A failed snapshot is retried at the next interval
+                pass
+
+
+def open_snapshot(data_dir: str = "data", snapshot: Optional[str] = None):
+    """Open a snapshot as a ``pyarrow.dataset.Dataset`` (the latest by default).
+
+    Select columns and filter months when reading, e.g.::
+
+        dataset = open_snapshot()
+        table = dataset.to_table(
+            columns=["created_at", "feedback_type", "urgency"],
+            filter=pyarrow.dataset.field("created_month") >= "2025-01",
+        )
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    directory = os.path.join(data_dir, "snapshots")
+    if snapshot is None:
+        with open(os.path.join(directory, SnapshotService.LATEST_FILE), "r") as f:
+            snapshot = f.read().strip()
+    path = os.path.join(directory, snapshot)
+    with open(os.path.join(path, "_snapshot.json"), "r") as f:
+        file_format = "ipc" if json.load(f)["format"] == "arrow" else "parquet"
+    return ds.dataset(path, format=file_format, partitioning="hive", exclude_invalid_files=True)
+
+
+if __name__ == "__main__":
+    # python -m backend.app.services.snapshot_service writes one snapshot and exits.
+    # The store is opened read-only, so this is safe while the API is running.
+    store = open_store(default_settings, read_only=True)
+    try:
+        print(SnapshotService(store).write_snapshot() or "No changes since the last snapshot")
+    finally:
+        store.close()
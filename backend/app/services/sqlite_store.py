@@ -0,0 +1,284 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from ..models.feedback import naive_utc
+from .metrics import BYTES_WRITTEN, SAVE_PHASE_SECONDS
+from .storage_backend import StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT,          -- naive UTC in ISO 8601, so text order is time order
+    feedback_type TEXT,
+    user_id TEXT,
+    product_name TEXT,
+    sentiment_score REAL,     -- computed score; NULL until scored
+    record TEXT NOT NULL      -- the record as saved, as JSON
+);
+CREATE INDEX IF NOT EXISTS feedback_created_at ON feedback (created_at);
+-- Filters are answered by the in-memory indexes, so these only slowed inserts in older databases
+DROP INDEX IF EXISTS feedback_feedback_type;
+DROP INDEX IF EXISTS feedback_user_id;
+DROP INDEX IF EXISTS feedback_product_name;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Statements are kept constant so the sqlite3 module's statement cache reuses them
+INSERT = (
+    "INSERT INTO feedback (id, created_at, feedback_type, user_id, product_name, record) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_RANGE = "SELECT id, record, sentiment_score FROM feedback WHERE id >= ? AND id < ? ORDER BY id"
+SELECT_CREATED = (
+    "SELECT id, created_at, record, sentiment_score FROM feedback "
+    "WHERE created_at >= ? AND created_at <= ? AND (created_at, id) > (?, ?) AND id < ? "
+    "ORDER BY created_at, id LIMIT ?"
+)
+SELECT_ONE = "SELECT record, sentiment_score FROM feedback WHERE id = ?"
+SELECT_SCORES = "SELECT id, sentiment_score FROM feedback WHERE id >= ? AND id < ?"
+UPDATE_SCORE = "UPDATE feedback SET sentiment_score = ? WHERE id = ?"
+# Rows read per query when iterating, so no read transaction stays open for long
+READ_BLOCK_RECORDS = 4096
+
+_SERIALIZE_SECONDS = SAVE_PHASE_SECONDS.labels("serialize")
+_WRITE_SECONDS = SAVE_PHASE_SECONDS.labels("write")
+_FSYNC_SECONDS = SAVE_PHASE_SECONDS.labels("fsync")
+_DATABASE_BYTES = BYTES_WRITTEN.labels("sqlite")
+
+
+def _created_at_key(value) -> Optional[str]:
+    try:
+        return naive_utc(datetime.fromisoformat(value)).isoformat(timespec="microseconds")
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteStore(StorageBackend):
+    """Feedback storage in an embedded SQLite database, in WAL mode.
+
+    Each ``append_many`` is one transaction, so a group commit costs one
+    WAL append and one fsync. With WAL, readers never block the writer or
+    each other; every thread reads through its own connection. Only
+    ``created_at`` is indexed, for time-range reads: filters on the type,
+    user or product are answered by the in-memory indexes, so further
+    indexes would only add work to every insert. Those columns are still
+    stored for ad-hoc SQL against the file.
+
+    Records are kept as JSON in the ``record`` column with the id and
+    computed score in their own columns. A ``read_only`` store follows a
+    database written by another process.
+    """
+
+    DATABASE_FILE = "feedback.sqlite3"
+
+    def __init__(self, directory: str, read_only: bool = False):
+        self.directory = directory
+        self.read_only = read_only
+        self.path = os.path.join(directory, self.DATABASE_FILE)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._writer: Optional[sqlite3.Connection] = None
+        self._next_id = 0
+        if read_only:
+            self.refresh()
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(SCHEMA)
+        self._next_id = self._count(self._writer)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are begun explicitly, so the module never opens one behind our back
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            connection.execute("PRAGMA query_only=1")
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _count(connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM feedback").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._next_id
+
+    def refresh(self) -> int:
+        if self.read_only:
+            if not os.path.exists(self.path):
+                # The writer has not created the database yet
+                return self._next_id
+            try:
+                self._next_id = max(self._next_id, self._count(self._reader()))
+            except sqlite3.OperationalError:
+                # Schema not created yet
+                pass
+        return self._next_id
+
+    # Writes
+
+    def append_many(self, records: List[Dict], durable: bool = True) -> List[int]:
+        if not records:
+            return []
+        if self.read_only:
+            raise IOError("The store is open read-only")
+        with self._lock:
+            started = time.perf_counter()
+            ids = list(range(self._next_id, self._next_id + len(records)))
+            rows = []
+            for record_id, record in zip(ids, records):
+                record["id"] = record_id
+                rows.append((
+                    record_id,
+                    _created_at_key(record.get("created_at")),
+                    record.get("feedback_type"),
+                    record.get("user_id"),
+                    (record.get("responses") or {}).get("product_name"),
+                    json.dumps(record, separators=(",", ":")),
+                ))
+            serialized = time.perf_counter()
+            _SERIALIZE_SECONDS.observe(serialized - started)
+            if not durable:
+                self._writer.execute("PRAGMA synchronous=OFF")
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer.executemany(INSERT, rows)
+                written = time.perf_counter()
+                _WRITE_SECONDS.observe(written - serialized)
+                # The commit appends to the WAL and, with synchronous=FULL, fsyncs it
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            finally:
+                if not durable:
+                    self._writer.execute("PRAGMA synchronous=FULL")
+            _FSYNC_SECONDS.observe(time.perf_counter() - written)
+            _DATABASE_BYTES.inc(sum(len(row[5]) for row in rows))
+            self._next_id += len(records)
+            return ids
+
+    def set_sentiment_many(self, ids: List[int], scores: List[float]) -> None:
+        with self._lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer.executemany(UPDATE_SCORE, zip(scores, ids))
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+
+    def migrate_legacy(self, legacy_file: str, chunk_size: int = 10000) -> int:
+        """Import a legacy ``feedback.json`` array into the table, once.
+
+        As with the log, the legacy file is renamed with a ``.migrated``
+        suffix and an interrupted run resumes from the rows already there.
+        """
+        migrated = self._writer.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+        if migrated or not os.path.exists(legacy_file):
+            return 0
+        with open(legacy_file, "r") as f:
+            data = json.load(f)
+        for start in range(len(self), len(data), chunk_size):
+            self.append_many(data[start:start + chunk_size])
+        with self._lock:
+            self._writer.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_from', ?)", (legacy_file,))
+        os.replace(legacy_file, legacy_file + ".migrated")
+        return len(data)
+
+    def compact(self, archive_before: Optional[datetime] = None) -> Dict[str, int]:
+        """Fold the WAL back into the database and refresh the planner's statistics.
+
+        SQLite has no partitions to move or archive, so ``archive_before`` is
+        not used.
+        """
+        with self._lock:
+            _, wal_pages, checkpointed = self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            self._writer.execute("PRAGMA optimize")
+        return {"wal_pages": wal_pages, "checkpointed": checkpointed}
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+            self._local = threading.local()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # Reads
+
+    @staticmethod
+    def _row_record(record_json: str, score: Optional[float]) -> Dict:
+        record = json.loads(record_json)
+        if score is not None:
+            record["sentiment_score"] = round(score, 4)
+        return record
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        if not 0 <= record_id < self._next_id:
+            return None
+        row = self._reader().execute(SELECT_ONE, (record_id,)).fetchone()
+        return self._row_record(*row) if row is not None else None
+
+    def iter_records(self, start_id: int = 0, end_id: Optional[int] = None) -> Iterator[Dict]:
+        end_id = self._next_id if end_id is None else min(end_id, self._next_id)
+        record_id = max(start_id, 0)
+        while record_id < end_id:
+            stop_id = min(record_id + READ_BLOCK_RECORDS, end_id)
+            rows = self._reader().execute(SELECT_RANGE, (record_id, stop_id)).fetchall()
+            if len(rows) < stop_id - record_id:
+                raise IOError(f"Records {record_id} to {stop_id} are missing from {self.DATABASE_FILE}")
+            for _, record_json, score in rows:
+                yield self._row_record(record_json, score)
+            record_id = stop_id
+
+    def iter_range(self, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> Iterator[Dict]:
+        """Yield the records created in the range in time order, read through the ``created_at`` index."""
+        if created_from is None and created_to is None:
+            yield from self.iter_records()
+            return
+        low = naive_utc(created_from).isoformat(timespec="microseconds") if created_from is not None else ""
+        high = naive_utc(created_to).isoformat(timespec="microseconds") if created_to is not None else "~"
+        # Keyset pagination: each query resumes after the last (created_at, id) returned
+        last = (low, -1)
+        end_id = self._next_id
+        while True:
+            rows = self._reader().execute(
+                SELECT_CREATED, (low, high, *last, end_id, READ_BLOCK_RECORDS)
+            ).fetchall()
+            for _, _, record_json, score in rows:
+                yield self._row_record(record_json, score)
+            if len(rows) < READ_BLOCK_RECORDS:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def sentiment_scores(self, start_id: int, end_id: int) -> array:
+        end_id = min(end_id, self._next_id)
+        scores = array("f", [math.nan]) * max(end_id - start_id, 0)
+        if start_id < end_id:
+            for record_id, score in self._reader().execute(SELECT_SCORES, (start_id, end_id)):
+                if score is not None:
+                    scores[record_id - start_id] = score
+        return scores
+
+    def storage_stats(self) -> Dict:
+        def size(path: str) -> int:
+            return os.path.getsize(path) if os.path.exists(path) else 0
+        return {"database_bytes": size(self.path), "wal_bytes": size(self.path + "-wal")}
@@ -0,0 +1,68 @@
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+BACKENDS = ("log", "sqlite")
+
+
+class StorageBackend:
+    """Interface of the record stores ``FeedbackService`` writes to.
+
+    Ids are assigned by the store on append and are dense, starting at 0,
+    so ``len(store)`` is both the record count and the next id. Sentiment
+    scores are kept apart from the records: ``set_sentiment_many`` updates
+    them in place and reads overlay them as ``sentiment_score``.
+
+    A ``read_only`` store follows one written by another process and sees
+    new records after ``refresh``.
+    """
+
+    read_only = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    # Writes
+
+    def append_many(self, records: List[Dict], durable: bool = True) -> List[int]:
+        """Append records in one batch and return the ids assigned to them."""
+        raise NotImplementedError
+
+    def set_sentiment_many(self, ids: List[int], scores: List[float]) -> None:
+        raise NotImplementedError
+
+    def migrate_legacy(self, legacy_file: str, chunk_size: int = 10000) -> int:
+        """Import a legacy ``feedback.json`` array, once; returns the records imported."""
+        raise NotImplementedError
+
+    def compact(self, archive_before: Optional[datetime] = None) -> Dict[str, int]:
+        """Periodic maintenance; returns counts of what was done."""
+        raise NotImplementedError
+
+    # Reads
+
+    def refresh(self) -> int:
+        """Pick up records committed by the writing process; returns the new length."""
+        return len(self)
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def iter_records(self, start_id: int = 0, end_id: Optional[int] = None) -> Iterator[Dict]:
+        """Yield records in id order from ``start_id`` up to ``end_id``."""
+        raise NotImplementedError
+
+    def iter_range(self, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> Iterator[Dict]:
+        """Yield the records created between ``created_from`` and ``created_to``, inclusive."""
+        raise NotImplementedError
+
+    def sentiment_scores(self, start_id: int, end_id: int) -> array:
+        """Return the stored scores of a range of ids; NaN marks records not scored yet."""
+        raise NotImplementedError
+
+    def storage_stats(self) -> Dict:
+        """Sizes of the files behind the store, for monitoring."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
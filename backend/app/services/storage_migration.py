@@ -0,0 +1,72 @@
+import argparse
+import math
+import os
+import time
+from ..config import settings as default_settings
+from .feedback_service import open_store
+from .storage_backend import BACKENDS, StorageBackend
+
+
+def copy_store(source: StorageBackend, target: StorageBackend, chunk_size: int = 10000) -> int:
+    """Copy every record from ``source`` to ``target`` with the same ids; returns the records copied.
+
+    Computed sentiment scores are copied into the target's score column
+    rather than into the records, so they stay distinguishable from scores
+    supplied by clients. A ``target`` already holding a prefix of the
+    source, e.g. from an interrupted run, is resumed.
+    """
+    start_id = len(target)
+    if start_id > len(source):
+        raise ValueError(f"The target already holds {start_id} records, more than the source's {len(source)}")
+    end_id = len(source)
+    for chunk_start in range(start_id, end_id, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end_id)
+        records = list(source.iter_records(chunk_start, chunk_end))
+        scores = source.sentiment_scores(chunk_start, chunk_end)
+        scored_ids, scored = [], []
+        for record, score in zip(records, scores):
+            if not math.isnan(score):
+                # Overlaid by the read; computed scores only exist for records saved without one
+                record["sentiment_score"] = None
+                scored_ids.append(record["id"])
+                scored.append(score)
+        ids = target.append_many(records)
+        if ids[0] != chunk_start:
+            raise IOError(f"The target assigned id {ids[0]} to record {chunk_start}")
+        if scored:
+            target.set_sentiment_many(scored_ids, scored)
+    return end_id - start_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move the feedback store from one storage backend to another.")
+    parser.add_argument("--from", dest="source", choices=BACKENDS, default=default_settings.storage_backend)
+    parser.add_argument("--to", dest="target", choices=BACKENDS, required=True)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("--from and --to name the same backend")
+
+    source = open_store(default_settings.copy(update={"storage_backend": args.source}), read_only=True)
+    target = open_store(default_settings.copy(update={"storage_backend": args.target}))
+    started = time.perf_counter()
+    origin = args.source
+    try:
+        legacy_file = os.path.join(default_settings.data_dir, "feedback.json")
+        if len(source) == 0 and os.path.exists(legacy_file):
+            # Nothing saved since the JSON file was in use; import it directly
+            origin = legacy_file
+            copied = target.migrate_legacy(legacy_file, args.chunk_size)
+        else:
+            copied = copy_store(source, target, args.chunk_size)
+    finally:
+        source.close()
+        target.close()
+    print(f"Copied {copied} records from {origin} to {args.target} in {time.perf_counter() - started:.1f}s; "
+          f"set FEEDBACK_STORAGE_BACKEND={args.target} to use it")
+
+
+if __name__ == "__main__":
+    # Stop the API (and writer process) first:
+    # python -m backend.app.services.storage_migration --to sqlite
+    main()
@@ -0,0 +1,97 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .feedback_index import to_epoch
+
+# Finest first; ``auto`` picks the finest bucket that keeps the series within the point limit
+BUCKETS = ("hour", "day", "week", "month", "year")
+GROUP_BY = ("feedback_type", "product_name", "user_role", "sentiment")
+
+
+def day_span(day_from: date, day_to: date) -> Tuple[datetime, datetime]:
+    """First and last instant of an inclusive range of days."""
+    return datetime.combine(day_from, time.min), datetime.combine(day_to, time.max)
+
+
+def bucket_start(value: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = datetime.combine(value.date(), time.min)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        # ISO weeks, starting on Monday
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def _next_start(start: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return start + timedelta(hours=1)
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(weeks=1)
+    if bucket == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start.replace(year=start.year + 1)
+
+
+def bucket_count(start: datetime, end: datetime, bucket: str) -> int:
+    """Number of buckets from the one holding ``start`` to the one holding ``end``, without listing them."""
+    first, last = bucket_start(start, bucket), bucket_start(end, bucket)
+    if bucket == "hour":
+        return int((last - first).total_seconds()) // 3600 + 1
+    if bucket == "day":
+        return (last - first).days + 1
+    if bucket == "week":
+        return (last - first).days // 7 + 1
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return last.year - first.year + 1
+
+
+def choose_bucket(start: datetime, end: datetime, max_points: int, finest: str = "hour") -> str:
+    """The finest bucket, no finer than ``finest``, giving at most ``max_points`` buckets.
+
+    Years are the coarsest bucket and are used past the limit.
+    """
+    for bucket in BUCKETS[BUCKETS.index(finest):]:
+        if bucket_count(start, end, bucket) <= max_points:
+            return bucket
+    return BUCKETS[-1]
+
+
+def bucket_starts(start: datetime, end: datetime, bucket: str) -> List[datetime]:
+    starts = [bucket_start(start, bucket)]
+    while True:
+        following = _next_start(starts[-1], bucket)
+        if following > end:
+            return starts
+        starts.append(following)
+
+
+def bucket_counts(
+    times: np.ndarray,
+    counts: np.ndarray,
+    codes: np.ndarray,
+    groups: Sequence[str],
+    starts: List[datetime],
+) -> Dict[str, List[int]]:
+    """Sum ``counts`` per group and bucket in one pass.
+
+    ``times`` are epoch seconds, all within the buckets, and ``codes`` index
+    into ``groups``. Groups without any count in range are left out.
+    """
+    edges = np.array([to_epoch(start) for start in starts], dtype=np.float64)
+    positions = np.searchsorted(edges, times, side="right") - 1
+    cells = np.bincount(
+        codes * len(edges) + positions, weights=counts, minlength=len(groups) * len(edges)
+    ).reshape(len(groups), len(edges))
+    return {
+        group: row.astype(np.int64).tolist()
+        for group, row in sorted(zip(groups, cells), key=lambda item: item[0])
+        if row.any()
+    }
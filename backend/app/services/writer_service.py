@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import signal
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+from ..config import Settings, settings as default_settings
+from ..models.feedback import DedupStats
+from .compaction_service import CompactionService
+from .dedup_index import IdempotencyConflict
+from .enrichment_service import EnrichmentService
+from .feedback_service import FeedbackService
+from .metrics import WRITER_METRICS, registry as metrics
+from .snapshot_service import SnapshotService
+
+# Messages are JSON objects, each preceded by its length as a 4-byte big-endian integer
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
+
+def encode_frame(message: Dict) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict]:
+    """Read one message, or return ``None`` once the peer has closed the connection."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds the limit")
+    return json.loads(await reader.readexactly(length))
+
+
+class WriterServer:
+    """Commits records sent by API worker processes over a Unix socket.
+
+    The writer process is the only one appending to the log, so every save
+    from every worker goes through one group-commit queue and one
+    duplicate-suppression index. Requests on a connection are handled
+    concurrently and answered as they finish, which lets saves from many
+    workers share a write and an fsync.
+    """
+
+    def __init__(self, feedback_service: FeedbackService, socket_path: str, on_commit: Optional[Callable[[], None]] = None):
+        self.feedback_service = feedback_service
+        self.socket_path = socket_path
+        self.on_commit = on_commit
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.socket_path):
+            # Left behind by a writer that did not shut down cleanly
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.socket_path)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        in_flight = set()
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                task = asyncio.ensure_future(self._handle(message, writer, write_lock))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            writer.close()
+
+    async def _handle(self, message: Dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        response = {"id": message.get("id")}
+        try:
+            operation = message["op"]
+            if operation == "save":
+                record_id, duplicate = await self.feedback_service.save_record(
+                    message["record"], message["digest"], message.get("idempotency_key")
+                )
+                response.update(result=record_id, duplicate=duplicate)
+            elif operation == "save_many":
+                response["result"] = await self.feedback_service.save_records(message["records"])
+            elif operation == "dedup_stats":
+                response["result"] = self.feedback_service.dedup.stats().dict()
+            elif operation == "metrics":
+                response["result"] = metrics.collect(WRITER_METRICS)
+            else:
+                raise ValueError(f"Unknown operation: {operation}")
+            if operation in ("save", "save_many") and self.on_commit is not None:
+                self.on_commit()
+        except IdempotencyConflict as e:
+            response.update(error=str(e), conflict=True)
+        except Exception as e:
+            response["error"] = str(e)
+        async with write_lock:
+            try:
+                writer.write(encode_frame(response))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+
+class WriterClient:
+    """Forwards writes from an API worker to the writer process.
+
+    One connection carries every in-flight call; responses are matched to
+    callers by request id. A lost connection fails the calls waiting on it
+    and is reopened by the next call. Calls are not retried here: a save
+    whose answer was lost may have been committed, and a client retry is
+    recognised as a duplicate by the writer.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: float = 5.0):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        # Created on first use so they bind to the running loop
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(self.socket_path), self.connect_timeout
+                )
+                self._writer = writer
+                self._reader_task = asyncio.get_running_loop().create_task(self._read_responses(reader, writer))
+            return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            error = ConnectionError("Lost the connection to the writer process")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def call(self, operation: str, **params) -> Dict:
+        writer = await self._connect()
+        self._next_id += 1
+        call_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            async with self._write_lock:
+                writer.write(encode_frame({"id": call_id, "op": operation, **params}))
+                await writer.drain()
+        except ConnectionError:
+            self._pending.pop(call_id, None)
+            raise
+        response = await future
+        if "error" in response:
+            if response.get("conflict"):
+                raise IdempotencyConflict(response["error"])
+            raise IOError(response["error"])
+        return response
+
+    async def save(self, record: Dict, digest: str, idempotency_key: Optional[str] = None) -> Tuple[int, bool]:
+        """Save one record; returns its id and whether it was a duplicate of an earlier one."""
+        response = await self.call("save", record=record, digest=digest, idempotency_key=idempotency_key)
+        return response["result"], response["duplicate"]
+
+    async def save_many(self, records: List[Dict]) -> List[int]:
+        return (await self.call("save_many", records=records))["result"]
+
+    async def dedup_stats(self) -> DedupStats:
+        return DedupStats(**(await self.call("dedup_stats"))["result"])
+
+    async def metrics(self) -> Dict[str, List]:
+        """The writer's save phase, commit batch, bytes written and queue metrics, for ``MetricsRegistry.render``."""
+        return (await self.call("metrics"))["result"]
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+
+async def serve(settings: Settings = default_settings) -> None:
+    """Run the writer process until SIGINT or SIGTERM.
+
+    Besides committing writes, the writer runs the background jobs that
+    modify the store (sentiment enrichment, snapshots and compaction), so
+    they run once rather than once per API worker.
+    """
+    # Reads are served by the workers, so only dedup and the search index are kept here
+    feedback_service = FeedbackService(settings, read_indexes=False)
+    enrichment_service = EnrichmentService(feedback_service, settings)
+    snapshot_service = SnapshotService(feedback_service.store, settings)
+    compaction_service = CompactionService(feedback_service, settings)
+    server = WriterServer(feedback_service, settings.writer_socket, on_commit=enrichment_service.notify)
+    metrics.gauge("feedback_write_queue_depth", "Saves waiting for the next group commit.", feedback_service.queue_depth)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    await enrichment_service.start()
+    await snapshot_service.start()
+    await compaction_service.start()
+    await server.start()
+    print(f"Writer listening on {settings.writer_socket}", flush=True)
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
+        await compaction_service.stop()
+        await snapshot_service.stop()
+        await enrichment_service.stop()
+        await feedback_service.close()
+
+
+if __name__ == "__main__":
+    # FEEDBACK_WRITER_SOCKET=/tmp/feedback-writer.sock python -m backend.app.services.writer_service
+    if not default_settings.writer_socket:
+        raise SystemExit("Set FEEDBACK_WRITER_SOCKET to the socket path the writer should listen on")
+    asyncio.run(serve())
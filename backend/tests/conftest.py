@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# app.main reads its settings at import; point them at a scratch directory first
+os.environ.setdefault("FEEDBACK_DATA_DIR", tempfile.mkdtemp(prefix="feedback-tests-"))
+os.environ.setdefault("FEEDBACK_ENRICHMENT_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.config import Settings
+from app.models.question_flow import get_question_flow
+
+START = datetime(2024, 1, 1)
+
+
+def make_record(number: int, created_at: Optional[datetime] = None, **fields) -> Dict:
+    """A stored-record dict like ``FeedbackService._to_record`` produces."""
+    record = {
+        "text": f"feedback {number}",
+        "feedback_type": "Bug",
+        "responses": {"product_name": "Mobile App", "description": f"it broke {number}"},
+        "created_at": (created_at or START + timedelta(hours=number)).isoformat(),
+        "user_id": None,
+        "sentiment_score": None,
+    }
+    record.update(fields)
+    return record
+
+
+def make_records(count: int, **fields) -> List[Dict]:
+    return [make_record(number, **fields) for number in range(count)]
+
+
+def _answer(question: Dict, number: int):
+    if question["type"] == "selectbox":
+        return question["options"][number % len(question["options"])]
+    if question["type"] == "slider":
+        return question["min_value"]
+    return f"answer {number}"
+
+
+def make_payload(number: int, feedback_type: str = "Bug", **fields) -> Dict:
+    """A POST /feedback body that passes the question-flow validation."""
+    responses = {question["key"]: _answer(question, number) for question in get_question_flow(feedback_type)}
+    responses["feedback_type"] = feedback_type
+    payload = {
+        "text": f"feedback {number}",
+        "feedback_type": feedback_type,
+        "responses": responses,
+        "created_at": (START + timedelta(hours=number)).isoformat(),
+        "user_id": f"user-{number}",
+    }
+    payload.update(fields)
+    return payload
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:
+    """Settings for a service writing under ``tmp_path``, with every background job off."""
+    return Settings(
+        data_dir=str(tmp_path),
+        enrichment_workers=0,
+        compaction_interval_seconds=0,
+        snapshot_interval_seconds=0,
+        write_batch_max_wait_ms=0,
+    )
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    """One TestClient for app.main per run: the app's services are module globals, closed at its shutdown."""
+    from fastapi.testclient import TestClient
+    from app import main
+
+    # This TestClient runs the app on the current loop, which asyncio.run elsewhere leaves unset
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    with TestClient(main.app) as client:
+        yield client, loop
+        asyncio.set_event_loop(loop)
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture
+def client(app_client):
+    """The TestClient for app.main, whose data lives in the run's scratch directory and is shared by every test."""
+    client, loop = app_client
+    asyncio.set_event_loop(loop)
+    yield client
+    asyncio.set_event_loop(None)
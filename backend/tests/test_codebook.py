@@ -0,0 +1,79 @@
+import json
+import pytest
+from app.services.record_codec import RecordCodec
+from conftest import make_payload
+
+
+def stored(number: int, **fields):
+    return {"id": number, "sentiment_score": 0.5, **make_payload(number), **fields}
+
+
+def round_trip(codec: RecordCodec, record):
+    line = codec.encode(record)
+    return line, codec.decode(json.loads(line), record["id"])
+
+
+def test_records_round_trip_in_compact_form(tmp_path):
+    codec = RecordCodec(str(tmp_path / "codebook.json"))
+    record = stored(3)
+    line, decoded = round_trip(codec, record)
+    assert decoded == record
+    assert json.loads(line)[0] == 1
+    # Question keys and selectbox answers are stored as codes
+    assert "product_name" not in line
+    assert len(line) < len(json.dumps(record))
+
+
+def test_unknown_answers_keys_and_text_copies_survive(tmp_path):
+    codec = RecordCodec(str(tmp_path / "codebook.json"))
+    record = stored(1)
+    record["responses"]["urgency"] = "Whenever"
+    record["responses"]["extra"] = "kept"
+    record["text"] = str(record["responses"])
+    line, decoded = round_trip(codec, record)
+    assert decoded == record
+    assert json.loads(line)[-1] is None
+
+
+def test_odd_timestamps_and_legacy_lines_are_kept_as_they_are(tmp_path):
+    codec = RecordCodec(str(tmp_path / "codebook.json"))
+    for created_at in ("2024-01-01T00:00:00+00:00", "2024-01-01T00:00", "yesterday"):
+        assert round_trip(codec, stored(0, created_at=created_at))[1]["created_at"] == created_at
+    legacy = {"id": 7, "text": "old", "nested": {"a": 1}}
+    line, decoded = round_trip(codec, legacy)
+    assert json.loads(line) == legacy
+    assert decoded == legacy
+
+
+def test_codebook_only_grows_and_old_lines_still_decode(tmp_path):
+    path = str(tmp_path / "codebook.json")
+    codec = RecordCodec(path)
+    line = codec.encode(stored(2))
+    assert codec.version == 1
+    assert RecordCodec(path).version == 1
+
+    # A flow gains an option: the codebook appends it under a new version
+    with open(path) as f:
+        saved = json.load(f)
+    removed = saved["options"]["urgency"].pop()
+    saved["version"] = 0
+    with open(path, "w") as f:
+        json.dump(saved, f)
+    extended = RecordCodec(path)
+    assert extended.version == 1
+    assert extended.options["urgency"][-1] == removed
+    assert extended.decode(json.loads(line), 2) == stored(2)
+
+
+def test_read_only_codec_reloads_for_newer_lines(tmp_path):
+    path = str(tmp_path / "codebook.json")
+    writer = RecordCodec(path)
+    reader = RecordCodec(path, read_only=True)
+    writer.version += 1
+    writer._save()
+    line = writer.encode(stored(4))
+    assert reader.decode(json.loads(line), 4) == stored(4)
+    assert reader.version == writer.version
+
+    with pytest.raises(ValueError, match="newer"):
+        RecordCodec(str(tmp_path / "other.json")).decode(json.loads(line), 4)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from app.models.feedback import Feedback
+from app.services.compaction_service import CompactionService
+from app.services.feedback_service import FeedbackService
+from app.services.log_store import LogStore
+from conftest import make_payload, make_record
+
+MONTHS = [datetime(2024, 1, 15), datetime(2024, 2, 15), datetime(2024, 3, 15)]
+
+
+def monthly_records(per_month: int):
+    return [
+        make_record(number, created_at=MONTHS[number % len(MONTHS)].replace(hour=number % 24))
+        for number in range(per_month * len(MONTHS))
+    ]
+
+
+def texts(store: LogStore):
+    return [record["text"] for record in store.iter_records()]
+
+
+def test_compaction_moves_segments_into_partitions_without_renumbering(tmp_path):
+    store = LogStore(str(tmp_path), segment_max_bytes=2048)
+    store.append_many(monthly_records(10))
+    before = texts(store)
+    store.set_sentiment_many([4], [0.25])
+
+    stats = store.compact()
+    assert stats["moved"] == 30
+    assert store._manifest["segments"][0]["first_id"] == 30
+    assert {entry["partition"] for entry in store._manifest["partitions"]} == {"2024-01", "2024-02", "2024-03"}
+    assert texts(store) == before
+    assert store.get(4)["sentiment_score"] == 0.25
+    february = list(store.iter_range(datetime(2024, 2, 1), datetime(2024, 2, 29)))
+    assert sorted(record["id"] for record in february) == list(range(1, 30, 3))
+
+    assert store.append_many([make_record(30, created_at=MONTHS[0])]) == [30]
+    store.close()
+    store = LogStore(str(tmp_path), segment_max_bytes=2048)
+    assert texts(store) == before + ["feedback 30"]
+    store.close()
+
+
+def test_fragments_are_merged_and_retired_files_deleted_by_the_next_pass(tmp_path):
+    # Small files fill up, so the second pass starts a new fragment per partition
+    store = LogStore(str(tmp_path), segment_max_bytes=256)
+    store.append_many(monthly_records(2))
+    store.compact()
+    store.append_many(monthly_records(2))
+    assert store.compact()["moved"] == 6
+    assert len(store._manifest["partitions"]) == 6
+    store.close()
+
+    store = LogStore(str(tmp_path))
+    before = texts(store)
+    stats = store.compact()
+    assert stats["merged"] == 3
+    assert len(store._manifest["partitions"]) == 3
+    assert texts(store) == before
+    obsolete = list(store._manifest["obsolete"])
+    assert obsolete and all(os.path.exists(tmp_path / name) for name in obsolete)
+
+    stats = store.compact()
+    assert stats["deleted"] == len(obsolete)
+    assert not any(os.path.exists(tmp_path / name) for name in obsolete)
+    assert texts(store) == before
+    store.close()
+
+
+def test_old_partitions_are_archived_and_still_readable(tmp_path):
+    store = LogStore(str(tmp_path), archive_block_bytes=256)
+    store.append_many(monthly_records(5))
+    before = texts(store)
+
+    stats = store.compact(archive_before=datetime(2024, 3, 1))
+    assert stats["archived"] == 2
+    archived = {entry["partition"] for entry in store._manifest["partitions"] if entry["archived"]}
+    assert archived == {"2024-01", "2024-02"}
+    assert texts(store) == before
+    assert store.get(3)["text"] == "feedback 3"
+    assert store.storage_stats()["archived_files"] == 2
+    store.close()
+
+    store = LogStore(str(tmp_path), archive_block_bytes=256)
+    assert texts(store) == before
+    store.close()
+
+
+def test_service_archives_after_the_configured_days(settings):
+    settings.archive_after_days = 30
+    service = FeedbackService(settings)
+    service.store.append_many(monthly_records(2))
+    stats = CompactionService(service, settings).compact()
+    assert stats["moved"] == 6
+    assert stats["archived"] == 3
+    service.store.close()
+
+
+def test_timestamps_are_partitioned_by_utc(settings):
+    # 00:30 on 1 March in Berlin is still February in UTC
+    berlin = make_payload(0, created_at="2024-03-01T00:30:00+01:00")
+    unstamped = make_payload(1)
+    del unstamped["created_at"]
+
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            await service.save_many([Feedback(**berlin), Feedback(**unstamped)])
+            service.store.compact()
+            partitions = {entry["partition"] for entry in service.store._manifest["partitions"]}
+            return service.store.get(0)["created_at"], service.store.get(1)["created_at"], partitions
+        finally:
+            await service.close()
+
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    berlin_at, default_at, partitions = asyncio.run(run())
+    assert berlin_at == "2024-02-29T23:30:00"
+    # Defaulted timestamps are the current UTC time, not local time
+    assert abs(datetime.fromisoformat(default_at) - before) < timedelta(minutes=1)
+    assert partitions == {"2024-02", before.strftime("%Y-%m")}
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+import pytest
+from app.models.feedback import Feedback
+from app.services.dedup_index import DedupIndex, IdempotencyConflict, content_hash
+from app.services.feedback_service import FeedbackService
+from conftest import make_payload
+
+
+def feedback(**fields) -> Feedback:
+    values = {
+        "text": "The app crashes",
+        "feedback_type": "Bug",
+        "responses": {"product_name": "Mobile App", "description": "The app crashes"},
+        "user_id": "alice",
+    }
+    values.update(fields)
+    return Feedback(**values)
+
+
+def test_content_hash_ignores_timestamp_text_and_whitespace():
+    first = feedback(created_at=datetime(2024, 1, 1), text="one")
+    second = feedback(
+        created_at=datetime(2024, 1, 2),
+        text="two",
+        responses={"description": "  The app crashes ", "product_name": "Mobile App"},
+    )
+    assert content_hash(first) == content_hash(second)
+    assert content_hash(first) != content_hash(feedback(user_id="bob"))
+
+
+def test_lookup_matches_key_and_content():
+    index = DedupIndex()
+    index.remember("key-1", "digest-1", 7)
+    assert index.lookup("key-1", "digest-1") == 7
+    assert index.lookup(None, "digest-1") == 7
+    assert index.lookup("key-2", "digest-2") is None
+    stats = index.stats()
+    assert (stats.checked, stats.duplicates_by_key, stats.duplicates_by_content) == (3, 1, 1)
+
+
+def test_key_reused_for_other_content_conflicts():
+    index = DedupIndex()
+    index.remember("key-1", "digest-1", 7)
+    with pytest.raises(IdempotencyConflict):
+        index.lookup("key-1", "digest-2")
+
+
+def test_without_content_only_the_key_matches():
+    index = DedupIndex()
+    index.remember("key-1", "digest-1", 7, by_content=False)
+    assert index.lookup(None, "digest-1", by_content=False) is None
+    assert index.lookup("key-1", "digest-1", by_content=False) == 7
+
+
+def test_entries_expire_and_are_evicted():
+    expired = DedupIndex(window_seconds=0)
+    expired.remember(None, "digest-1", 7)
+    assert expired.lookup(None, "digest-1") is None
+
+    bounded = DedupIndex(max_entries=2)
+    for number in range(3):
+        bounded.remember(None, f"digest-{number}", number)
+    assert bounded.lookup(None, "digest-0") is None
+    assert bounded.lookup(None, "digest-2") == 2
+    assert bounded.stats().entries == 2
+
+
+def test_forget_lets_a_retry_through():
+    index = DedupIndex()
+    index.remember("key-1", "digest-1", 7)
+    index.forget("key-1", "digest-1")
+    assert index.lookup("key-1", "digest-1") is None
+
+
+def test_service_answers_repeats_with_the_first_record(settings):
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            first = await service.save(feedback())
+            by_content = await service.save(feedback(text="again"))
+            keyed = await service.save(feedback(user_id=None), idempotency_key="retry")
+            by_key = await service.save(feedback(user_id=None), idempotency_key="retry")
+            # Two anonymous people giving the same answers are two submissions
+            anonymous = await service.save(feedback(user_id=None))
+            return first, by_content, keyed, by_key, anonymous, len(service.store)
+        finally:
+            await service.close()
+
+    first, by_content, keyed, by_key, anonymous, stored = asyncio.run(run())
+    assert by_content.id == first.id
+    assert by_key.id == keyed.id != first.id
+    assert anonymous.id not in (first.id, keyed.id)
+    assert stored == 3
+
+
+def test_concurrent_duplicates_share_one_write(settings):
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            saved = await asyncio.gather(*(service.save(feedback()) for _ in range(5)))
+            return {item.id for item in saved}, len(service.store)
+        finally:
+            await service.close()
+
+    ids, stored = asyncio.run(run())
+    assert len(ids) == 1
+    assert stored == 1
+
+
+def test_chat_resubmission_with_its_key_is_stored_once(client):
+    from app import main
+
+    # The chat UI sends no user_id and a fresh created_at on every click, and reuses its key
+    responses = make_payload(0)["responses"]
+    stored = len(main.feedback_service.store)
+    ids = []
+    for created_at in ("2024-01-01T10:00:00", "2024-01-01T10:00:03"):
+        payload = {"text": str(responses), "feedback_type": "Bug", "responses": responses, "created_at": created_at}
+        response = client.post("/feedback", json=payload, headers={"Idempotency-Key": "chat-summary-1"})
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+    assert ids[0] == ids[1]
+    assert len(main.feedback_service.store) == stored + 1
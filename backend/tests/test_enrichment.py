@@ -0,0 +1,117 @@
+import asyncio
+import math
+import os
+import signal
+import time
+from app.models.feedback import Feedback
+from app.services.enrichment_service import EnrichmentService
+from app.services.feedback_service import FeedbackService
+from conftest import make_payload
+
+
+async def wait_for(condition, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def scored(service: FeedbackService, count: int) -> int:
+    return sum(not math.isnan(score) for score in service.store.sentiment_scores(0, count))
+
+
+async def save(service: FeedbackService, enrichment: EnrichmentService, numbers, **fields) -> None:
+    await service.save_many([Feedback(**make_payload(number, **fields)) for number in numbers])
+    enrichment.notify()
+
+
+def test_records_are_scored_and_the_checkpoint_survives_a_restart(settings):
+    settings.enrichment_batch_size = 4
+
+    async def run(numbers):
+        service = FeedbackService(settings)
+        enrichment = EnrichmentService(service, settings)
+        await enrichment.start()
+        try:
+            await save(service, enrichment, numbers)
+            await wait_for(lambda: enrichment.status().pending == 0)
+            return enrichment.checkpoint, scored(service, len(service.store))
+        finally:
+            await enrichment.stop()
+            await service.close()
+
+    assert asyncio.run(run(range(10))) == (10, 10)
+    assert asyncio.run(run(range(10, 15))) == (15, 15)
+
+
+def test_failed_batches_are_retried_without_new_saves(settings, monkeypatch):
+    monkeypatch.setattr(EnrichmentService, "RETRY_SECONDS", 0.1)
+
+    async def run():
+        service = FeedbackService(settings)
+        set_sentiment = service.set_sentiment
+        failures = []
+
+        async def flaky(records, scores):
+            if len(failures) < 2:
+                failures.append(len(records))
+                raise IOError("disk full")
+            await set_sentiment(records, scores)
+
+        service.set_sentiment = flaky
+        enrichment = EnrichmentService(service, settings)
+        await enrichment.start()
+        try:
+            await save(service, enrichment, range(5))
+            await wait_for(lambda: enrichment.checkpoint == 5)
+            return failures, scored(service, 5)
+        finally:
+            await enrichment.stop()
+            await service.close()
+
+    failures, count = asyncio.run(run())
+    assert len(failures) == 2
+    assert count == 5
+
+
+def test_lag_is_measured_from_arrival_not_created_at(settings):
+    async def run():
+        service = FeedbackService(settings)
+        enrichment = EnrichmentService(service, settings)
+        # Not started, so the records stay pending
+        await service.save_many([Feedback(**make_payload(0, created_at="2001-01-01T00:00:00"))])
+        first = enrichment.status()
+        await asyncio.sleep(0.2)
+        second = enrichment.status()
+        await service.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.pending == 1
+    assert first.oldest_unenriched_age_seconds < 1
+    assert 0.2 <= second.oldest_unenriched_age_seconds < 5
+
+
+def test_a_dead_worker_process_is_replaced(settings, monkeypatch):
+    settings.enrichment_workers = 1
+    monkeypatch.setattr(EnrichmentService, "RETRY_SECONDS", 0.1)
+
+    async def run():
+        service = FeedbackService(settings)
+        enrichment = EnrichmentService(service, settings)
+        await enrichment.start()
+        try:
+            await save(service, enrichment, range(3))
+            await wait_for(lambda: enrichment.checkpoint == 3)
+            broken = enrichment._pool
+            for process in list(broken._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+            await wait_for(lambda: broken._broken)
+            await save(service, enrichment, range(3, 6))
+            await wait_for(lambda: enrichment.checkpoint == 6)
+            return broken is not enrichment._pool, scored(service, 6)
+        finally:
+            await enrichment.stop()
+            await service.close()
+
+    assert asyncio.run(run()) == (True, 6)
@@ -0,0 +1,85 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from app.models.feedback import Feedback, FeedbackQuery
+from app.services import export_service
+from app.services.export_service import BASE_COLUMNS, csv_chunks, csv_columns, gzip_chunks, ndjson_chunks
+from app.services.feedback_service import FeedbackService
+from conftest import make_payload, make_record
+
+
+def counted(records, consumed):
+    for record in records:
+        consumed.append(record["id"])
+        yield record
+
+
+def test_ndjson_is_produced_in_chunks_as_records_are_read(monkeypatch):
+    monkeypatch.setattr(export_service, "CHUNK_BYTES", 1024)
+    records = [dict(make_record(number), id=number) for number in range(100)]
+    consumed = []
+    chunks = ndjson_chunks(counted(records, consumed))
+    first = next(chunks)
+    # Only enough records for the first chunk have been pulled from the store
+    assert 0 < len(consumed) < 100
+    lines = (first + b"".join(chunks)).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == list(range(100))
+
+
+def test_csv_flattens_responses_into_question_columns():
+    columns = csv_columns(["Bug"])
+    assert tuple(columns[:len(BASE_COLUMNS)]) == BASE_COLUMNS
+    assert "severity" in columns and "urgency" not in columns
+    record = dict(make_record(0, responses={"severity": "High", "bug_description": "a, \"quoted\"\nanswer",
+                                             "extra": "dropped", "frequency": ["a", "b"]}), id=0)
+    rows = list(csv.reader(io.StringIO(b"".join(csv_chunks([record], columns)).decode("utf-8"))))
+    assert rows[0] == columns
+    row = dict(zip(columns, rows[1]))
+    assert (row["id"], row["severity"], row["frequency"]) == ("0", "High", '["a","b"]')
+    assert row["bug_description"] == "a, \"quoted\"\nanswer"
+    assert "extra" not in row and "text" not in row
+
+
+def test_gzip_stream_decompresses_to_the_input():
+    chunks = [b"first line\n", b"", b"second line\n" * 1000]
+    assert gzip.decompress(b"".join(gzip_chunks(iter(chunks)))) == b"".join(chunks)
+
+
+def test_iter_matching_applies_the_export_filters(settings):
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            await service.save_many([
+                Feedback(**make_payload(number, feedback_type="Bug" if number % 2 else "Feature")) for number in range(6)
+            ])
+            query = FeedbackQuery(feedback_type=["Bug"], created_from=datetime(2024, 1, 1, 2))
+            return [record["id"] for record in service.iter_matching(query)]
+        finally:
+            await service.close()
+
+    assert asyncio.run(run()) == [3, 5]
+
+
+def test_export_endpoint_streams_csv_and_gzip(client):
+    product = "Export Test Product"
+    for number in range(3):
+        payload = make_payload(number, user_id=f"export-{number}")
+        payload["responses"]["product_name"] = product
+        assert client.post("/feedback", json=payload).status_code == 200
+
+    response = client.get("/feedback/export", params={"format": "csv", "type": "Bug", "product_name": product})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "feedback-export.csv" in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["user_id"] for row in rows] == ["export-0", "export-1", "export-2"]
+
+    response = client.get(
+        "/feedback/export", params={"product_name": product}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    # requests decompresses the body transparently
+    assert [json.loads(line)["user_id"] for line in response.text.splitlines()] == ["export-0", "export-1", "export-2"]
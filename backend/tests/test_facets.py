@@ -0,0 +1,77 @@
+import numpy as np
+from app.services.facet_index import ARRAY_MAX, CHUNK_SIZE, Bitmap, FacetIndex
+from conftest import make_record
+
+
+def facet_record(number: int, feedback_type: str, product_name: str, **fields):
+    record = make_record(number, feedback_type=feedback_type, **fields)
+    record["id"] = number
+    record["responses"]["product_name"] = product_name
+    return record
+
+
+def indexed():
+    index = FacetIndex()
+    index.add_many([
+        facet_record(0, "Bug", "Mobile App"),
+        facet_record(1, "Bug", "Web App"),
+        facet_record(2, "Feature Request", "Mobile App"),
+        facet_record(3, "Bug", "Mobile App", sentiment_score=0.9),
+    ])
+    return index
+
+
+def test_bitmap_switches_to_a_bitset_when_dense_and_keeps_counting():
+    bitmap = Bitmap()
+    ids = list(range(0, 2 * (ARRAY_MAX + 10), 2)) + [CHUNK_SIZE + 5]
+    for record_id in ids + ids[:10]:
+        bitmap.add(record_id)
+    assert bitmap.cardinality == len(ids)
+    assert isinstance(bitmap._chunks[0], np.ndarray)
+    bitmap.remove(0)
+    bitmap.remove(1)
+    assert bitmap.cardinality == len(ids) - 1
+    mask = FacetIndex.ids_to_mask(np.array([0, 2, 4, 5, CHUNK_SIZE + 5]))
+    assert bitmap.count(mask) == 3
+
+
+def test_counts_without_filters():
+    total, counts = indexed().counts({})
+    assert total == 4
+    assert counts["feedback_type"] == {"Bug": 3, "Feature Request": 1}
+    assert counts["product_name"] == {"Mobile App": 3, "Web App": 1}
+    assert counts["sentiment"] == {"Unscored": 3, "Positive": 1}
+
+
+def test_a_facet_ignores_its_own_filter_but_applies_the_others():
+    total, counts = indexed().counts({"feedback_type": ["Bug"], "product_name": ["Mobile App"]})
+    assert total == 2
+    # Unselected options stay visible for the filtered facets
+    assert counts["feedback_type"] == {"Bug": 2, "Feature Request": 1}
+    assert counts["product_name"] == {"Mobile App": 2, "Web App": 1}
+    assert counts["sentiment"] == {"Unscored": 1, "Positive": 1}
+
+
+def test_repeated_values_are_ored_and_ids_restrict_everything():
+    index = indexed()
+    total, _ = index.counts({"product_name": ["Mobile App", "Web App"]})
+    assert total == 4
+    total, counts = index.counts({"feedback_type": ["Bug"]}, ids=np.array([1, 2]))
+    assert total == 1
+    assert counts["feedback_type"] == {"Bug": 1, "Feature Request": 1}
+
+
+def test_update_sentiment_moves_records_between_buckets():
+    index = indexed()
+    record = facet_record(0, "Bug", "Mobile App")
+    index.update_sentiment([record], [0.1])
+    _, counts = index.counts({})
+    assert counts["sentiment"] == {"Unscored": 2, "Positive": 1, "Negative": 1}
+
+
+def test_unknown_facet_is_rejected(client):
+    response = client.get("/feedback/facets", params={"colour": "red"})
+    assert response.status_code == 400
+    response = client.get("/feedback/facets", params={"feedback_type": "Bug"})
+    assert response.status_code == 200
+    assert "feedback_type" in response.json()["facets"]
@@ -0,0 +1,65 @@
+from app.models.feedback import Feedback
+from app.services.flow_registry import FlowRegistry
+from conftest import make_payload
+
+
+def errors_for(payload, max_text_length: int = 10000):
+    return FlowRegistry(max_text_length).validate(Feedback(**payload))
+
+
+def test_version_is_stable_and_used_as_the_etag():
+    first, second = FlowRegistry(), FlowRegistry()
+    assert first.version == second.version
+    assert first.etag == f'"{first.version}"'
+    assert first.body == second.body
+
+
+def test_get_flows_revalidates_with_if_none_match(client):
+    response = client.get("/flows")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    body = response.json()
+    assert body["version"] == etag.strip('"')
+    assert "Bug" in body["flows"]
+
+    response = client.get("/flows", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert client.get("/flows", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_valid_submission_has_no_errors():
+    assert errors_for(make_payload(0)) == []
+    assert errors_for(make_payload(1, feedback_type="Feature")) == []
+
+
+def test_answers_are_checked_against_the_flow():
+    payload = make_payload(0)
+    responses = payload["responses"]
+    responses["severity"] = "Whenever"
+    del responses["product_name"]
+    responses["colour"] = "red"
+    responses["bug_description"] = "x" * 50
+    locations = {error["loc"][-1]: error["msg"] for error in errors_for(payload, max_text_length=20)}
+    assert locations == {
+        "severity": "not one of the options",
+        "product_name": "field required",
+        "colour": "not a question of this flow",
+        "bug_description": "longer than 20 characters",
+    }
+
+
+def test_unknown_type_and_mismatched_responses_are_rejected():
+    assert errors_for(make_payload(0, feedback_type="Rant"))[0]["loc"] == ["body", "feedback_type"]
+    payload = make_payload(0)
+    payload["responses"]["feedback_type"] = "Feature"
+    assert [error["loc"][-1] for error in errors_for(payload)] == ["feedback_type"]
+
+
+def test_invalid_submission_is_a_422(client):
+    payload = make_payload(0)
+    payload["responses"]["severity"] = "Whenever"
+    response = client.post("/feedback", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "responses", "severity"]
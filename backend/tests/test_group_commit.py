@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from app.models.feedback import Feedback, FeedbackQuery
+from app.services.feedback_service import FeedbackService
+
+
+def feedback(number: int) -> Feedback:
+    return Feedback(
+        text=f"feedback {number}",
+        feedback_type="Bug",
+        responses={"product_name": "Mobile App", "description": f"it broke {number}"},
+        user_id=f"user-{number}",
+    )
+
+
+def count_appends(service: FeedbackService):
+    calls = []
+    append_many = service.store.append_many
+
+    def counting(records, *args, **kwargs):
+        calls.append(len(records))
+        return append_many(records, *args, **kwargs)
+
+    service.store.append_many = counting
+    return calls
+
+
+def test_concurrent_saves_share_writes(settings):
+    settings.write_batch_max_wait_ms = 20
+
+    async def run():
+        service = FeedbackService(settings)
+        calls = count_appends(service)
+        try:
+            saved = await asyncio.gather(*(service.save(feedback(number)) for number in range(50)))
+        finally:
+            await service.close()
+        return saved, calls
+
+    saved, calls = asyncio.run(run())
+    assert sorted(item.id for item in saved) == list(range(50))
+    assert sum(calls) == 50
+    assert len(calls) < 50
+
+
+def test_saved_records_are_durable_and_reindexed_on_restart(settings):
+    async def save(count):
+        service = FeedbackService(settings)
+        try:
+            for number in range(count):
+                await service.save(feedback(number))
+        finally:
+            await service.close()
+
+    asyncio.run(save(3))
+    service = FeedbackService(settings)
+    assert len(service.store) == 3
+    assert list(service.index.select(FeedbackQuery(user_id="user-1"))) == [1]
+    assert service.store.get(2)["text"] == "feedback 2"
+    service.store.close()
+
+
+def test_failed_commit_fails_its_saves_and_a_retry_is_written(settings):
+    async def run():
+        service = FeedbackService(settings)
+        append_many = service.store.append_many
+
+        def failing(records, *args, **kwargs):
+            service.store.append_many = append_many
+            raise IOError("disk full")
+
+        service.store.append_many = failing
+        try:
+            with pytest.raises(Exception, match="disk full"):
+                await service.save(feedback(0))
+            # The failed write was forgotten by dedup, so the retry is written
+            retried = await service.save(feedback(0))
+        finally:
+            await service.close()
+        return retried, len(service.store)
+
+    retried, stored = asyncio.run(run())
+    assert retried.id == 0
+    assert stored == 1
+
+
+def test_save_many_commits_one_batch(settings):
+    async def run():
+        service = FeedbackService(settings)
+        calls = count_appends(service)
+        try:
+            ids = await service.save_many([feedback(number) for number in range(10)])
+        finally:
+            await service.close()
+        return ids, calls
+
+    ids, calls = asyncio.run(run())
+    assert ids == list(range(10))
+    assert calls == [10]
@@ -0,0 +1,78 @@
+import asyncio
+import gzip
+import json
+from typing import Iterable, List
+from app.services.feedback_service import FeedbackService
+from app.services.flow_registry import FlowRegistry
+from app.services.ingest_service import IngestService
+from conftest import make_payload
+
+
+async def stream(data: bytes, chunk_size: int):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def ndjson(lines: Iterable) -> bytes:
+    return b"".join((line if isinstance(line, bytes) else json.dumps(line).encode()) + b"\n" for line in lines)
+
+
+def ingest(settings, data: bytes, gzipped: bool = False, chunk_size: int = 64 * 1024):
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            result = await IngestService(service, settings, FlowRegistry()).ingest(stream(data, chunk_size), gzipped)
+            return result, [record["text"] for record in service.store.iter_records()]
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def mixed_upload() -> bytes:
+    invalid_answer = make_payload(3)
+    invalid_answer["responses"]["urgency"] = "Whenever"
+    return ndjson([make_payload(0), make_payload(1), b"{not json", b"", invalid_answer, make_payload(4)])
+
+
+def test_valid_lines_are_stored_and_invalid_ones_reported(settings):
+    result, texts = ingest(settings, mixed_upload())
+    assert (result.accepted, result.rejected) == (3, 2)
+    assert [error.line for error in result.errors] == [3, 5]
+    assert texts == ["feedback 0", "feedback 1", "feedback 4"]
+
+
+def test_gzip_upload_in_small_chunks_gives_the_same_result(settings):
+    result, texts = ingest(settings, gzip.compress(mixed_upload()), gzipped=True, chunk_size=7)
+    assert (result.accepted, result.rejected) == (3, 2)
+    assert texts == ["feedback 0", "feedback 1", "feedback 4"]
+
+
+def test_records_are_written_in_chunks(settings):
+    settings.ingest_chunk_size = 4
+    result, texts = ingest(settings, ndjson(make_payload(number) for number in range(10)))
+    assert result.accepted == 10
+    assert texts == [f"feedback {number}" for number in range(10)]
+
+
+def test_over_long_line_is_rejected_without_losing_the_next(settings):
+    settings.ingest_max_line_bytes = 2048
+    long_line = make_payload(1, text="x" * 10000)
+    result, texts = ingest(settings, ndjson([make_payload(0), long_line, make_payload(2)]), chunk_size=100)
+    assert (result.accepted, result.rejected) == (2, 1)
+    assert result.errors[0].line == 2
+    assert texts == ["feedback 0", "feedback 2"]
+
+
+def test_decompression_is_bounded_by_the_line_limit(settings):
+    settings.ingest_max_line_bytes = 4096
+    # 16 MB of newlines compress to a few KB and arrive as one chunk
+    bomb = gzip.compress(b"\n" * (16 * 1024 * 1024))
+    service = IngestService(None, settings)
+
+    async def pieces() -> List[int]:
+        return [len(piece) async for piece in service._decoded(stream(bomb, len(bomb)), gzipped=True)]
+
+    sizes = asyncio.run(pieces())
+    assert max(sizes) <= settings.ingest_max_line_bytes
+    assert sum(sizes) == 16 * 1024 * 1024
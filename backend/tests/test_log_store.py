@@ -0,0 +1,124 @@
+import json
+import math
+import os
+from app.services.log_store import OFFSET_ENTRY, SENTIMENT_ENTRY, LogStore
+from conftest import make_records
+
+
+def open_log(directory, **options) -> LogStore:
+    return LogStore(str(directory), **options)
+
+
+def active_segment(store: LogStore) -> str:
+    return store._path(store._manifest["segments"][-1])
+
+
+def test_records_round_trip_with_dense_ids(tmp_path):
+    store = open_log(tmp_path)
+    assert store.append_many(make_records(3)) == [0, 1, 2]
+    assert store.append_many(make_records(2)) == [3, 4]
+    store.close()
+
+    store = open_log(tmp_path)
+    assert len(store) == 5
+    assert [record["id"] for record in store.iter_records()] == [0, 1, 2, 3, 4]
+    assert store.get(1)["text"] == "feedback 1"
+    assert store.get(5) is None
+    store.close()
+
+
+def test_torn_last_line_is_dropped_on_open(tmp_path):
+    store = open_log(tmp_path)
+    store.append_many(make_records(3))
+    path = active_segment(store)
+    store.close()
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"text":"half a rec')
+
+    store = open_log(tmp_path)
+    assert len(store) == 3
+    assert os.path.getsize(path) == intact
+    assert store.append_many(make_records(1)) == [3]
+    assert store.get(3)["text"] == "feedback 0"
+    store.close()
+
+
+def test_short_offset_index_is_rebuilt_from_the_segments(tmp_path):
+    store = open_log(tmp_path)
+    store.append_many(make_records(4))
+    store.close()
+    with open(tmp_path / LogStore.OFFSET_INDEX_FILE, "r+b") as f:
+        f.truncate(OFFSET_ENTRY.size)
+
+    store = open_log(tmp_path)
+    assert len(store) == 4
+    assert [store.get(record_id)["text"] for record_id in range(4)] == [f"feedback {n}" for n in range(4)]
+    store.close()
+
+
+def test_offset_index_ahead_of_a_truncated_segment_is_trimmed(tmp_path):
+    store = open_log(tmp_path)
+    store.append_many(make_records(3))
+    path = active_segment(store)
+    store.close()
+    # The last record's data was lost but its index entry survived
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    with open(path, "wb") as f:
+        f.writelines(lines[:2])
+
+    store = open_log(tmp_path)
+    assert len(store) == 2
+    assert os.path.getsize(tmp_path / LogStore.OFFSET_INDEX_FILE) == 2 * OFFSET_ENTRY.size
+    assert os.path.getsize(tmp_path / LogStore.SENTIMENT_FILE) == 2 * SENTIMENT_ENTRY.size
+    assert store.append_many(make_records(1)) == [2]
+    store.close()
+
+
+def test_sentiment_column_is_padded_and_overlaid(tmp_path):
+    store = open_log(tmp_path)
+    store.append_many(make_records(3))
+    store.close()
+    with open(tmp_path / LogStore.SENTIMENT_FILE, "r+b") as f:
+        f.truncate(0)
+
+    store = open_log(tmp_path)
+    assert all(math.isnan(score) for score in store.sentiment_scores(0, 3))
+    store.set_sentiment_many([1], [0.5])
+    assert store.get(1)["sentiment_score"] == 0.5
+    assert store.get(0)["sentiment_score"] is None
+    store.close()
+
+
+def test_segments_roll_and_old_manifests_are_upgraded(tmp_path):
+    store = open_log(tmp_path, segment_max_bytes=1)
+    store.append_many(make_records(3))
+    assert len(store._manifest["segments"]) == 2
+    store.append_many(make_records(1))
+    store.close()
+
+    manifest_path = tmp_path / LogStore.MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    # Version 1 manifests only listed the segments
+    legacy = {"segments": [{key: segment[key] for key in ("name", "first_id", "records")} for segment in manifest["segments"]]}
+    manifest_path.write_text(json.dumps(legacy))
+
+    store = open_log(tmp_path, segment_max_bytes=1)
+    assert len(store) == 4
+    assert [record["id"] for record in store.iter_records()] == [0, 1, 2, 3]
+    store.close()
+
+
+def test_read_only_store_follows_the_writer(tmp_path):
+    writer = open_log(tmp_path)
+    writer.append_many(make_records(2))
+    follower = open_log(tmp_path, read_only=True)
+    assert len(follower) == 2
+
+    writer.append_many(make_records(3))
+    assert len(follower) == 2
+    assert follower.refresh() == 5
+    assert follower.get(4)["text"] == "feedback 2"
+    follower.close()
+    writer.close()
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import pytest
+from app.models.feedback import Feedback
+from app.services.feedback_service import FeedbackService
+from app.services.metrics import BYTES_WRITTEN, COMMIT_BATCH_RECORDS, MetricsRegistry
+from conftest import make_payload
+
+
+def lines(registry: MetricsRegistry, remote=None):
+    return registry.render(remote).splitlines()
+
+
+def test_counters_sum_the_shards_of_every_thread():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs.", ["kind"])
+
+    def work():
+        for _ in range(1000):
+            counter.labels("a").inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels('say "hi"\n').inc(2.5)
+    assert lines(registry) == [
+        "# HELP jobs_total Jobs.",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a"} 4000',
+        'jobs_total{kind="say \\"hi\\"\\n"} 2.5',
+    ]
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("wait_seconds", "Wait.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+    assert lines(registry)[2:] == [
+        'wait_seconds_bucket{le="0.1"} 1',
+        'wait_seconds_bucket{le="1.0"} 3',
+        'wait_seconds_bucket{le="+Inf"} 4',
+        "wait_seconds_sum 4.05",
+        "wait_seconds_count 4",
+    ]
+
+
+def test_unlabelled_metrics_start_at_zero_and_names_are_unique():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors.")
+    assert "errors_total 0" in lines(registry)
+    with pytest.raises(ValueError):
+        registry.counter("errors_total", "Errors.")
+
+
+def test_gauges_are_read_at_scrape_time_and_a_failing_one_is_skipped():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.gauge("queue_depth", "Depth.", lambda: depth[0])
+    registry.gauge("sizes", "Sizes.", lambda: {("a",): 1, ("b",): 2}, ["name"])
+    registry.gauge("broken", "Broken.", lambda: 1 / 0)
+    depth[0] = 5
+    rendered = lines(registry)
+    assert "queue_depth 5" in rendered
+    assert 'sizes{name="b"} 2' in rendered
+    assert not any(line.startswith("# HELP broken") for line in rendered)
+
+
+def test_remote_series_are_added_to_local_ones():
+    writer, worker = MetricsRegistry(), MetricsRegistry()
+    for registry in (writer, worker):
+        registry.counter("bytes_total", "Bytes.", ["file"]).labels("log").inc(10)
+    writer.counter("commits_total", "Commits.").inc(3)
+    remote = writer.collect(["bytes_total", "commits_total", "missing"])
+    rendered = lines(worker, remote)
+    assert 'bytes_total{file="log"} 20' in rendered
+    # Only series the worker has registered itself are rendered
+    assert not any("commits_total" in line for line in rendered)
+
+
+def test_the_write_path_records_batches_and_bytes(settings):
+    batches_before = COMMIT_BATCH_RECORDS.labels().snapshot()[0]
+    bytes_before = sum(sample[0] for sample in BYTES_WRITTEN.collect().values())
+
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            await service.save_many([Feedback(**make_payload(number)) for number in range(5)])
+        finally:
+            await service.close()
+
+    asyncio.run(run())
+    counts = COMMIT_BATCH_RECORDS.labels().snapshot()[0]
+    # One commit of five records, counted in the (4, 8] bucket
+    assert [a - b for a, b in zip(counts, batches_before)] == [0, 0, 0, 1] + [0] * (len(counts) - 4)
+    assert sum(sample[0] for sample in BYTES_WRITTEN.collect().values()) > bytes_before
+
+
+def test_metrics_endpoint_reports_route_templates(client):
+    client.get("/flows")
+    client.get("/no-such-page")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{route="/flows",method="GET",status="200"}' in body
+    assert 'route="unmatched"' in body
+    assert "feedback_store_records " in body
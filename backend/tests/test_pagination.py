@@ -0,0 +1,81 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from app.models.feedback import Feedback, FeedbackQuery
+from app.services.feedback_service import FeedbackService, decode_cursor, encode_cursor
+from conftest import START, make_payload
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(0)) == 0
+    assert decode_cursor(encode_cursor(123456)) == 123456
+    for cursor in ["", "not a cursor", encode_cursor(1)[:-2] + "!!", "djI6MQ"]:  # "djI6MQ" is "v2:1"
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+@pytest.fixture
+def service(settings):
+    service = FeedbackService(settings)
+    feedbacks = [
+        Feedback(**make_payload(number, "Bug" if number % 3 else "Feature")) for number in range(25)
+    ]
+    asyncio.run(service.save_many(feedbacks))
+    yield service
+    service.store.close()
+
+
+def read_all(service, query: FeedbackQuery, limit: int):
+    pages, start_id = [], 0
+    while True:
+        items, start_id, has_more = service.query(query, start_id, limit)
+        pages.append([item.id for item in items])
+        if not has_more:
+            return pages, start_id
+
+
+def test_unfiltered_pages_cover_every_record_once(service):
+    pages, next_id = read_all(service, FeedbackQuery(), limit=10)
+    assert pages == [list(range(0, 10)), list(range(10, 20)), list(range(20, 25))]
+    assert next_id == 25
+
+
+def test_filtered_pages_follow_the_index(service):
+    features = [number for number in range(25) if number % 3 == 0]
+    pages, next_id = read_all(service, FeedbackQuery(feedback_type="Feature"), limit=4)
+    assert [record_id for page in pages for record_id in page] == features
+    assert all(len(page) == 4 for page in pages[:-1])
+    assert next_id == 25
+
+    window = FeedbackQuery(feedback_type=["Bug", "Feature"], created_from=START + timedelta(hours=5), created_to=START + timedelta(hours=9))
+    assert read_all(service, window, limit=100)[0] == [[5, 6, 7, 8, 9]]
+
+
+def test_last_cursor_returns_only_newer_records(service):
+    _, next_id = read_all(service, FeedbackQuery(), limit=100)
+    assert service.query(FeedbackQuery(), next_id, 10) == ([], 25, False)
+
+    asyncio.run(service.save_many([Feedback(**make_payload(25))]))
+    items, next_id, has_more = service.query(FeedbackQuery(), next_id, 10)
+    assert [item.id for item in items] == [25]
+    assert (next_id, has_more) == (26, False)
+
+
+def test_feedback_endpoint_pages_with_cursors(client):
+    saved = [client.post("/feedback", json=make_payload(number)).json()["id"] for number in range(5)]
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/feedback", params=params).json()
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    assert ids[-5:] == saved
+    assert decode_cursor(cursor) == saved[-1] + 1
+
+    response = client.get("/feedback", params={"cursor": "not a cursor"})
+    assert response.status_code == 400
+    assert client.get("/feedback", params={"limit": 0}).status_code == 422
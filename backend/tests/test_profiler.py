@@ -0,0 +1,87 @@
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from app.models.feedback import ProfileCapture
+from app.services.profiler import ProfilerMiddleware, ProfileStore, StackSampler
+
+
+def busy_for(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def slow_app(scope, receive, send):
+    busy_for(0.05)
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": b"done"})
+
+
+def call(middleware: ProfilerMiddleware, headers=()):
+    messages = []
+    scope = {"type": "http", "method": "POST", "path": "/feedback/batch", "headers": list(headers)}
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    asyncio.run(middleware(scope, receive, send))
+    return dict(messages[0]["headers"])
+
+
+def capture(number: int) -> ProfileCapture:
+    return ProfileCapture(
+        name=f"20240101T0000000000{number:02d}-GET-flows.collapsed",
+        method="GET",
+        path="/flows",
+        status=200,
+        duration_ms=1.0,
+        samples=1,
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_sampler_counts_the_stacks_of_busy_threads():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy_for(0.1)
+    stacks = sampler.stop()
+    assert sampler.samples > 0
+    assert any(stack.startswith("MainThread;") and "busy_for (tests/test_profiler.py" in stack for stack in stacks)
+
+
+def test_requested_profiles_are_saved_and_named_in_a_header(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    headers = call(ProfilerMiddleware(slow_app, store), [(b"x-profile", b"1")])
+    name = headers[b"x-profile-id"].decode()
+    assert name.endswith("-POST-feedback_batch.collapsed")
+    [saved] = store.list()
+    assert (saved.name, saved.status, saved.path) == (name, 201, "/feedback/batch")
+    assert saved.duration_ms >= 50
+    with open(store.path(name)) as f:
+        assert all(line.rsplit(" ", 1)[1].strip().isdigit() for line in f)
+
+
+def test_unselected_requests_are_not_profiled(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    headers = call(ProfilerMiddleware(slow_app, store, sample_rate=0.0), [(b"x-profile", b"0")])
+    assert b"x-profile-id" not in headers
+    assert store.list() == []
+
+
+def test_store_keeps_the_newest_captures_and_refuses_odd_names(tmp_path):
+    store = ProfileStore(str(tmp_path), retain=2)
+    for number in range(4):
+        store.save(capture(number), Counter({"MainThread;main (app.py:1)": number + 1}))
+    assert [saved.name for saved in store.list()] == [capture(3).name, capture(2).name]
+    assert store.path(capture(0).name) is None
+    assert store.path("../config.py") is None
+    assert store.path(capture(3).name) is not None
+
+
+def test_unknown_profile_is_a_404(client):
+    assert client.get("/profiles/nothing-here.collapsed").status_code == 404
+    assert client.get("/profiles").status_code == 200
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+from app.services.search_index import SearchIndex, tokenize
+
+
+def document(number: int, description: str):
+    return {"id": number, "responses": {"bug_description": description}}
+
+
+def add(index: SearchIndex, descriptions, start: int = 0, batch: int = 2) -> None:
+    """Index in commit-sized batches, so a segment is written whenever ``flush_docs`` is reached."""
+    descriptions = list(descriptions)
+    for offset in range(0, len(descriptions), batch):
+        index.add_many(document(start + offset + i, text) for i, text in enumerate(descriptions[offset:offset + batch]))
+
+
+def segment_ranges(index: SearchIndex):
+    return [index._id_range(path) for path in index._segment_files()]
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The login button is BROKEN!") == ["login", "button", "broken"]
+
+
+def test_ranking_prefers_rarer_and_repeated_terms(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    add(index, ["login fails", "login login fails again", "checkout is slow", "app crashes on login"])
+    ids, scores, total = index.search("login", 10)
+    assert total == 3
+    assert ids[0] == 1
+    assert list(scores) == sorted(scores, reverse=True)
+    ids, _, total = index.search("slow checkout", 10)
+    assert (list(ids), total) == ([2], 1)
+    assert index.search("missing", 10)[2] == 0
+
+
+def test_results_are_limited_and_restricted_to_candidates(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    add(index, [f"crash number {number}" for number in range(20)])
+    ids, _, total = index.search("crash", 5)
+    assert (len(ids), total) == (5, 20)
+    ids, _, total = index.search("crash", 10, candidates=np.array([3, 7, 30]))
+    assert (sorted(ids), total) == ([3, 7], 2)
+
+
+def test_segments_are_reloaded_without_reindexing(tmp_path):
+    index = SearchIndex(str(tmp_path), flush_docs=4)
+    add(index, [f"slow sync {number}" for number in range(10)])
+    index.flush()
+    assert segment_ranges(index) == [(0, 4), (4, 8), (8, 10)]
+    expected = index.search("sync", 10)
+    assert expected[2] == 10
+
+    reopened = SearchIndex(str(tmp_path), flush_docs=4)
+    assert reopened.indexed_upto == 10
+    assert reopened.pending_postings() == 0
+    ids, scores, total = reopened.search("sync", 10)
+    assert (list(ids), total) == (list(expected[0]), expected[2])
+    assert np.allclose(scores, expected[1])
+
+
+def test_full_tiers_are_merged_and_larger_segments_left_alone(tmp_path):
+    index = SearchIndex(str(tmp_path), flush_docs=2, max_segments=2)
+    add(index, [f"bug {number}" for number in range(8)])
+    index.flush()
+    # Two tier-0 pairs merged into (0, 4) and (4, 8), which then formed a full tier 1
+    assert segment_ranges(index) == [(0, 8)]
+    first = os.stat(os.path.join(str(tmp_path), "segment-000000000000-000000000008.npz"))
+
+    add(index, [f"bug {number}" for number in range(8, 12)], start=8)
+    index.flush()
+    assert segment_ranges(index) == [(0, 8), (8, 12)]
+    # The large segment was not rewritten by the smaller merge
+    assert os.stat(os.path.join(str(tmp_path), "segment-000000000000-000000000008.npz")).st_mtime_ns == first.st_mtime_ns
+    assert index.search("bug", 20)[2] == 12
+    assert SearchIndex(str(tmp_path), flush_docs=2, max_segments=2).search("bug", 20)[2] == 12
+
+
+def test_read_only_index_never_writes(tmp_path):
+    writer = SearchIndex(str(tmp_path), flush_docs=2)
+    add(writer, ["first bug", "second bug"])
+    reader = SearchIndex(str(tmp_path), flush_docs=2, read_only=True)
+    add(reader, ["third bug", "fourth bug"], start=2)
+    reader.flush()
+    assert segment_ranges(reader) == [(0, 2)]
+    assert reader.search("bug", 10)[2] == 4
@@ -0,0 +1,100 @@
+import json
+import math
+import os
+import sqlite3
+import pytest
+from app.services.feedback_service import FeedbackService
+from app.services.log_store import LogStore
+from app.services.sqlite_store import SQLiteStore
+from app.services.storage_migration import copy_store
+from conftest import START, make_records
+
+
+def write_legacy(settings, count: int) -> str:
+    legacy_file = os.path.join(settings.data_dir, "feedback.json")
+    records = make_records(count)
+    for record_id, record in enumerate(records):
+        record["id"] = record_id
+    with open(legacy_file, "w") as f:
+        json.dump(records, f)
+    return legacy_file
+
+
+@pytest.mark.parametrize("backend", ["log", "sqlite"])
+def test_legacy_file_is_imported_once(settings, backend):
+    settings.storage_backend = backend
+    legacy_file = write_legacy(settings, 5)
+
+    service = FeedbackService(settings)
+    assert len(service.store) == 5
+    assert service.store.get(2)["text"] == "feedback 2"
+    assert len(service.index) == 5
+    service.store.close()
+    assert not os.path.exists(legacy_file)
+    assert os.path.exists(legacy_file + ".migrated")
+
+    # A file put back later is not imported again
+    os.replace(legacy_file + ".migrated", legacy_file)
+    service = FeedbackService(settings)
+    assert len(service.store) == 5
+    service.store.close()
+
+
+def test_interrupted_legacy_import_resumes(tmp_path, settings):
+    legacy_file = write_legacy(settings, 5)
+    store = LogStore(str(tmp_path / "store"))
+    with open(legacy_file) as f:
+        store.append_many(json.load(f)[:2])
+
+    assert store.migrate_legacy(legacy_file, chunk_size=2) == 5
+    assert [record["text"] for record in store.iter_records()] == [f"feedback {n}" for n in range(5)]
+    store.close()
+
+
+def test_copy_keeps_ids_and_computed_scores_apart(tmp_path):
+    source = LogStore(str(tmp_path / "log"))
+    records = make_records(5)
+    records[1]["sentiment_score"] = 0.75  # Supplied by the client
+    source.append_many(records)
+    source.set_sentiment_many([3], [-0.5])  # Computed by enrichment
+
+    target = SQLiteStore(str(tmp_path / "sqlite"))
+    assert copy_store(source, target, chunk_size=2) == 5
+    assert [record["id"] for record in target.iter_records()] == list(range(5))
+    assert target.get(1)["sentiment_score"] == 0.75
+    assert target.get(3)["sentiment_score"] == -0.5
+    scores = target.sentiment_scores(0, 5)
+    assert math.isnan(scores[1]) and scores[3] == -0.5
+
+    source.append_many(make_records(2))
+    assert copy_store(source, target) == 2
+    assert len(target) == 7
+    source.close()
+    target.close()
+
+
+def test_copy_refuses_a_target_ahead_of_the_source(tmp_path):
+    source = SQLiteStore(str(tmp_path / "sqlite"))
+    source.append_many(make_records(1))
+    target = LogStore(str(tmp_path / "log"))
+    target.append_many(make_records(2))
+    with pytest.raises(ValueError):
+        copy_store(source, target)
+    source.close()
+    target.close()
+
+
+def test_sqlite_keeps_only_the_created_at_index(tmp_path):
+    store = SQLiteStore(str(tmp_path))
+    store.append_many(make_records(3))
+    store.close()
+    # A database created before the filter indexes were dropped
+    connection = sqlite3.connect(store.path)
+    connection.execute("CREATE INDEX feedback_user_id ON feedback (user_id)")
+    connection.close()
+
+    store = SQLiteStore(str(tmp_path))
+    indexes = [row[0] for row in store._writer.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'feedback'")]
+    assert indexes == ["feedback_created_at"]
+    assert [record["id"] for record in store.iter_range(START.replace(hour=1), START.replace(hour=2))] == [1, 2]
+    store.close()
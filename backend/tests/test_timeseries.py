@@ -0,0 +1,81 @@
+import asyncio
+from datetime import date, datetime
+import pytest
+from app.models.feedback import Feedback
+from app.services.feedback_service import FeedbackService
+from app.services.timeseries import BUCKETS, bucket_count, bucket_start, bucket_starts, choose_bucket
+from conftest import make_payload
+
+
+def test_bucket_starts_follow_the_calendar():
+    moment = datetime(2024, 2, 29, 17, 45, 12)  # A Thursday
+    assert bucket_start(moment, "hour") == datetime(2024, 2, 29, 17)
+    assert bucket_start(moment, "day") == datetime(2024, 2, 29)
+    assert bucket_start(moment, "week") == datetime(2024, 2, 26)
+    assert bucket_start(moment, "month") == datetime(2024, 2, 1)
+    assert bucket_start(moment, "year") == datetime(2024, 1, 1)
+    assert bucket_starts(datetime(2023, 11, 20), datetime(2024, 2, 3), "month") == [
+        datetime(2023, 11, 1), datetime(2023, 12, 1), datetime(2024, 1, 1), datetime(2024, 2, 1),
+    ]
+
+
+def test_bucket_count_matches_the_listed_buckets():
+    start, end = datetime(2023, 12, 30, 22, 10), datetime(2024, 3, 2, 1, 5)
+    for bucket in BUCKETS:
+        assert bucket_count(start, end, bucket) == len(bucket_starts(start, end, bucket))
+
+
+def test_choose_bucket_picks_the_finest_within_the_limit():
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 3, 23, 59)
+    assert choose_bucket(start, end, 100) == "hour"
+    assert choose_bucket(start, end, 10) == "day"
+    assert choose_bucket(start, end, 100, finest="day") == "day"
+    assert choose_bucket(datetime(1900, 1, 1), end, 10) == "year"
+
+
+def timeseries(settings, *args, **kwargs):
+    async def run():
+        service = FeedbackService(settings)
+        try:
+            # Three days, every fifth hour; odd records are bugs. Saved by the first call of a test
+            if not len(service.store):
+                await service.save_many([
+                    Feedback(**make_payload(number, feedback_type="Bug" if number % 2 else "Feature"))
+                    for number in range(0, 72, 5)
+                ])
+            return service.timeseries(*args, **kwargs)
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def test_daily_series_come_from_the_rollups_and_hours_from_the_index(settings):
+    bucket, starts, series = timeseries(settings, "feedback_type", "auto", 10)
+    assert bucket == "day"
+    assert starts == [datetime(2024, 1, day) for day in (1, 2, 3)]
+    assert series == {"Bug": [2, 3, 2], "Feature": [3, 2, 3]}
+
+    bucket, starts, series = timeseries(settings, None, "hour", 100, day_from=date(2024, 1, 2), day_to=date(2024, 1, 2))
+    assert (bucket, len(starts)) == ("hour", 24)
+    [counts] = series.values()
+    assert sum(counts) == 5
+    assert counts[1] == 1  # 25 hours after the start
+
+
+def test_filters_and_invalid_buckets(settings):
+    _, _, series = timeseries(settings, None, "day", 10, feedback_type=["Bug"])
+    assert [sum(counts) for counts in series.values()] == [7]
+    with pytest.raises(ValueError, match="cannot be grouped"):
+        timeseries(settings, "sentiment", "hour", 100)
+    with pytest.raises(ValueError, match="more than 10"):
+        timeseries(settings, None, "hour", 10)
+
+
+def test_endpoint_rejects_too_many_points(client):
+    response = client.get("/stats/timeseries", params={"bucket": "hour", "from": "2000-01-01", "to": "2020-01-01"})
+    assert response.status_code == 400
+    response = client.get("/stats/timeseries", params={"bucket": "year", "from": "2023-06-01", "to": "2024-06-01"})
+    assert response.status_code == 200
+    assert response.json()["bucket"] == "year"
+    assert len(response.json()["buckets"]) == 2
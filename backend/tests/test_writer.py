@@ -0,0 +1,82 @@
+import asyncio
+import os
+import pytest
+from app.models.feedback import Feedback, FeedbackQuery
+from app.services.dedup_index import IdempotencyConflict
+from app.services.feedback_service import FeedbackService
+from app.services.metrics import BYTES_WRITTEN
+from app.services.writer_service import WriterClient, WriterServer
+from conftest import make_payload
+
+
+def run_with_writer(settings, scenario):
+    """Run ``scenario(writer_service, worker_service, client)`` against a writer on a Unix socket."""
+    socket_path = os.path.join(settings.data_dir, "writer.sock")
+
+    async def run():
+        writer_service = FeedbackService(settings, read_indexes=False)
+        server = WriterServer(writer_service, socket_path)
+        await server.start()
+        client = WriterClient(socket_path)
+        worker_service = FeedbackService(settings, writer=client)
+        try:
+            return await scenario(writer_service, worker_service, client, server)
+        finally:
+            await worker_service.close()
+            await server.stop()
+            await writer_service.close()
+
+    return asyncio.run(run())
+
+
+def test_worker_saves_go_through_the_writer_and_are_read_back(settings):
+    async def scenario(writer_service, worker_service, client, server):
+        saved = await worker_service.save(Feedback(**make_payload(0)))
+        ids = await worker_service.save_many([Feedback(**make_payload(number)) for number in (1, 2)])
+        return saved.id, ids, list(worker_service.index.select(FeedbackQuery(user_id="user-2"))), writer_service
+
+    first, ids, selected, writer_service = run_with_writer(settings, scenario)
+    assert (first, ids, selected) == (0, [1, 2], [2])
+    assert len(writer_service.store) == 3
+    # The writer serves no reads, so only the search index is kept up to date there
+    assert list(writer_service.index.select(FeedbackQuery())) == []
+    assert writer_service.search_index.indexed_upto == 0
+    assert writer_service.search_index.search("answer", 10)[2] == 3
+
+
+def test_duplicates_and_key_conflicts_are_answered_by_the_writer(settings):
+    async def scenario(writer_service, worker_service, client, server):
+        first = await worker_service.save(Feedback(**make_payload(0)), idempotency_key="key-1")
+        again = await worker_service.save(Feedback(**make_payload(0)), idempotency_key="key-1")
+        with pytest.raises(IdempotencyConflict):
+            await worker_service.save(Feedback(**make_payload(1)), idempotency_key="key-1")
+        stats = await worker_service.dedup_stats()
+        return first.id, again.id, stats.duplicates_by_key, len(writer_service.store)
+
+    assert run_with_writer(settings, scenario) == (0, 0, 1, 1)
+
+
+def test_metrics_and_unknown_operations(settings):
+    async def scenario(writer_service, worker_service, client, server):
+        await worker_service.save(Feedback(**make_payload(0)))
+        remote = await client.metrics()
+        with pytest.raises(IOError, match="Unknown operation"):
+            await client.call("drop_everything")
+        return remote
+
+    remote = run_with_writer(settings, scenario)
+    assert sum(sample[0] for _, sample in remote[BYTES_WRITTEN.name]) > 0
+
+
+def test_client_reconnects_after_the_writer_restarts(settings):
+    async def scenario(writer_service, worker_service, client, server):
+        await worker_service.save(Feedback(**make_payload(0)))
+        await server.stop()
+        await client.close()
+        with pytest.raises(Exception, match="Error saving feedback"):
+            await worker_service.save(Feedback(**make_payload(1)))
+        await server.start()
+        saved = await worker_service.save(Feedback(**make_payload(2)))
+        return saved.id
+
+    assert run_with_writer(settings, scenario) == 1
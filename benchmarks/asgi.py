@@ -0,0 +1,46 @@
+"""A minimal in-process ASGI client, so benchmarks exercise the full app without sockets."""
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+
+async def request(
+    app,
+    method: str,
+    path: str,
+    body: bytes = b"",
+    headers: Iterable[Tuple[str, str]] = (),
+    params: Optional[Dict] = None,
+) -> Tuple[int, bytes]:
+    """Send one HTTP request to ``app`` and return the status and response body."""
+    raw_headers = [(b"content-length", str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in headers]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params or {}, doseq=True).encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+    chunks = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
@@ -0,0 +1,61 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Prints the change of every metric per case and exits with status 1 if any
+latency, byte or memory figure grew (or throughput fell) by more than the
+threshold percentage.
+"""
+import argparse
+import json
+from typing import Dict, Iterator, Tuple
+
+# Metrics where a larger value is better; for everything else smaller is better
+HIGHER_IS_BETTER = {"throughput_per_s", "preload_records_per_s"}
+
+
+def _case_key(result: Dict) -> Tuple:
+    return result["scenario"], result.get("step"), result["records"]
+
+
+def _metrics(result: Dict) -> Iterator[Tuple[str, float]]:
+    for name, value in result.items():
+        if name == "latency_ms":
+            for percentile in ("p50", "p95", "p99"):
+                yield f"latency_ms.{percentile}", value[percentile]
+        elif name in HIGHER_IS_BETTER or name in ("bytes_per_record", "store_bytes_per_record", "peak_rss_mb"):
+            if value is not None:
+                yield name, value
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = {_case_key(result): result for result in json.load(f)["results"]}
+    with open(args.after) as f:
+        after = {_case_key(result): result for result in json.load(f)["results"]}
+
+    regressions = 0
+    for key in sorted(before.keys() & after.keys(), key=str):
+        scenario, step, records = key
+        print(f"{scenario}{'/' + step if step else ''} @ {records} records")
+        old_metrics = dict(_metrics(before[key]))
+        for name, new in _metrics(after[key]):
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:24} {old:>12} -> {new:>12}  {change:+7.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+"""Benchmark the write path, storage and dashboard aggregations.
+
+Run from the repository root::
+
+    python -m benchmarks.run --sizes 10000,100000 --out results.json
+
+Every (scenario, size) case runs in a fresh subprocess against a fresh data
+directory, so peak RSS is per case and runs do not influence each other.
+The app is driven in-process through ASGI; nothing touches the network.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from .synthetic import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("post_feedback", "dashboard")
+
+
+def _latency_summary(seconds: List[float]) -> Dict:
+    values = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def _preload(feedback_service, payloads, chunk_size: int = 5000) -> float:
+    from backend.app.models.feedback import Feedback
+
+    started = time.perf_counter()
+    chunk = []
+    for payload in payloads:
+        chunk.append(Feedback(**payload))
+        if len(chunk) >= chunk_size:
+            await feedback_service.save_many(chunk)
+            chunk = []
+    await feedback_service.save_many(chunk)
+    return time.perf_counter() - started
+
+
+# Scenarios; each runs inside its own subprocess
+
+
+async def bench_post_feedback(records: int, requests: int, concurrency: int, seed: int) -> List[Dict]:
+    """POST /feedback at a given concurrency against a store preloaded with ``records``."""
+    from backend.app import main
+    from .asgi import request
+
+    payloads = generate(records + requests, seed=seed)
+    preload_seconds = await _preload(main.feedback_service, (next(payloads) for _ in range(records)))
+    bodies = [json.dumps(payload).encode() for payload in payloads]
+    store_dir = main.feedback_service.store.directory
+    bytes_before = _directory_bytes(main.settings.data_dir)
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker(queue: List[bytes]) -> None:
+        nonlocal failures
+        while queue:
+            body = queue.pop()
+            started = time.perf_counter()
+            status, _ = await request(
+                main.app, "POST", "/feedback", body, headers=[("content-type", "application/json")]
+            )
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                failures += 1
+
+    queue = list(reversed(bodies))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(queue) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await main.feedback_service.close()
+    written = _directory_bytes(main.settings.data_dir) - bytes_before
+    return [{
+        "scenario": "post_feedback",
+        "records": records,
+        "requests": requests,
+        "concurrency": concurrency,
+        "failures": failures,
+        "latency_ms": _latency_summary(latencies),
+        "throughput_per_s": round(requests / elapsed, 1),
+        "bytes_per_record": round(written / max(requests - failures, 1), 1),
+        "store_bytes_per_record": round(_directory_bytes(store_dir) / max(records + requests, 1), 1),
+        "preload_records_per_s": round(records / preload_seconds, 1) if records else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }]
+
+
+async def bench_dashboard(records: int, repeats: int, seed: int) -> List[Dict]:
+    """Time the dashboard's aggregation steps and the backend rollups they read."""
+    import logging
+
+    # The dashboard renders at import; outside `streamlit run` that only logs warnings
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, os.path.join(ROOT, "frontend", "src"))
+    from backend.app import main
+    from pages import dashboard
+    from .asgi import request
+
+    await _preload(main.feedback_service, generate(records, seed=seed))
+    api_records = list(main.feedback_service.store.iter_records())
+    for record in api_records:
+        record["sentiment_score"] = 0.5
+
+    def timed(step, function, *args):
+        seconds = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = function(*args)
+            seconds.append(time.perf_counter() - started)
+        results.append({
+            "scenario": "dashboard",
+            "step": step,
+            "records": records,
+            "repeats": repeats,
+            "latency_ms": _latency_summary(seconds),
+            "throughput_per_s": round(records / float(np.median(seconds)), 1),
+        })
+        return result
+
+    results: List[Dict] = []
+    frame = timed("records_to_frame", dashboard.records_to_frame, api_records)
+    timed("rollup_feedback", dashboard.rollup_feedback, frame)
+    products = frame["product_name"].unique()[:3]
+    timed("filter_frame", lambda: frame[frame["product_name"].isin(products)])
+
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        status, _ = await request(main.app, "GET", "/stats")
+        seconds.append(time.perf_counter() - started)
+    results.append({
+        "scenario": "dashboard",
+        "step": "get_stats",
+        "records": records,
+        "repeats": repeats,
+        "latency_ms": _latency_summary(seconds),
+        "status": status,
+    })
+    await main.feedback_service.close()
+    peak = _peak_rss_mb()
+    for result in results:
+        result["peak_rss_mb"] = peak
+    return results
+
+
+def _run_case(args) -> List[Dict]:
+    if args.scenario == "post_feedback":
+        return asyncio.run(bench_post_feedback(args.records, args.requests, args.concurrency, args.seed))
+    return asyncio.run(bench_dashboard(args.records, args.repeats, args.seed))
+
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated record counts, e.g. 10000,100000,1000000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="POST /feedback requests per case")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5, help="runs of each dashboard step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("log", "sqlite"), default="log", help="storage backend to measure")
+    parser.add_argument("--out", help="write results as JSON here (default: stdout)")
+    # Internal: run a single case in this process and print its results
+    parser.add_argument("--case", dest="scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--records", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        print(json.dumps(_run_case(args)))
+        return
+
+    results = []
+    for scenario in args.scenarios.split(","):
+        for size in (int(size) for size in args.sizes.split(",")):
+            data_dir = tempfile.mkdtemp(prefix="feedback-bench-")
+            env = dict(
+                os.environ,
+                FEEDBACK_DATA_DIR=data_dir,
+                FEEDBACK_ENRICHMENT_WORKERS="0",
+                FEEDBACK_SNAPSHOT_INTERVAL_SECONDS="0",
+                FEEDBACK_STORAGE_BACKEND=args.backend,
+            )
+            command = [
+                sys.executable, "-m", "benchmarks.run", "--case", scenario, "--records", str(size),
+                "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                "--repeats", str(args.repeats), "--seed", str(args.seed),
+            ]
+            print(f"{scenario} at {size} records...", file=sys.stderr)
+            try:
+                completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+            finally:
+                shutil.rmtree(data_dir, ignore_errors=True)
+            if completed.returncode != 0:
+                sys.stderr.write(completed.stderr)
+                raise SystemExit(f"{scenario} at {size} records failed")
+            results.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    parameters = {name: value for name, value in vars(args).items() if name not in ("scenario", "records", "out")}
+    report = json.dumps({"environment": _environment(), "args": parameters, "results": results}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Synthetic feedback for every question flow, reproducible from a seed."""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+from backend.app.models.question_flow import FEEDBACK_TYPES, get_question_flow
+
+PRODUCTS = ["Mobile App", "Web Dashboard", "API", "Desktop Client", "Admin Console", "Reporting"]
+
+# Short phrases combined into free-text answers, with enough overlap for search and sentiment to matter
+PHRASES = [
+    "the login page is slow", "export to csv works great", "crashes when uploading large files",
+    "love the new dashboard", "search results are confusing", "notifications arrive late",
+    "the onboarding was easy", "reports take too long to load", "would like dark mode",
+    "support answered quickly", "sync fails on poor connections", "pricing is unclear",
+    "keyboard shortcuts would help", "filters reset after refresh", "charts look clean",
+]
+
+
+def _answer(question: Dict, rng: random.Random):
+    if question["type"] == "selectbox":
+        return rng.choice(question["options"])
+    if question["type"] == "slider":
+        return rng.randint(question["min_value"], question["max_value"])
+    if question["key"] == "product_name":
+        return rng.choice(PRODUCTS)
+    return ". ".join(rng.sample(PHRASES, rng.randint(1, 3)))
+
+
+def generate(count: int, seed: int = 0, days: int = 365) -> Iterator[Dict]:
+    """Yield ``count`` POST /feedback payloads, cycling through every flow."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        feedback_type = FEEDBACK_TYPES[i % len(FEEDBACK_TYPES)]
+        responses = {question["key"]: _answer(question, rng) for question in get_question_flow(feedback_type)}
+        responses["feedback_type"] = feedback_type
+        created_at = start + timedelta(seconds=rng.randrange(days * 86400))
+        yield {
+            "text": str(responses),
+            "feedback_type": feedback_type,
+            "responses": responses,
+            "created_at": created_at.isoformat(),
+            "user_id": f"user-{rng.randrange(max(count // 10, 1))}",
+        }
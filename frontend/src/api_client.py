@@ -0,0 +1,215 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: the backend is restarting, overloaded or behind a failing proxy
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class Outbox:
+    """Submissions that could not be delivered, kept on disk until they are.
+
+    Each queued submission is its own JSON file, written to a temporary name
+    and renamed, so a crash never leaves a half-written entry. An entry
+    holds the payload and the ``Idempotency-Key`` it was first sent with.
+    File names start with a timestamp, so entries are sent in the order they
+    were queued. Entries the backend rejects as invalid are moved to
+    ``rejected/`` rather than retried forever.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.rejected_directory = os.path.join(directory, 'rejected')
+        os.makedirs(self.rejected_directory, exist_ok=True)
+
+    def put(self, payload, idempotency_key):
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex}.json"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'idempotency_key': idempotency_key, 'payload': payload}, f)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def peek(self, limit):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        return names[:limit]
+
+    def load(self, name):
+        """Return the entry's payload and idempotency key."""
+        with open(os.path.join(self.directory, name), 'r') as f:
+            entry = json.load(f)
+        if 'payload' not in entry:
+            # Queued before keys were kept; the unique file name stands in, so resends stay idempotent
+            return entry, name[:-len('.json')]
+        return entry['payload'], entry['idempotency_key']
+
+    def remove(self, name):
+        os.remove(os.path.join(self.directory, name))
+
+    def reject(self, name):
+        os.replace(os.path.join(self.directory, name), os.path.join(self.rejected_directory, name))
+
+    def __len__(self):
+        return len(self.peek(limit=None))
+
+
+class ApiClient:
+    """Shared HTTP client for the backend.
+
+    One ``requests.Session`` keeps connections alive in a pool across reruns
+    and pages. Failed requests are retried with exponential backoff and full
+    jitter. Every submission carries an ``Idempotency-Key``, so a retry of a
+    request that did reach the backend is not stored twice. Submissions that
+    still fail go to the on-disk ``Outbox`` with their key, and a background
+    thread resends them to ``POST /feedback`` with that same key once the
+    backend answers again, so a submission whose response was lost is not
+    stored twice either.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        connect_timeout=3.0,
+        read_timeout=10.0,
+        retries=3,
+        backoff=0.2,
+        backoff_max=5.0,
+        pool_size=10,
+        outbox_dir='outbox',
+        # Entries resent per pass of the background thread
+        outbox_batch_size=100,
+        outbox_interval=5.0,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.outbox = Outbox(outbox_dir)
+        self.outbox_batch_size = outbox_batch_size
+        self.outbox_interval = outbox_interval
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='outbox-flusher', daemon=True)
+        self._flusher.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv('FEEDBACK_API_URL', 'http://localhost:8000'),
+            connect_timeout=float(os.getenv('FEEDBACK_API_CONNECT_TIMEOUT', '3')),
+            read_timeout=float(os.getenv('FEEDBACK_API_READ_TIMEOUT', '10')),
+            retries=int(os.getenv('FEEDBACK_API_RETRIES', '3')),
+            outbox_dir=os.getenv('FEEDBACK_OUTBOX_DIR', 'outbox'),
+        )
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps clients that failed together from retrying together
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def request(self, method, path, retries=None, **kwargs):
+        """Send a request, retrying connection errors, timeouts and retryable statuses.
+
+        Returns the last response, which may still be an error status; raises
+        ``requests.RequestException`` if no response was received at all.
+        """
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            self._sleep_before_retry(attempt)
+
+    def get(self, path, headers=None, **params):
+        return self.request('GET', path, params=params, headers=headers)
+
+    def get_json(self, path, **params):
+        response = self.get(path, **params)
+        response.raise_for_status()
+        return response.json()
+
+    def submit_feedback(self, payload, idempotency_key=None):
+        """Post one submission; returns the response, or ``None`` if it was queued in the outbox.
+
+        Pass the same ``idempotency_key`` every time the same submission is
+        sent, e.g. on a second click, so the backend stores it once; without
+        one, a new key is made. Validation errors (4xx) are returned to the
+        caller rather than queued, since sending the same payload again would
+        fail the same way.
+        """
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+        try:
+            response = self._post_feedback(payload, idempotency_key)
+        except requests.RequestException:
+            response = None
+        if response is not None and response.status_code < 500:
+            return response
+        self.outbox.put(payload, idempotency_key)
+        self._wakeup.set()
+        return None
+
+    def _post_feedback(self, payload, idempotency_key, retries=None):
+        return self.request(
+            'POST', '/feedback', json=payload, headers={'Idempotency-Key': idempotency_key}, retries=retries
+        )
+
+    # Outbox delivery
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.outbox_interval)
+            self._wakeup.clear()
+            try:
+                while self.flush_outbox():
+                    pass
+            except Exception:
+                # The backend is still unavailable; try again at the next interval
+                pass
+
+    def flush_outbox(self):
+        """Resend up to one batch of outbox entries; returns whether anything was sent.
+
+        Entries go to ``POST /feedback`` one by one with the key they were
+        first sent with, so one that did reach the backend before is answered
+        with the stored record instead of being saved again. Sending stops at
+        the first server error, raised, and the rest wait for the next pass.
+        """
+        names = self.outbox.peek(self.outbox_batch_size)
+        for name in names:
+            payload, idempotency_key = self.outbox.load(name)
+            response = self._post_feedback(payload, idempotency_key, retries=0)
+            if response.status_code >= 500 or response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            if response.status_code >= 400:
+                self.outbox.reject(name)
+            else:
+                self.outbox.remove(name)
+        return bool(names)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client, created on first use from ``FEEDBACK_*`` environment variables."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient.from_env()
+        return _client
@@ -1,6 +1,10 @@
 import streamlit as st
 import requests
-from datetime import datetime
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from api_client import get_client
 
 # Set page configuration and styling
 st.set_page_config(
@@ -225,6 +229,8 @@ def init_session_state():
         st.session_state.responses = {}
     if 'current_flow' not in st.session_state:
         st.session_state.current_flow = []
+    if 'idempotency_key' not in st.session_state:
+        st.session_state.idempotency_key = None
 
 def next_step():
     st.session_state.step += 1
@@ -233,246 +239,52 @@ def reset_chat():
     st.session_state.step = 0
     st.session_state.responses = {}
     st.session_state.current_flow = []
+    st.session_state.idempotency_key = None
+
+class FlowCache:
+    """Question flows from the backend's ``GET /flows``, shared by every rerun.
+
+    The flows are revalidated with their ETag at most every
+    ``REVALIDATE_SECONDS``; an unchanged registry answers 304 with no body.
+    If the backend is unreachable, the last flows fetched keep being used.
+    """
+
+    REVALIDATE_SECONDS = 60
+
+    def __init__(self, client):
+        self.client = client
+        self.document = None
+        self._etag = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.document is None or time.monotonic() - self._checked_at >= self.REVALIDATE_SECONDS:
+                self._revalidate()
+            return self.document
+
+    def _revalidate(self):
+        headers = {'If-None-Match': self._etag} if self._etag else {}
+        try:
+            response = self.client.get('/flows', headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+                self.document = response.json()
+                self._etag = response.headers.get('ETag')
+        except requests.RequestException:
+            if self.document is None:
+                raise
+        self._checked_at = time.monotonic()
+
+@st.cache_resource
+def get_flow_cache():
+    return FlowCache(get_client())
 
 def get_question_flow(feedback_type):
-    # Base questions that appear first for all types
-    base_questions = [
-        {
-            "question": "What type of feedback would you like to provide?",
-            "type": "selectbox",
-            "key": "feedback_type",
-            "options": ["Satisfaction", "Feature", "Bug", "Team Feedback", "Process Feedback", "General"]
-        },
-        {
-            "question": "Which product/service are you providing feedback about?",
-            "type": "text_input",
-            "key": "product_name"
-        },
-        {
-            "question": "What is your role in relation to this product?",
-            "type": "selectbox",
-            "key": "user_role",
-            "options": ["End User", "Developer", "Product Manager", "Stakeholder", "Other"]
-        }
-    ]
-    
-    type_specific_questions = {
-        "Satisfaction": [
-            {
-                "question": "How satisfied are you with the product?",
-                "type": "slider",
-                "key": "satisfaction_score",
-                "min_value": 1,
-                "max_value": 5
-            },
-            {
-                "question": "What do you like most about the product?",
-                "type": "text_area",
-                "key": "positive_feedback"
-            },
-            {
-                "question": "What are your main pain points?",
-                "type": "text_area",
-                "key": "pain_points"
-            },
-            {
-                "question": "Would you recommend this product to others?",
-                "type": "selectbox",
-                "key": "nps",
-                "options": ["Definitely", "Probably", "Not Sure", "Probably Not", "Definitely Not"]
-            }
-        ],
-        "Feature": [
-            {
-                "question": "What new feature would you like to suggest?",
-                "type": "text_area",
-                "key": "feature_description"
-            },
-            {
-                "question": "What problem would this feature solve?",
-                "type": "text_area",
-                "key": "problem_solution"
-            },
-            {
-                "question": "How often would you use this feature?",
-                "type": "selectbox",
-                "key": "usage_frequency",
-                "options": ["Multiple times daily", "Daily", "Weekly", "Monthly", "Occasionally"]
-            },
-            {
-                "question": "What is the business impact of this feature?",
-                "type": "selectbox",
-                "key": "business_impact",
-                "options": ["Revenue Increase", "Cost Reduction", "User Satisfaction", "Efficiency Improvement", "Competitive Advantage", "Other"]
-            },
-            {
-                "question": "How urgent is this feature request?",
-                "type": "selectbox",
-                "key": "urgency",
-                "options": ["Critical - Blocking Work", "High - Major Impact", "Medium - Significant Value", "Low - Nice to Have"]
-            }
-        ],
-        "Bug": [
-            {
-                "question": "What is the severity of this issue?",
-                "type": "selectbox",
-                "key": "severity",
-                "options": ["Critical - System Unusable", "High - Major Feature Broken", "Medium - Feature Partially Working", "Low - Minor Issue"]
-            },
-            {
-                "question": "Please describe the issue:",
-                "type": "text_area",
-                "key": "bug_description"
-            },
-            {
-                "question": "What steps can reproduce this issue?",
-                "type": "text_area",
-                "key": "reproduction_steps"
-            },
-            {
-                "question": "What is the impact on your work?",
-                "type": "text_area",
-                "key": "impact_description"
-            },
-            {
-                "question": "How often does this occur?",
-                "type": "selectbox",
-                "key": "frequency",
-                "options": ["Every time", "Frequently", "Sometimes", "Rarely", "First time"]
-            }
-        ],
-        "General": [
-            {
-                "question": "Which aspect would you like to discuss?",
-                "type": "selectbox",
-                "key": "feedback_area",
-                "options": ["User Experience", "Performance", "Documentation", "Support", "Pricing", "Other"]
-            },
-            {
-                "question": "Please provide your feedback:",
-                "type": "text_area",
-                "key": "general_feedback"
-            },
-            {
-                "question": "How could we improve your experience?",
-                "type": "text_area",
-                "key": "improvement_suggestions"
-            },
-            {
-                "question": "Would you be interested in discussing this further?",
-                "type": "selectbox",
-                "key": "follow_up",
-                "options": ["Yes", "Maybe", "No"]
-            }
-        ],
-        "Team Feedback": [
-            {
-                "question": "Which team are you providing feedback about?",
-                "type": "selectbox",
-                "key": "team_type",
-                "options": ["Development Team", "Product Team", "Design Team", "QA Team", "Cross-functional Team"]
-            },
-            {
-                "question": "How would you rate the team's technical expertise?",
-                "type": "slider",
-                "key": "technical_expertise",
-                "min_value": 1,
-                "max_value": 5
-            },
-            {
-                "question": "How would you rate the team's communication?",
-                "type": "slider",
-                "key": "communication_rating",
-                "min_value": 1,
-                "max_value": 5
-            },
-            {
-                "question": "How well does the team meet deadlines?",
-                "type": "slider",
-                "key": "deadline_adherence",
-                "min_value": 1,
-                "max_value": 5
-            },
-            {
-                "question": "What are the team's strongest points?",
-                "type": "text_area",
-                "key": "team_strengths"
-            },
-            {
-                "question": "What areas could the team improve?",
-                "type": "text_area",
-                "key": "team_improvements"
-            },
-            {
-                "question": "How well does the team handle feedback and criticism?",
-                "type": "selectbox",
-                "key": "feedback_handling",
-                "options": ["Very Well", "Well", "Neutral", "Needs Improvement", "Poor"]
-            },
-            {
-                "question": "How would you rate the team's documentation practices?",
-                "type": "selectbox",
-                "key": "documentation_quality",
-                "options": ["Excellent", "Good", "Adequate", "Needs Improvement", "Poor"]
-            }
-        ],
-        "Process Feedback": [
-            {
-                "question": "Which process area are you providing feedback about?",
-                "type": "selectbox",
-                "key": "process_area",
-                "options": ["Sprint Planning", "Product Roadmap", "Release Process", "Development Workflow", "Code Review", "Testing Process", "Other"]
-            },
-            {
-                "question": "How efficient is the current process?",
-                "type": "slider",
-                "key": "process_efficiency",
-                "min_value": 1,
-                "max_value": 5
-            },
-            {
-                "question": "What are the main bottlenecks in the current process?",
-                "type": "text_area",
-                "key": "process_bottlenecks"
-            },
-            {
-                "question": "How well are requirements communicated?",
-                "type": "selectbox",
-                "key": "requirements_clarity",
-                "options": ["Very Clear", "Clear", "Somewhat Clear", "Unclear", "Very Unclear"]
-            },
-            {
-                "question": "How would you rate the decision-making process?",
-                "type": "selectbox",
-                "key": "decision_making",
-                "options": ["Very Efficient", "Efficient", "Neutral", "Inefficient", "Very Inefficient"]
-            },
-            {
-                "question": "How well are project priorities communicated?",
-                "type": "selectbox",
-                "key": "priority_communication",
-                "options": ["Excellent", "Good", "Fair", "Poor", "Very Poor"]
-            },
-            {
-                "question": "What process improvements would you suggest?",
-                "type": "text_area",
-                "key": "process_improvements"
-            },
-            {
-                "question": "How well does the current process handle:",
-                "type": "selectbox",
-                "key": "process_handling",
-                "options": ["Change Requests", "Resource Allocation", "Risk Management", "Quality Assurance", "Stakeholder Communication"]
-            },
-            {
-                "question": "What metrics would you suggest tracking to improve the process?",
-                "type": "text_area",
-                "key": "suggested_metrics"
-            }
-        ]
-    }
-    
-    return base_questions + type_specific_questions.get(feedback_type, [])
+    # Until a type is chosen only the base questions are asked
+    flows = get_flow_cache().get()
+    return flows['flows'].get(feedback_type, flows['base'])
 
 def chat_interface():
     # Header
@@ -569,18 +381,27 @@ def chat_interface():
                 submit_feedback()
 
 def submit_feedback():
+    # One key per completed summary, so clicking Submit again does not store it twice
+    if st.session_state.idempotency_key is None:
+        st.session_state.idempotency_key = uuid.uuid4().hex
     try:
-        response = requests.post(
-            "http://localhost:8000/feedback",
-            json={
-                "text": str(st.session_state.responses),  # Convert full responses to string
-                "feedback_type": st.session_state.responses.get('feedback_type', 'general'),
-                "responses": st.session_state.responses,  # Send full response data
-                "created_at": datetime.now().isoformat()
-            }
-        )
+        response = get_client().submit_feedback({
+            "text": str(st.session_state.responses),  # Convert full responses to string
+            "feedback_type": st.session_state.responses.get('feedback_type', 'general'),
+            "responses": st.session_state.responses,  # Send full response data
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }, st.session_state.idempotency_key)
         
-        if response.status_code == 200:
+        if response is None:
+            # Kept in the local outbox and sent automatically once the backend is back
+            st.markdown(
+                '<div class="success-message">Thank you! The server is unreachable right now, '
+                'so your feedback was saved and will be sent automatically.</div>',
+                unsafe_allow_html=True
+            )
+            if st.button("Provide More Feedback"):
+                reset_chat()
+        elif response.status_code == 200:
             st.markdown(
                 '<div class="success-message">Thank you for your valuable feedback!</div>',
                 unsafe_allow_html=True
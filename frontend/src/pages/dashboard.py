@@ -2,9 +2,23 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import json
+from datetime import datetime, time, timedelta
 import numpy as np
+import requests
+from api_client import get_client
+
+# Columns of the pre-aggregated rows served by the backend's /stats endpoint
+STATS_COLUMNS = ['day', 'feedback_type', 'product_name', 'user_role', 'sentiment', 'count', 'sentiment_sum']
+
+# Columns every loaded feedback frame has, whatever the flows of its records
+FEEDBACK_COLUMNS = ['id', 'timestamp', 'feedback_type', 'product_name', 'user_role', 'sentiment', 'sentiment_score', 'user_id']
+
+# Sidebar filters sent to the backend: (query parameter and column, label)
+FILTERS = [
+    ('product_name', 'Select Products'),
+    ('feedback_type', 'Select Feedback Types'),
+    ('user_role', 'Select User Roles'),
+]
 
 # Reuse the styling from main.py
 st.set_page_config(
@@ -37,15 +51,27 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def load_feedback_data():
-    try:
-        # In production, replace this with your actual data loading logic
-        with open('feedback_data.json', 'r') as f:
-            data = json.load(f)
-        return pd.DataFrame(data)
-    except FileNotFoundError:
-        # Return sample data if no file exists
-        return create_sample_data()
+def sentiment_labels(scores):
+    # Same buckets as the backend rollups
+    labels = np.select([scores >= 0.6, scores < 0.4], ['Positive', 'Negative'], default='Neutral')
+    return pd.Series(labels, index=scores.index).where(scores.notna(), 'Unscored')
+
+def records_to_frame(records):
+    """Build a typed frame from API records, flattening ``responses`` into columns."""
+    if not records:
+        return pd.DataFrame(columns=FEEDBACK_COLUMNS)
+    frame = pd.json_normalize(records)
+    frame.columns = [
+        column[len('responses.'):] if column.startswith('responses.') else column
+        for column in frame.columns
+    ]
+    # responses repeats feedback_type, and text is only a str() of responses
+    frame = frame.loc[:, ~frame.columns.duplicated()].drop(columns=['text'], errors='ignore')
+    # Parsed once here; offsets are normalized to UTC like the backend does
+    frame['timestamp'] = pd.to_datetime(frame.pop('created_at'), format='ISO8601', utc=True).dt.tz_localize(None)
+    frame['sentiment_score'] = pd.to_numeric(frame['sentiment_score'])
+    frame['sentiment'] = sentiment_labels(frame['sentiment_score'])
+    return frame.reindex(columns=FEEDBACK_COLUMNS + [c for c in frame.columns if c not in FEEDBACK_COLUMNS])
 
 def create_sample_data():
     # Create sample data for testing
@@ -55,7 +81,7 @@ def create_sample_data():
     for date in dates:
         for _ in range(3):  # 3 entries per day
             sample_data.append({
-                'timestamp': date.strftime('%Y-%m-%d'),
+                'timestamp': date,
                'feedback_type': np.random.choice(['Satisfaction', 'Feature', 'Bug', 'Process Feedback', 'General']),
                 'sentiment': np.random.choice(['Positive', 'Neutral', 'Negative']),
                 'sentiment_score': np.random.uniform(0, 1),
@@ -67,16 +93,88 @@ def create_sample_data():
     
     return pd.DataFrame(sample_data)
 
-def create_feedback_trends(df):
+def rollup_feedback(df):
+    # Aggregate raw rows into the same shape as the backend's /stats rollups
+    stats = df.assign(day=df['timestamp'].dt.normalize()).groupby(
+        ['day', 'feedback_type', 'product_name', 'user_role', 'sentiment'], as_index=False
+    ).agg(count=('sentiment', 'size'), sentiment_sum=('sentiment_score', 'sum'))
+    return stats[STATS_COLUMNS]
+
+def filter_frame(frame, params, time_column):
+    # Apply the query parameters the backend would, for the offline sample data
+    start = pd.Timestamp(params['from'])
+    end = pd.Timestamp(params['to']) + pd.Timedelta(days=1)
+    mask = (frame[time_column] >= start) & (frame[time_column] < end)
+    for field, _ in FILTERS:
+        if field in params:
+            mask &= frame[field].isin(params[field])
+    return frame[mask]
+
+def load_filter_options(date_range):
+    # Only values present in the date range are offered, read from the backend's facet counts
+    try:
+        facets = get_client().get_json(
+            '/feedback/facets',
+            created_from=datetime.combine(date_range[0], time.min).isoformat(),
+            created_to=datetime.combine(date_range[1], time.max).isoformat(),
+        )['facets']
+        return {field: sorted(facets.get(field, {})) for field, _ in FILTERS}
+    except requests.RequestException:
+        sample = create_sample_data()
+        return {field: sorted(sample[field].unique()) for field, _ in FILTERS}
+
+def build_query(date_range, options, selections):
+    """Query parameters for the sidebar filters, or None when a filter has nothing selected."""
+    params = {'from': date_range[0].isoformat(), 'to': date_range[1].isoformat()}
+    for field, selected in selections.items():
+        if not selected:
+            return None
+        # Selecting every value filters nothing, so it is left out of the query
+        if set(selected) != set(options[field]):
+            params[field] = list(selected)
+    return params
+
+def load_stats(params):
+    if params is None:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    try:
+        rows = get_client().get_json('/stats', **params)['rows']
+        stats = pd.DataFrame(rows, columns=STATS_COLUMNS)
+        stats['day'] = pd.to_datetime(stats['day'])
+        return stats
+    except requests.RequestException:
+        # Fall back to rolled-up sample data if the backend is unavailable
+        return filter_frame(rollup_feedback(create_sample_data()), params, 'day')
+
+def load_trends(params, fallback_stats):
+    # The backend buckets the counts (hour to year) so the chart has a bounded number of points
+    if params is None:
+        return pd.DataFrame(), 'day'
+    try:
+        response = get_client().get_json('/stats/timeseries', group_by='feedback_type', **params)
+        return pd.DataFrame(response['series'], index=pd.to_datetime(response['buckets'])), response['bucket']
+    except requests.RequestException:
+        # Sum the daily rollups of the sample data instead
+        trends = fallback_stats.pivot_table(
+            index='day', columns='feedback_type', values='count', aggfunc='sum', fill_value=0
+        )
+        return trends, 'day'
+
+def load_recent_feedback(params, limit=10):
+    # Only the newest matching records are fetched; the backend picks them from its indexes
+    if params is None:
+        return records_to_frame([])
+    try:
+        return records_to_frame(get_client().get_json('/feedback/recent', limit=limit, **params))
+    except requests.RequestException:
+        return filter_frame(create_sample_data(), params, 'timestamp')
+
+def create_feedback_trends(trends, bucket):
     st.subheader("Feedback Trends")
     
-    # Group feedback by date and type
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    feedback_by_date = df.groupby([df['timestamp'].dt.date, 'feedback_type']).size().unstack(fill_value=0)
-    
-    fig = px.line(feedback_by_date, 
+    fig = px.line(trends, 
                   title='Feedback Volume Over Time',
-                  labels={'value': 'Number of Feedback', 'date': 'Date'},
+                  labels={'value': f'Feedback per {bucket}', 'index': 'Date', 'day': 'Date', 'variable': 'Feedback type'},
                   height=400)
     fig.update_layout(
         plot_bgcolor='white',
@@ -85,13 +183,13 @@ def create_feedback_trends(df):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def create_sentiment_analysis(df):
+def create_sentiment_analysis(stats):
     st.subheader("Sentiment Analysis")
     
     col1, col2 = st.columns(2)
     
     with col1:
-        sentiment_dist = df['sentiment'].value_counts()
+        sentiment_dist = stats.groupby('sentiment')['count'].sum()
         fig = px.pie(values=sentiment_dist.values,
                     names=sentiment_dist.index,
                     title='Sentiment Distribution',
@@ -104,7 +202,9 @@ def create_sentiment_analysis(df):
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        sentiment_by_type = pd.crosstab(df['feedback_type'], df['sentiment'])
+        sentiment_by_type = stats.pivot_table(
+            index='feedback_type', columns='sentiment', values='count', aggfunc='sum', fill_value=0
+        )
         fig = px.bar(sentiment_by_type,
                     title='Sentiment by Feedback Type',
                     height=300)
@@ -115,21 +215,22 @@ def create_sentiment_analysis(df):
         )
         st.plotly_chart(fig, use_container_width=True)
 
-def create_product_metrics(df):
+def create_product_metrics(stats):
     st.subheader("Product Metrics")
     
     col1, col2, col3 = st.columns(3)
+    total_feedback = int(stats['count'].sum())
     
     with col1:
-        total_feedback = len(df)
         st.metric("Total Feedback", total_feedback)
     
     with col2:
-        avg_sentiment = (df['sentiment'] == 'Positive').mean() * 100
+        positive = stats.loc[stats['sentiment'] == 'Positive', 'count'].sum()
+        avg_sentiment = positive / total_feedback * 100 if total_feedback else 0.0
         st.metric("Positive Sentiment", f"{avg_sentiment:.1f}%")
     
     with col3:
-        feature_requests = len(df[df['feedback_type'] == 'Feature'])
+        feature_requests = int(stats.loc[stats['feedback_type'] == 'Feature', 'count'].sum())
         st.metric("Feature Requests", feature_requests)
 
 def create_feedback_table(df):
@@ -161,9 +262,6 @@ def main():
     # Header
     st.markdown('<h1 class="feedback-header">Product Feedback Dashboard</h1>', unsafe_allow_html=True)
     
-    # Load data
-    df = load_feedback_data()
-    
     # Add filters in sidebar
     st.sidebar.header("Filters")
     
@@ -176,28 +274,27 @@ def main():
         )
     )
     
-    # Product filter
-    selected_products = st.sidebar.multiselect(
-        "Select Products",
-        options=df['product_name'].unique(),
-        default=df['product_name'].unique()
-    )
+    # Product, type and role filters; every value present in the range is selected by default
+    options = load_filter_options(date_range)
+    selections = {
+        field: st.sidebar.multiselect(label, options=options[field], default=options[field])
+        for field, label in FILTERS
+    }
     
-    # Filter data
-    mask = (
-        (pd.to_datetime(df['timestamp']).dt.date >= date_range[0]) &
-        (pd.to_datetime(df['timestamp']).dt.date <= date_range[1]) &
-        (df['product_name'].isin(selected_products))
-    )
-    filtered_df = df[mask]
+    # Filters are sent to the backend, which evaluates them against its indexes and
+    # time partitions and returns only aggregates and the few rows displayed
+    params = build_query(date_range, options, selections)
+    stats = load_stats(params)
+    trends, bucket = load_trends(params, stats)
+    recent = load_recent_feedback(params)
     
     # Display metrics and charts
-    create_product_metrics(filtered_df)
+    create_product_metrics(stats)
     
     # Create two columns for charts
-    create_feedback_trends(filtered_df)
-    create_sentiment_analysis(filtered_df)
-    create_feedback_table(filtered_df)
+    create_feedback_trends(trends, bucket)
+    create_sentiment_analysis(stats)
+    create_feedback_table(recent)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file